@@ -4,9 +4,15 @@ Copyright (c) 2019 - present AppSeed.us
 """
 # Register your models here.
 from django.contrib import admin
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
+from django.utils import timezone
 
 from apps.home.forms import TransactionForm, CategoryForm
-from apps.home.models import Category, Transaction, Budget, SavingsGoal
+from apps.home.goals import with_progress
+from apps.home.models import Category, Transaction, Budget, SavingsGoal, RecurringTransaction
+from apps.home.pagination import LedgerPaginator, ledger_period
+from apps.home.search import TransactionSearch
+from apps.routers import replica_reads
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -33,12 +39,19 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('date', 'category', 'amount', 'get_transaction_type')
-    list_filter = ('category__type', 'date')
+    list_filter = ('transaction_type', 'date')
     search_fields = ('description', 'category__name')
     date_hierarchy = 'date'
     ordering = ('-date',)
     form = TransactionForm  # Указываем нашу форму
 
+    # Категории страницы одним JOIN, без запроса на каждую строку
+    list_select_related = ('category',)
+    # Общее количество без фильтров не пересчитывается на каждой странице
+    show_full_result_count = False
+    # Иерархия дат по месячным агрегатам (apps/home/templatetags/ledger_admin.py)
+    change_list_template = 'admin/home/transaction/change_list.html'
+
     # Убираем поле user из формы
     exclude = ('user',)
 
@@ -58,10 +71,37 @@ class TransactionAdmin(admin.ModelAdmin):
         #     return qs
         return qs.filter(user=request.user)
 
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        # Список читается из реплики. Шаблон рендерится внутри блока:
+        # строки страницы и иерархия дат запрашиваются при рендере
+        with replica_reads(request.user.pk):
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # Без поиска и фильтров, кроме date_hierarchy, количество берётся из агрегатов
+        params = {
+            key: value for key, value in request.GET.items()
+            if key not in IGNORED_PARAMS + (PAGE_VAR, ERROR_FLAG)
+        }
+        period = None if request.GET.get(SEARCH_VAR) else ledger_period(params)
+        return LedgerPaginator(
+            queryset, per_page, orphans, allow_empty_first_page, user=request.user, period=period
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо LIKE по описанию и JOIN с категориями
+        return TransactionSearch(request.user, search_term).filter(queryset), False
+
     def get_transaction_type(self, obj):
-        return "Доход" if obj.transaction_type == "income" else "Расход"
+        return obj.get_transaction_type_display()
 
     get_transaction_type.short_description = "Тип транзакции"
+    get_transaction_type.admin_order_field = 'transaction_type'
 
     def save_model(self, request, obj, form, change):
         # Автоматически назначаем пользователя при создании объекта
@@ -69,25 +109,104 @@ class TransactionAdmin(admin.ModelAdmin):
             obj.user = request.user
         super().save_model(request, obj, form, change)
 
-# @admin.register(Budget)
-# class BudgetAdmin(admin.ModelAdmin):
-#     list_display = ('category', 'amount', 'start_date', 'end_date', 'user')  # Отображаемые поля
-#     list_filter = ('category__type', 'user')  # Фильтры
-#     search_fields = ('category__name',)  # Поиск по названию категории
-#     date_hierarchy = 'start_date'  # Иерархия по дате начала
-#     ordering = ('-start_date',)  # Сортировка по дате начала
-#
-# @admin.register(SavingsGoal)
-# class SavingsGoalAdmin(admin.ModelAdmin):
-#     list_display = ('name', 'target_amount', 'current_amount', 'progress', 'target_date', 'user')  # Отображаемые поля
-#     list_filter = ('user',)  # Фильтры
-#     search_fields = ('name',)  # Поиск по названию цели
-#     date_hierarchy = 'target_date'  # Иерархия по целевой дате
-#     ordering = ('-target_date',)  # Сортировка по целевой дате
-#
-#     # Добавляем вычисляемое поле progress в админку
-#     readonly_fields = ('progress',)  # Поле только для чтения
-#
-#     def progress(self, obj):
-#         return f"{obj.progress():.1f}%"
-#     progress.short_description = "Прогресс"  # Название колонки
\ No newline at end of file
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('category', 'amount', 'spent', 'get_remaining', 'start_date', 'end_date')  # Отображаемые поля
+    search_fields = ('category__name',)  # Поиск по названию категории
+    date_hierarchy = 'start_date'  # Иерархия по дате начала
+    ordering = ('-start_date',)  # Сортировка по дате начала
+    list_select_related = ('category',)
+    # Потраченная сумма поддерживается автоматически (apps.home.budgets)
+    readonly_fields = ('spent',)
+    exclude = ('user',)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        class CustomForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.fields['category'].queryset = Category.objects.filter(
+                    user=request.user, type=Category.EXPENSE
+                )
+
+        return CustomForm
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(user=request.user)
+
+    def get_remaining(self, obj):
+        return obj.amount - obj.spent
+
+    get_remaining.short_description = "Остаток"
+
+    def save_model(self, request, obj, form, change):
+        if not obj.pk:
+            obj.user = request.user
+        super().save_model(request, obj, form, change)
+
+@admin.register(SavingsGoal)
+class SavingsGoalAdmin(admin.ModelAdmin):
+    list_display = ('name', 'target_amount', 'get_saved', 'progress', 'start_date', 'target_date')  # Отображаемые поля
+    search_fields = ('name',)  # Поиск по названию цели
+    date_hierarchy = 'target_date'  # Иерархия по целевой дате
+    ordering = ('-target_date',)  # Сортировка по целевой дате
+    filter_horizontal = ('categories',)
+    exclude = ('user',)
+
+    # Добавляем вычисляемое поле progress в админку
+    readonly_fields = ('progress',)  # Поле только для чтения
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'categories':
+            kwargs['queryset'] = Category.objects.filter(user=request.user, type=Category.INCOME)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def get_queryset(self, request):
+        # Накопленная сумма всех целей страницы — тем же запросом, что и список
+        qs = super().get_queryset(request).filter(user=request.user)
+        return with_progress(qs, timezone.now().date())
+
+    def get_saved(self, obj):
+        return obj.saved
+
+    get_saved.short_description = "Накоплено"
+    get_saved.admin_order_field = 'saved'
+
+    def progress(self, obj):
+        if obj.pk is None:
+            return '—'
+        return f"{obj.progress():.1f}%"
+    progress.short_description = "Прогресс"  # Название колонки
+
+    def save_model(self, request, obj, form, change):
+        if not obj.pk:
+            obj.user = request.user
+        super().save_model(request, obj, form, change)
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ('category', 'amount', 'frequency', 'interval', 'start_date', 'end_date', 'next_date')
+    list_filter = ('frequency',)
+    search_fields = ('description', 'category__name')
+    ordering = ('next_date',)
+    list_select_related = ('category',)
+    # Следующую дату сдвигает планировщик (команда materialize_recurring)
+    readonly_fields = ('next_date',)
+    exclude = ('user',)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        class CustomForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.fields['category'].queryset = Category.objects.filter(user=request.user)
+
+        return CustomForm
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(user=request.user)
+
+    def save_model(self, request, obj, form, change):
+        if not obj.pk:
+            obj.user = request.user
+        super().save_model(request, obj, form, change)
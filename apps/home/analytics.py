@@ -0,0 +1,167 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from apps.home.models import Category, DailyCategoryTotal, MonthlyCategoryTotal
+from apps.home.utils import month_start, shift_months
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+# Сколько корзин по умолчанию показывается, если начало периода не задано
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12, 'quarter': 8, 'year': 5}
+
+# Ограничение на длину ряда: 10 лет по дням уже не помещаются на график
+MAX_BUCKETS = 1000
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def bucket_start(value, granularity):
+    """Первый день корзины (дня, недели с понедельника, месяца, квартала, года)."""
+    if granularity == 'day':
+        return value
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return month_start(value)
+    if granularity == 'quarter':
+        return value.replace(month=(value.month - 1) // 3 * 3 + 1, day=1)
+    return value.replace(month=1, day=1)
+
+
+def next_bucket(value, granularity):
+    """Начало следующей корзины; value — начало корзины."""
+    if granularity == 'day':
+        return value + timedelta(days=1)
+    if granularity == 'week':
+        return value + timedelta(days=7)
+    return shift_months(value, {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+
+def shift_buckets(value, granularity, count):
+    """Начало корзины, отстоящей от value на count корзин назад."""
+    if granularity == 'day':
+        return value - timedelta(days=count)
+    if granularity == 'week':
+        return value - timedelta(days=7 * count)
+    return shift_months(value, -count * {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+
+def bucket_label(value, granularity):
+    """Компактная подпись: 2026-10-18, 2026-W42, 2026-10, 2026-Q4, 2026."""
+    if granularity == 'day':
+        return value.isoformat()
+    if granularity == 'week':
+        year, week, _ = value.isocalendar()
+        return f'{year}-W{week:02d}'
+    if granularity == 'month':
+        return f'{value:%Y-%m}'
+    if granularity == 'quarter':
+        return f'{value.year}-Q{(value.month - 1) // 3 + 1}'
+    return str(value.year)
+
+
+@dataclass
+class Series:
+    """
+    Плотные ряды за период: одна позиция на каждую корзину, пустые — нули.
+    Все ряды выровнены с buckets.
+    """
+    granularity: str
+    buckets: list
+    income: list
+    expense: list
+    count: list
+
+    @property
+    def balance(self):
+        return [income - expense for income, expense in zip(self.income, self.expense)]
+
+    def as_json(self):
+        return {
+            'granularity': self.granularity,
+            'start': self.buckets[0].isoformat() if self.buckets else None,
+            'end': (next_bucket(self.buckets[-1], self.granularity) - timedelta(days=1)).isoformat()
+            if self.buckets else None,
+            'labels': [bucket_label(bucket, self.granularity) for bucket in self.buckets],
+            'income': [float(value) for value in self.income],
+            'expense': [float(value) for value in self.expense],
+            'balance': [float(value) for value in self.balance],
+            'count': self.count,
+        }
+
+
+def ledger_series(user, start, end, granularity='month'):
+    """
+    Доходы, расходы и количество транзакций пользователя по корзинам.
+    Период расширяется до целых корзин. Месяцы, кварталы и годы читаются
+    из помесячных агрегатов, дни и недели — из дневных; в обоих случаях
+    одним сгруппированным запросом, без обхода журнала.
+    :param start: Первая дата периода
+    :param end: Последняя дата периода (включительно)
+    :param granularity: day, week, month, quarter или year
+    :return: Series
+    """
+    if granularity not in GRANULARITIES:
+        raise AnalyticsError(f'Неизвестная гранулярность: {granularity}')
+    if start > end:
+        raise AnalyticsError('Начало периода позже конца')
+
+    buckets = [bucket_start(start, granularity)]
+    while next_bucket(buckets[-1], granularity) <= end:
+        buckets.append(next_bucket(buckets[-1], granularity))
+        if len(buckets) > MAX_BUCKETS:
+            raise AnalyticsError(f'Период длиннее {MAX_BUCKETS} корзин, выберите гранулярность крупнее')
+    period_end = next_bucket(buckets[-1], granularity)
+
+    if granularity in ('day', 'week'):
+        rows = DailyCategoryTotal.objects.filter(
+            user=user,
+            date__gte=buckets[0],
+            date__lt=period_end
+        ).values_list('date', 'category__type').annotate(
+            total=Sum('total'),
+            number=Sum('count')
+        ).order_by()
+    else:
+        rows = MonthlyCategoryTotal.objects.filter(
+            user=user,
+            month__gte=buckets[0],
+            month__lt=period_end
+        ).values_list('month', 'category__type').annotate(
+            total=Sum('total'),
+            number=Sum('count')
+        ).order_by()
+
+    return _fill(rows, buckets, granularity)
+
+
+def default_start(end, granularity):
+    """Начало периода по умолчанию: DEFAULT_BUCKETS корзин до end включительно."""
+    return shift_buckets(bucket_start(end, granularity), granularity, DEFAULT_BUCKETS[granularity] - 1)
+
+
+def _fill(rows, buckets, granularity):
+    """Раскладывает сгруппированные строки по корзинам; пропуски остаются нулями."""
+    index = {bucket: position for position, bucket in enumerate(buckets)}
+    income = [Decimal(0)] * len(buckets)
+    expense = [Decimal(0)] * len(buckets)
+    count = [0] * len(buckets)
+
+    for day, transaction_type, total, number in rows:
+        position = index[bucket_start(day, granularity)]
+        if transaction_type == Category.INCOME:
+            income[position] += total or 0
+        else:
+            expense[position] += total or 0
+        count[position] += number or 0
+
+    return Series(granularity=granularity, buckets=buckets, income=income, expense=expense, count=count)
@@ -0,0 +1,156 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.home import cache
+from apps.home.models import Transaction
+
+PASSWORD = 'benchpass123'
+
+
+class Scenario:
+    """
+    Один замер: setup() вызывается перед каждым повтором и не измеряется,
+    run() — измеряемое действие.
+    """
+
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def build_scenarios(user, today):
+    client = Client()
+    client.force_login(user)
+    month = today.replace(day=1)
+
+    def cold():
+        # Новая версия журнала — промах кэша дашборда
+        cache.bump_ledger_version([user.pk])
+
+    def get(*paths):
+        def run():
+            for path in paths:
+                response = client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+        return run
+
+    charts = [f'/api/charts/{chart}/' for chart in ('balance', 'income', 'expense', 'category')]
+    etag = {}
+
+    def current_etag():
+        etag['value'] = client.get(charts[0])['ETag']
+
+    def not_modified():
+        # Опрос графика без изменений в журнале
+        response = client.get(charts[0], HTTP_IF_NONE_MATCH=etag['value'])
+        assert response.status_code == 304, response.status_code
+
+    def login():
+        response = Client().post('/login/', {'username': user.username, 'password': PASSWORD})
+        assert response.status_code == 302, response.status_code
+
+    return [
+        Scenario('dashboard_cold', get('/', *charts), setup=cold),
+        Scenario('dashboard_warm', get('/', *charts)),
+        Scenario('chart_not_modified', not_modified, setup=current_etag),
+        Scenario('monthly_balance_cold', lambda: Transaction.get_monthly_balance(user), setup=cold),
+        Scenario('admin_changelist', get('/admin/home/transaction/')),
+        Scenario('admin_date_hierarchy', get(f'/admin/home/transaction/?date__year={month.year}&date__month={month.month}')),
+        Scenario('admin_search', get('/admin/home/transaction/?q=%D0%9F%D1%80%D0%BE%D0%B4%D1%83%D0%BA%D1%82%D1%8B')),
+        Scenario('login', login),
+    ]
+
+
+def measure(scenario, repeat):
+    """
+    Время (мс) по repeat повторам, число запросов к БД и пиковая память.
+    Память снимается отдельным прогоном: tracemalloc замедляет код.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        scenario.setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            scenario.run()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(captured)
+
+    scenario.setup()
+    tracemalloc.start()
+    try:
+        scenario.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(user, repeat=10, only=None, today=None):
+    """:return: {имя сценария: метрики}"""
+    today = today or date.today()
+    results = {}
+    for scenario in build_scenarios(user, today):
+        if only and scenario.name not in only:
+            continue
+        # Прогрев: первый вызов платит за импорт модулей и компиляцию шаблонов
+        scenario.setup()
+        scenario.run()
+        results[scenario.name] = measure(scenario, repeat)
+    return results
+
+
+def environment(scale):
+    return {
+        'git_commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'scale': scale,
+    }
+
+
+def prepare_user(username):
+    """Пользователь бенчмарка получает доступ к админке и известный пароль."""
+    user = User.objects.get(username=username)
+    user.is_staff = True
+    user.is_superuser = True
+    user.set_password(PASSWORD)
+    user.save()
+    return user
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,222 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.db import connections, router
+from django.db.models import Case, DateField, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Least
+
+from apps.home.models import Budget, DailyCategoryTotal
+
+CENT = Decimal('0.01')
+
+
+def apply_deltas(deltas):
+    """
+    Переносит приращения журнала в Budget.spent.
+    Приращения схлопываются по (пользователь, категория, дата) и
+    раскладываются по окнам бюджетов; затронутые бюджеты обновляются
+    одним UPDATE с CASE по pk на пачку.
+    """
+    grouped = defaultdict(Decimal)
+    for delta in deltas:
+        grouped[(delta.user_id, delta.category_id, delta.date)] += delta.amount
+    by_category = defaultdict(list)
+    for (user_id, category_id, day), amount in grouped.items():
+        if amount:
+            by_category[(user_id, category_id)].append((day, amount))
+    if not by_category:
+        return
+
+    windows = Budget.objects.filter(
+        user_id__in={user_id for user_id, _ in by_category},
+        category_id__in={category_id for _, category_id in by_category}
+    ).values_list('pk', 'user_id', 'category_id', 'start_date', 'end_date')
+
+    per_budget = defaultdict(Decimal)
+    for pk, user_id, category_id, start, end in windows:
+        for day, amount in by_category.get((user_id, category_id), ()):
+            if start <= day <= end:
+                per_budget[pk] += amount
+    changed = [(pk, amount) for pk, amount in per_budget.items() if amount]
+    if not changed:
+        return
+
+    spent = Budget._meta.get_field('spent')
+    connection = connections[router.db_for_write(Budget)]
+    # Как в bulk_update: pk в WHEN и в IN, приращение — в THEN
+    batch_size = connection.ops.bulk_batch_size(['pk', 'pk', 'spent'], changed)
+    for offset in range(0, len(changed), batch_size):
+        batch = changed[offset:offset + batch_size]
+        Budget.objects.filter(pk__in=[pk for pk, _ in batch]).update(spent=F('spent') + Case(
+            *[When(pk=pk, then=Value(amount, output_field=spent)) for pk, amount in batch],
+            output_field=spent
+        ))
+
+
+def _spent_subquery(until=None):
+    """
+    Сумма дневных агрегатов категории за окно бюджета.
+    :param until: Последний учитываемый день (None — до конца окна)
+    """
+    end = OuterRef('end_date')
+    if until is not None:
+        end = Least(end, Value(until, output_field=DateField()))
+    return Coalesce(
+        Subquery(
+            DailyCategoryTotal.objects.filter(
+                user_id=OuterRef('user_id'),
+                category_id=OuterRef('category_id'),
+                date__gte=OuterRef('start_date'),
+                date__lte=end
+            ).values('category_id').annotate(spent=Sum('total')).values('spent')
+        ),
+        Value(Decimal(0)),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def with_spent_until(budgets, until):
+    """
+    Бюджеты с spent на дату until: сумма за окно по until включительно,
+    тем же запросом, что и выборка бюджетов (для выписок за прошлые месяцы).
+    """
+    return budgets.annotate(spent_until=_spent_subquery(until))
+
+
+def refresh_spent(budgets):
+    """
+    Пересчитывает spent бюджетов queryset одним UPDATE по дневным агрегатам.
+    Сумма считается в самом UPDATE, а не записывается готовым значением,
+    поэтому параллельные F('spent') + x не теряются.
+    :return: Количество обновлённых бюджетов
+    """
+    return budgets.update(spent=_spent_subquery())
+
+
+def recompute(user_ids=None):
+    """
+    Пересчитывает spent всех бюджетов пользователей
+    (дневные агрегаты нужно пересобрать раньше).
+    :return: Количество обновлённых бюджетов
+    """
+    budgets = Budget.objects.all()
+    if user_ids is not None:
+        budgets = budgets.filter(user_id__in=user_ids)
+    return refresh_spent(budgets)
+
+
+def spent_for(budget):
+    """Сумма по дневным агрегатам для ещё не сохранённого или изменённого бюджета."""
+    return DailyCategoryTotal.objects.filter(
+        user_id=budget.user_id,
+        category_id=budget.category_id,
+        date__gte=budget.start_date,
+        date__lte=budget.end_date
+    ).aggregate(spent=Sum('total'))['spent'] or Decimal(0)
+
+
+def verify(user_ids=None):
+    """
+    Сравнивает сохранённый spent с пересчитанным по агрегатам.
+    :return: Список расхождений (ключ, сохранено, ожидается)
+    """
+    budgets = Budget.objects.all()
+    if user_ids is not None:
+        budgets = budgets.filter(user_id__in=user_ids)
+    # Sum на SQLite считается во float: сверяем с точностью до копейки
+    return [
+        (('budget', pk), spent, expected)
+        for pk, spent, expected in budgets.annotate(expected=_spent_subquery()).values_list(
+            'pk', 'spent', 'expected'
+        ).iterator()
+        if spent != expected.quantize(CENT)
+    ]
+
+
+@dataclass
+class BudgetStatus:
+    """Исполнение бюджета на дату."""
+    budget: Budget
+    today: date
+
+    @property
+    def days_total(self):
+        return (self.budget.end_date - self.budget.start_date).days + 1
+
+    @property
+    def days_elapsed(self):
+        """Дни периода по сегодняшний включительно."""
+        return min(max((self.today - self.budget.start_date).days + 1, 0), self.days_total)
+
+    @property
+    def days_left(self):
+        """Дни периода после сегодняшнего."""
+        return self.days_total - self.days_elapsed
+
+    @property
+    def remaining(self):
+        return self.budget.amount - self.budget.spent
+
+    @property
+    def burn_rate(self):
+        """Средние траты в день за прошедшую часть периода."""
+        if not self.days_elapsed:
+            return Decimal(0)
+        return self.budget.spent / self.days_elapsed
+
+    @property
+    def projected(self):
+        """Траты к концу периода при текущем темпе."""
+        return self.burn_rate * self.days_total
+
+    @property
+    def daily_allowance(self):
+        """Сколько можно тратить в день до конца периода, не выходя за бюджет."""
+        if self.remaining <= 0:
+            return Decimal(0)
+        return self.remaining / max(self.days_left, 1)
+
+    @property
+    def state(self):
+        if self.budget.spent > self.budget.amount:
+            return 'over'
+        if self.projected > self.budget.amount:
+            return 'at_risk'
+        return 'ok'
+
+    def as_json(self):
+        budget = self.budget
+        return {
+            'id': budget.pk,
+            'category': budget.category.name,
+            'start': budget.start_date.isoformat(),
+            'end': budget.end_date.isoformat(),
+            'amount': float(budget.amount),
+            'spent': float(budget.spent),
+            'remaining': float(self.remaining),
+            'percent': round(float(budget.spent / budget.amount * 100), 1),
+            'days_left': self.days_left,
+            'burn_rate': round(float(self.burn_rate), 2),
+            'projected': round(float(self.projected), 2),
+            'daily_allowance': round(float(self.daily_allowance), 2),
+            'state': self.state,
+        }
+
+
+def budget_statuses(user, today):
+    """
+    Активные на дату бюджеты пользователя: spent хранится в строке бюджета,
+    поэтому все они читаются одним запросом, без агрегации по журналу.
+    """
+    budgets = Budget.objects.filter(
+        user=user,
+        start_date__lte=today,
+        end_date__gte=today
+    ).select_related('category').order_by('end_date', 'pk')
+    return [BudgetStatus(budget, today) for budget in budgets]
@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from apps.home.dashboard import build_dashboard
+from apps.home.goals import goal_progress
+from apps.home.trends import trends
+from apps.routers import replica_reads
+
+
+def _cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'ledger:version:{user_id}'
+
+
+def ledger_version(user_id):
+    """
+    Версия журнала пользователя: меняется при любой записи его транзакций
+    или категорий. Значение — время последнего изменения в наносекундах,
+    поэтому после вытеснения ключа из кэша версия не повторится.
+    """
+    cache = _cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_ledger_version(user_ids):
+    """Инвалидирует всё, что закэшировано для указанных пользователей."""
+    now = time.time_ns()
+    _cache().set_many({_version_key(user_id): now for user_id in user_ids}, None)
+
+
+def get_dashboard(user, months=6):
+    """
+    DashboardData из кэша; при промахе строится и кэшируется.
+    Ключ включает версию журнала и текущий месяц, так что запись
+    транзакции или смена месяца сразу дают новый ключ.
+    """
+    cache = _cache()
+    today = timezone.now().date()
+    key = f'dashboard:{user.pk}:{months}:{today:%Y%m}:{ledger_version(user.pk)}'
+    dashboard = cache.get(key)
+    if dashboard is not None:
+        _count('hits')
+        return dashboard
+
+    _count('misses')
+    with replica_reads(user.pk):
+        dashboard = build_dashboard(user, months=months, today=today)
+    cache.set(key, dashboard, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+def get_goals(user):
+    """
+    Прогресс целей накопления (список словарей для JSON) из кэша.
+    Ключ включает версию журнала и дату: скорость и прогноз зависят от дня.
+    """
+    cache = _cache()
+    today = timezone.now().date()
+    key = f'goals:{user.pk}:{today:%Y%m%d}:{ledger_version(user.pk)}'
+    goals = cache.get(key)
+    if goals is None:
+        with replica_reads(user.pk):
+            goals = [progress.as_json() for progress in goal_progress(user, today)]
+        cache.set(key, goals, settings.DASHBOARD_CACHE_TIMEOUT)
+    return goals
+
+
+def get_trends(user):
+    """Тренды, прогноз и аномалии (apps.home.trends) из кэша; ключ — как у целей."""
+    cache = _cache()
+    today = timezone.now().date()
+    key = f'trends:{user.pk}:{today:%Y%m%d}:{ledger_version(user.pk)}'
+    result = cache.get(key)
+    if result is None:
+        with replica_reads(user.pk):
+            result = trends(user, today)
+        cache.set(key, result, settings.DASHBOARD_CACHE_TIMEOUT)
+    return result
+
+
+def dashboard_stats():
+    """Счётчики попаданий и промахов кэша дашборда."""
+    counters = _cache().get_many(['dashboard:stats:hits', 'dashboard:stats:misses'])
+    return {
+        'hits': counters.get('dashboard:stats:hits', 0),
+        'misses': counters.get('dashboard:stats:misses', 0),
+    }
+
+
+def _count(name):
+    cache = _cache()
+    key = f'dashboard:stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счётчика ещё нет (или он вытеснен)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
@@ -8,4 +8,8 @@ from django.apps import AppConfig
 
 class MyConfig(AppConfig):
     name = 'apps.home'
-    label = 'apps_home'
+    label = 'home'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (поддержка агрегатов по месяцам)
+        from apps.home import handlers  # noqa: F401
@@ -0,0 +1,146 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.home.models import Category, MonthlyCategoryTotal
+from apps.home.utils import month_label, month_start, shift_months
+
+# Имя графика в API (/api/charts/<имя>/) -> ключ в DashboardData.as_charts()
+CHARTS = {
+    'balance': 'main_chart',
+    'income': 'income_chart',
+    'expense': 'expense_chart',
+    'category': 'category_chart',
+}
+
+
+@dataclass
+class DashboardData:
+    """
+    Все ряды дашборда пользователя.
+    Месяцы идут подряд, пропуски заполнены нулями, поэтому ряды доходов,
+    расходов и баланса всегда выровнены с подписями.
+    """
+    months: list
+    income: list
+    expense: list
+    category_labels: list = field(default_factory=list)
+    category_expenses: list = field(default_factory=list)
+
+    @property
+    def labels(self):
+        return [month_label(month) for month in self.months]
+
+    @property
+    def balance(self):
+        return [income - expense for income, expense in zip(self.income, self.expense)]
+
+    def as_charts(self):
+        """Конфигурация графиков Chart.js в том виде, который ждёт demo.js."""
+        labels = self.labels
+        return {
+            'main_chart': {
+                'labels': labels,
+                'datasets': [{
+                    'label': 'Баланс (доходы - расходы)',
+                    'data': self.balance,
+                    'borderColor': '#d346b1',
+                    'pointBackgroundColor': '#d346b1',
+                    'borderWidth': 2,
+                    'fill': True
+                }]
+            },
+            'income_chart': {
+                'labels': labels,
+                'datasets': [{
+                    'label': 'Доходы',
+                    'data': self.income,
+                    'borderColor': '#00d6b4',  # Зеленый для доходов
+                    'pointBackgroundColor': '#00d6b4',
+                    'borderWidth': 2,
+                    'fill': True
+                }]
+            },
+            'expense_chart': {
+                'labels': labels,
+                'datasets': [{
+                    'label': 'Расходы',
+                    'data': self.expense,
+                    'borderColor': '#f44336',  # Красный для расходов
+                    'pointBackgroundColor': '#f44336',
+                    'borderWidth': 2,
+                    'fill': True
+                }]
+            },
+            'category_chart': {
+                'labels': self.category_labels,
+                'datasets': [{
+                    'label': 'Расходы по категориям',
+                    'data': self.category_expenses,
+                    'backgroundColor': '#1f8ef1',  # Синий цвет
+                    'borderColor': '#1f8ef1',
+                    'borderWidth': 2,
+                }]
+            },
+        }
+
+
+def build_dashboard(user, months=6, today=None):
+    """
+    Собирает все ряды дашборда одним запросом к помесячным агрегатам.
+    Месяцы учитываются целиком, включая транзакции с датой после today.
+    :param user: Пользователь, для которого строится дашборд
+    :param months: Количество календарных месяцев, включая текущий
+    :param today: Дата, на которую строится дашборд (по умолчанию сегодня)
+    :return: DashboardData
+    """
+    today = today or timezone.now().date()
+    current_month = month_start(today)
+    first_month = shift_months(current_month, -(months - 1))
+
+    # Одна выборка помесячных агрегатов (месяц, тип, категория) даёт
+    # и суммы по месяцам, и разбивку расходов по категориям за текущий месяц.
+    # Читается O(месяцы × категории) строк вместо всего журнала
+    rows = MonthlyCategoryTotal.objects.filter(
+        user=user,
+        month__gte=first_month,
+        month__lte=current_month
+    ).values('month', 'category__type', 'category__name').annotate(
+        total=Sum('total')
+    ).order_by()
+
+    return _collect(rows, first_month, current_month, months)
+
+
+def _collect(rows, first_month, current_month, months):
+    """Раскладывает сгруппированные строки по рядам дашборда."""
+    month_list = [shift_months(first_month, offset) for offset in range(months)]
+    totals = {
+        Category.INCOME: dict.fromkeys(month_list, Decimal(0)),
+        Category.EXPENSE: dict.fromkeys(month_list, Decimal(0)),
+    }
+    categories = {}
+
+    for row in rows:
+        month = row['month']
+        total = row['total'] or Decimal(0)
+        totals[row['category__type']][month] += total
+        if row['category__type'] == Category.EXPENSE and month == current_month:
+            name = row['category__name']
+            categories[name] = categories.get(name, Decimal(0)) + total
+
+    category_expenses = sorted(categories.items(), key=lambda item: item[1], reverse=True)
+
+    return DashboardData(
+        months=month_list,
+        income=[float(totals[Category.INCOME][month]) for month in month_list],
+        expense=[float(totals[Category.EXPENSE][month]) for month in month_list],
+        category_labels=[name for name, _ in category_expenses],
+        category_expenses=[float(total) for _, total in category_expenses],
+    )
@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import csv
+import json
+
+from django.db.models import Q
+
+from apps.home.models import Transaction
+from apps.routers import read_alias
+
+# Колонки совпадают с тем, что понимает импорт (apps.home.importers)
+EXPORT_COLUMNS = ('date', 'amount', 'type', 'category', 'description')
+EXPORT_FIELDS = ('date', 'amount', 'transaction_type', 'category__name', 'description')
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(user, date_from=None, date_to=None, category_ids=None, using=None):
+    """Транзакции пользователя для выгрузки с фильтрами формы."""
+    queryset = Transaction.objects.using(using or read_alias(user.pk)).filter(user=user)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if category_ids:
+        queryset = queryset.filter(category_id__in=category_ids)
+    return queryset
+
+
+def export_rows(user, date_from=None, date_to=None, category_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Кортежи транзакций пользователя в порядке дат, без создания экземпляров
+    моделей. Читаются порциями export_chunks: iterator() на MySQL не потоковый —
+    драйвер сначала загружает в память весь результат.
+    """
+    chunks = export_chunks(user, date_from, date_to, category_ids, chunk_size)
+    return (row for chunk in chunks for row in chunk)
+
+
+def export_chunks(user, date_from=None, date_to=None, category_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Те же кортежи списками по chunk_size. Каждая порция — отдельный запрос
+    с продолжением после последней пары (date, id), поэтому между порциями
+    не остаётся открытого чтения и можно писать в БД (прогресс фоновой задачи;
+    на SQLite запись при открытом чтении падает).
+    Алиас выбирается сразу: строки читаются уже после выхода из view.
+    """
+    queryset = export_queryset(user, date_from, date_to, category_ids).order_by('date', 'id')
+    return _keyset_chunks(queryset.values_list(*EXPORT_FIELDS, 'id'), chunk_size)
+
+
+def _keyset_chunks(rows, chunk_size):
+    last = None
+    while True:
+        page = rows if last is None else rows.filter(
+            Q(date__gt=last[0]) | Q(date=last[0], id__gt=last[-1])
+        )
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        last = chunk[-1]
+        yield [row[:-1] for row in chunk]
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for date, amount, transaction_type, category, description in rows:
+        yield writer.writerow((date.isoformat(), amount, transaction_type, category, description or ''))
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['date'] = record['date'].isoformat()
+        record['amount'] = str(record['amount'])
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson; charset=utf-8'),
+}
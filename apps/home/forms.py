@@ -23,4 +23,62 @@ class TransactionForm(forms.ModelForm):
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
-        fields = ('name', 'type')
\ No newline at end of file
+        fields = ('name', 'type')
+
+
+class StatementImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+
+    file = forms.FileField(
+        label="Файл выписки",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control"})
+    )
+    statement_format = forms.ChoiceField(
+        label="Формат",
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={"class": "form-control"})
+    )
+    default_category = forms.CharField(
+        label="Категория для строк без категории",
+        initial="Импорт",
+        max_length=255,
+        widget=forms.TextInput(attrs={"class": "form-control"})
+    )
+
+
+class TransactionExportForm(forms.Form):
+    date_from = forms.DateField(required=False, label="С даты")
+    date_to = forms.DateField(required=False, label="По дату")
+    category = forms.TypedMultipleChoiceField(
+        required=False,
+        coerce=int,
+        label="Категории",
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user')
+        super().__init__(*args, **kwargs)
+        self.fields['category'].choices = Category.objects.filter(user=user).values_list('pk', 'name')
+
+
+class TransactionSearchForm(forms.Form):
+    q = forms.CharField(max_length=200, label="Запрос")
+    page = forms.IntegerField(required=False, min_value=1, label="Страница")
+    per_page = forms.IntegerField(required=False, min_value=1, max_value=100, label="На странице")
+
+
+class AnalyticsForm(forms.Form):
+    GRANULARITY_CHOICES = [
+        ('day', 'День'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+        ('quarter', 'Квартал'),
+        ('year', 'Год'),
+    ]
+
+    granularity = forms.ChoiceField(required=False, choices=GRANULARITY_CHOICES, label="Период")
+    date_from = forms.DateField(required=False, label="С даты")
+    date_to = forms.DateField(required=False, label="По дату")
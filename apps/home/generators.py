@@ -0,0 +1,194 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import router, transaction
+
+from apps.home.models import Category, Transaction
+
+# (название, медиана суммы, разброс lognormal, относительная частота)
+INCOME_CATEGORIES = [
+    ('Зарплата', 100000, 0.15, 0),
+    ('Фриланс', 20000, 0.5, 4),
+    ('Инвестиции', 5000, 0.8, 2),
+    ('Подарки', 3000, 0.7, 1),
+    ('Возврат долгов', 2000, 0.6, 1),
+]
+
+EXPENSE_CATEGORIES = [
+    ('Жилье', 35000, 0.1, 0),
+    ('Продукты', 1500, 0.6, 40),
+    ('Транспорт', 300, 0.7, 25),
+    ('Кафе и рестораны', 900, 0.6, 15),
+    ('Развлечения', 1200, 0.8, 6),
+    ('Одежда', 3500, 0.7, 3),
+    ('Здоровье', 1800, 0.9, 3),
+    ('Образование', 4000, 0.8, 1),
+    ('Путешествия', 25000, 0.7, 1),
+    ('Техника', 15000, 0.9, 1),
+]
+
+# Зарплата и аренда приходят раз в месяц в фиксированный день
+MONTHLY = {'Зарплата': 5, 'Жилье': 1}
+
+# Доля случайных транзакций-доходов и всплеск трат в выходные
+INCOME_SHARE = 0.08
+WEEKEND_FACTOR = 1.6
+
+CENT = Decimal('0.01')
+MAX_AMOUNT = 99999999
+
+
+def category_specs(count):
+    """
+    Первые count категорий: реалистичные названия, дальше — «Категория N».
+    Зарплата и Жилье присутствуют всегда.
+    """
+    specs = [(name, Category.INCOME, *rest) for name, *rest in INCOME_CATEGORIES[:1]]
+    specs += [(name, Category.EXPENSE, *rest) for name, *rest in EXPENSE_CATEGORIES[:1]]
+    pool = [(name, Category.EXPENSE, *rest) for name, *rest in EXPENSE_CATEGORIES[1:]]
+    pool += [(name, Category.INCOME, *rest) for name, *rest in INCOME_CATEGORIES[1:]]
+    specs += pool[:max(count - 2, 0)]
+    for number in range(len(specs) + 1, count + 1):
+        category_type = Category.INCOME if number % 5 == 0 else Category.EXPENSE
+        specs.append((f'Категория {number}', category_type, 2000, 0.8, 1))
+    return specs[:max(count, 2)]
+
+
+class LedgerGenerator:
+    """
+    Генератор синтетических пользователей, категорий и транзакций.
+    Один и тот же seed и одни и те же параметры дают одинаковые данные.
+    """
+
+    def __init__(self, users=1, categories=15, transactions=1000, start=None, end=None,
+                 seed=0, prefix='user', password='testpass123', batch_size=5000, progress=None):
+        self.users = users
+        self.specs = category_specs(categories)
+        self.transactions = transactions
+        self.end = end
+        self.start = start or end - timedelta(days=365)
+        self.seed = seed
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def run(self):
+        """:return: (количество пользователей, количество транзакций)"""
+        users = self._create_users()
+        categories = self._create_categories(users)
+        created = 0
+        batch = []
+        for user in users:
+            rng = random.Random(f'{self.seed}:{user.username}')
+            for row in islice(self._ledger(rng, user, categories[user.pk]), self.transactions):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    created += self._write(batch)
+                    batch = []
+        created += self._write(batch)
+        return len(users), created
+
+    def _create_users(self):
+        usernames = [f'{self.prefix}{number}' for number in range(1, self.users + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password(self.password)
+        User.objects.bulk_create(
+            [User(username=username, password=password) for username in usernames if username not in existing],
+            batch_size=self.batch_size
+        )
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        return [users[username] for username in usernames]
+
+    def _create_categories(self, users):
+        existing = set(Category.objects.filter(user__in=users).values_list('user_id', 'name'))
+        Category.objects.bulk_create(
+            [
+                Category(user=user, name=name, type=category_type)
+                for user in users
+                for name, category_type, *_ in self.specs
+                if (user.pk, name) not in existing
+            ],
+            batch_size=self.batch_size
+        )
+        # bulk_create на MySQL не возвращает pk — перечитываем
+        by_name = {}
+        for category in Category.objects.filter(user__in=users, name__in=[spec[0] for spec in self.specs]):
+            by_name[category.user_id, category.name] = category
+        return {
+            user.pk: [(by_name[user.pk, spec[0]], *spec[2:]) for spec in self.specs]
+            for user in users
+        }
+
+    def _ledger(self, rng, user, categories):
+        """Ровно self.transactions транзакций пользователя в хронологическом порядке."""
+        monthly = [(category, MONTHLY[category.name], *params)
+                   for category, *params in categories if category.name in MONTHLY]
+        random_income = [item for item in categories
+                         if item[0].type == Category.INCOME and item[0].name not in MONTHLY]
+        random_expense = [item for item in categories
+                          if item[0].type == Category.EXPENSE and item[0].name not in MONTHLY]
+        pools = [pool for pool in (random_income, random_expense) if pool]
+        cum_weights = {id(pool): list(accumulate(item[3] or 1 for item in pool)) for pool in pools}
+
+        days = [self.start + timedelta(days=offset) for offset in range((self.end - self.start).days + 1)]
+        weights = [WEEKEND_FACTOR if day.weekday() >= 5 else 1 for day in days]
+        fixed = sum(1 for day in days for item in monthly if day.day == item[1])
+        budget = max(self.transactions - fixed, 0) if pools else 0
+        per_weight = budget / sum(weights)
+
+        emitted = 0
+        expected = 0
+        for day, weight in zip(days, weights):
+            for category, day_of_month, median, sigma, _ in monthly:
+                if day.day == day_of_month:
+                    yield self._transaction(rng, user, category, day, median, sigma)
+
+            # Нарастающий итог с дрожанием: по дням количество случайно,
+            # а в сумме за период получается ровно budget
+            expected += per_weight * weight
+            target = min(int(expected + rng.random()), budget) if day < self.end else budget
+            count = max(target - emitted, 0)
+            emitted += count
+            for _ in range(count):
+                if len(pools) == 2:
+                    pool = random_income if rng.random() < INCOME_SHARE else random_expense
+                else:
+                    pool = pools[0]
+                category, median, sigma, _ = rng.choices(pool, cum_weights=cum_weights[id(pool)])[0]
+                yield self._transaction(rng, user, category, day, median, sigma)
+
+    @staticmethod
+    def _transaction(rng, user, category, day, median, sigma):
+        amount = min(max(median * rng.lognormvariate(0, sigma), 1), MAX_AMOUNT)
+        return (user.id, category.id, category.type, round(amount, 2), day, category.name)
+
+    def _write(self, batch):
+        """
+        Пачка вставляется через bulk_create: ledger_changed с приращениями
+        обновляет агрегаты, бюджеты и версию журнала по ходу загрузки,
+        отдельная пересборка в конце не нужна.
+        """
+        if not batch:
+            return 0
+        with transaction.atomic(using=router.db_for_write(Transaction)):
+            Transaction.objects.bulk_create(
+                [
+                    Transaction(user_id=user_id, category_id=category_id, transaction_type=transaction_type,
+                                amount=Decimal(amount).quantize(CENT), date=day, description=description)
+                    for user_id, category_id, transaction_type, amount, day, description in batch
+                ],
+                batch_size=self.batch_size
+            )
+        if self.progress:
+            self.progress(len(batch))
+        return len(batch)
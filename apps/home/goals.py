@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from apps.home.models import SavingsGoal
+
+# Скорость накопления считается по последним VELOCITY_DAYS дням
+VELOCITY_DAYS = 90
+
+
+def _total(condition):
+    return Coalesce(
+        Sum('categories__dailycategorytotal__total', filter=condition),
+        Value(Decimal(0)),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def with_progress(queryset, today):
+    """
+    Добавляет к целям saved (начальная сумма плюс транзакции категорий цели
+    с start_date по today) и recent (то же за последние VELOCITY_DAYS дней).
+    Суммы читаются из дневных агрегатов одним сгруппированным запросом.
+    """
+    daily = 'categories__dailycategorytotal__date'
+    in_goal = Q(**{f'{daily}__gte': F('start_date'), f'{daily}__lte': today})
+    recent = Q(**{f'{daily}__gte': today - timedelta(days=VELOCITY_DAYS - 1)})
+    return queryset.annotate(
+        linked=_total(in_goal),
+        recent=_total(in_goal & recent)
+    ).annotate(saved=F('current_amount') + F('linked'))
+
+
+@dataclass
+class GoalProgress:
+    """Прогресс цели накопления и прогноз даты достижения на дату today."""
+    goal: SavingsGoal
+    today: date
+
+    @property
+    def saved(self):
+        return self.goal.saved
+
+    @property
+    def remaining(self):
+        return max(self.goal.target_amount - self.saved, Decimal(0))
+
+    @property
+    def velocity(self):
+        """Средние накопления в день за последние VELOCITY_DAYS дней (или с начала цели)."""
+        days = min(VELOCITY_DAYS, (self.today - self.goal.start_date).days + 1)
+        if days <= 0:
+            return Decimal(0)
+        return self.goal.recent / days
+
+    @property
+    def projected_date(self):
+        """Дата достижения при текущей скорости; None — цель не растёт."""
+        if not self.remaining:
+            return self.today
+        if self.velocity <= 0:
+            return None
+        return self.today + timedelta(days=math.ceil(self.remaining / self.velocity))
+
+    @property
+    def required_per_day(self):
+        """Сколько откладывать в день, чтобы успеть к target_date."""
+        days = (self.goal.target_date - self.today).days
+        if not self.remaining or days <= 0:
+            return self.remaining
+        return self.remaining / days
+
+    @property
+    def on_track(self):
+        projected = self.projected_date
+        return projected is not None and projected <= self.goal.target_date
+
+    def as_json(self):
+        goal = self.goal
+        projected = self.projected_date
+        return {
+            'id': goal.pk,
+            'name': goal.name,
+            'target': float(goal.target_amount),
+            'saved': float(self.saved),
+            'remaining': float(self.remaining),
+            'percent': round(float(goal.progress()), 1),
+            'start': goal.start_date.isoformat(),
+            'target_date': goal.target_date.isoformat(),
+            'velocity': round(float(self.velocity), 2),
+            'projected_date': projected.isoformat() if projected else None,
+            'required_per_day': round(float(self.required_per_day), 2),
+            'on_track': self.on_track,
+        }
+
+
+def goal_progress(user, today):
+    """Все цели пользователя с прогрессом — один запрос."""
+    goals = with_progress(SavingsGoal.objects.filter(user=user), today).order_by('target_date', 'pk')
+    return [GoalProgress(goal, today) for goal in goals]
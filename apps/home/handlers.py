@@ -0,0 +1,182 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from apps import routers
+from apps.home import budgets, cache, recurring, rollups, search, snapshots
+from apps.home.models import Budget, Category, RecurringTransaction, SavingsGoal, Transaction
+from apps.home.signals import delta_for, ledger_changed
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata: агрегаты пересобираются командой rebuild_rollups
+        return
+    user_ids = {instance.user_id}
+    if created:
+        deltas = [delta_for(instance)]
+    else:
+        previous = _previous_state(instance)
+        if previous is None:
+            # Старые значения неизвестны — агрегаты пользователя пересчитываются
+            deltas = None
+        else:
+            deltas = [delta_for(previous, sign=-1), delta_for(instance)]
+            user_ids.add(previous.user_id)
+    ledger_changed.send(sender=sender, user_ids=user_ids, deltas=deltas)
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields
+    }
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        # Тип категории продублирован в транзакциях — приводим их в соответствие
+        Transaction.objects.filter(category=instance).exclude(
+            transaction_type=instance.type
+        ).update(transaction_type=instance.type)
+    # Название и тип категории видны на дашборде
+    ledger_changed.send(sender=sender, user_ids={instance.user_id}, deltas=[])
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Транзакции и агрегаты категории удалены каскадом без приращений,
+    # поэтому снимок пользователя собирается заново
+    user_ids = {instance.user_id}
+    if snapshots.enabled():
+        transaction.on_commit(lambda: snapshots.invalidate(user_ids))
+    ledger_changed.send(sender=sender, user_ids=user_ids, deltas=[])
+
+
+@receiver(ledger_changed)
+def update_rollups(sender, user_ids, deltas, **kwargs):
+    # Отметка времени до записи агрегатов: снимок, собранный после неё,
+    # мог уже прочитать эти приращения (см. snapshots.append)
+    written = time.time_ns()
+    if deltas is None:
+        rollups.rebuild(user_ids)
+    else:
+        rollups.apply_deltas(deltas)
+    _update_snapshots(user_ids, deltas, written)
+
+
+def _update_snapshots(user_ids, deltas, written):
+    # Снимки собираются по дневным агрегатам и следуют сразу за ними.
+    # Файлы не откатываются вместе с транзакцией БД — пишем после фиксации
+    if not snapshots.enabled():
+        return
+    if deltas is None:
+        transaction.on_commit(lambda: snapshots.invalidate(user_ids))
+    elif deltas:
+        transaction.on_commit(lambda: snapshots.append(deltas, written))
+
+
+@receiver(ledger_changed)
+def update_budgets(sender, user_ids, deltas, **kwargs):
+    # Подключён после update_rollups: пересчёт читает уже пересобранные дневные агрегаты
+    if deltas is None:
+        budgets.recompute(user_ids)
+    else:
+        budgets.apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Budget)
+def budget_saved(sender, instance, raw=False, using=None, **kwargs):
+    # save() записывает и загруженный ранее spent: пересчитываем его в самом
+    # UPDATE, чтобы не потерять приращения, записанные после загрузки бюджета
+    if not raw:
+        budgets.refresh_spent(Budget.objects.using(using).filter(pk=instance.pk))
+        instance.refresh_from_db(fields=['spent'])
+
+
+@receiver(pre_save, sender=RecurringTransaction)
+def recurring_saving(sender, instance, raw=False, **kwargs):
+    # Расписание могло измениться: продолжаем после последней созданной транзакции
+    if not raw:
+        instance.next_date = recurring.next_occurrence(instance, recurring.last_materialized(instance))
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=SavingsGoal)
+@receiver(post_delete, sender=SavingsGoal)
+def plan_changed(sender, instance, raw=False, **kwargs):
+    # Суммы журнала не менялись, но виджеты бюджетов и целей должны обновиться
+    if not raw:
+        ledger_changed.send(sender=sender, user_ids={instance.user_id}, deltas=[])
+
+
+@receiver(m2m_changed, sender=SavingsGoal.categories.through)
+def goal_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance — цель или категория (изменение со стороны category.savings_goals);
+    # у обеих тот же владелец
+    if action == 'pre_add':
+        if reverse:
+            goals, categories = SavingsGoal.objects.filter(pk__in=pk_set), [instance]
+        else:
+            goals, categories = [instance], list(Category.objects.filter(pk__in=pk_set))
+        for goal in goals:
+            goal.validate_categories(categories)
+    if action.startswith('post_'):
+        ledger_changed.send(sender=SavingsGoal, user_ids={instance.user_id}, deltas=[])
+
+
+@receiver(ledger_changed)
+def invalidate_cache(sender, user_ids, **kwargs):
+    # После фиксации: иначе параллельный запрос успеет увидеть новую версию
+    # и закэширует под ней данные, ещё не содержащие запись
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: cache.bump_ledger_version(user_ids))
+
+
+@receiver(ledger_changed)
+def stick_to_primary(sender, user_ids, **kwargs):
+    # Пока реплика не получила запись, аналитика пользователя читается из основной БД
+    routers.mark_written(user_ids)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # SQLite пересоздаёт таблицу при ALTER, и триггеры FTS удаляются вместе со старой
+    if sender.name != 'apps.home' or search.search_backend(using) != 'fts5':
+        return
+    with connections[using].cursor() as cursor:
+        search.install_sqlite_index(cursor)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    # settings.SQLITE_PRAGMAS; journal_mode=WAL сохраняется в файле БД,
+    # остальные PRAGMA действуют только на это соединение
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def _previous_state(instance):
+    """Состояние транзакции на момент загрузки из БД (см. Transaction.from_db)."""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None or not {'user_id', 'category_id', 'date', 'amount'} <= loaded.keys():
+        # Объект собран вручную или загружен через only()/defer()
+        return None
+    return Transaction(
+        user_id=loaded['user_id'],
+        category_id=loaded['category_id'],
+        date=loaded['date'],
+        amount=loaded['amount']
+    )
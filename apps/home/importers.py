@@ -0,0 +1,288 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import csv
+import re
+from collections import Counter, namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from apps.home.models import Category, Transaction
+
+# Строка выписки. amount со знаком: отрицательная сумма — расход.
+# category_type заполняется, только если тип явно указан в файле.
+StatementRow = namedtuple('StatementRow', ['line', 'date', 'amount', 'category', 'description', 'category_type'])
+
+CSV_COLUMNS = {
+    'date': ('date', 'дата'),
+    'amount': ('amount', 'сумма'),
+    'category': ('category', 'категория'),
+    'description': ('description', 'описание', 'memo', 'назначение'),
+    'type': ('type', 'тип'),
+}
+
+TYPE_ALIASES = {
+    'income': Category.INCOME,
+    'доход': Category.INCOME,
+    'expense': Category.EXPENSE,
+    'расход': Category.EXPENSE,
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%Y%m%d')
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+MAX_ERRORS = 100
+
+# Ограничения поля Transaction.amount (max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal('1e8')
+CENT = Decimal('0.01')
+
+
+class StatementError(ValueError):
+    pass
+
+
+class _Invalid(namedtuple('_Invalid', ['line', 'error'])):
+    """Строка, которую не удалось разобрать."""
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    created: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+
+def parse_date(value):
+    # Время, если оно есть, отбрасываем: «2024-01-31 12:00», «2024-01-31T12:00»
+    day = value.strip().split(' ')[0].split('T')[0]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(day, date_format).date()
+        except ValueError:
+            continue
+    raise StatementError(f'Неизвестный формат даты: {value!r}')
+
+
+def parse_amount(value):
+    cleaned = value.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise StatementError(f'Некорректная сумма: {value!r}')
+
+
+def parse_csv(stream, delimiter=None):
+    """
+    Построчно читает CSV-выписку (заголовок обязателен).
+    Колонки: дата, сумма, категория, описание, тип (по-русски или по-английски).
+    """
+    first_line = stream.readline()
+    if delimiter is None:
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    header = next(csv.reader([first_line], delimiter=delimiter))
+    columns = _map_columns(header)
+
+    reader = csv.reader(stream, delimiter=delimiter)
+    for values in reader:
+        if not any(values):
+            continue
+        line = reader.line_num + 1
+        try:
+            row = {name: values[index].strip() for name, index in columns.items() if index < len(values)}
+            category_type = TYPE_ALIASES.get(row.get('type', '').lower())
+            yield StatementRow(
+                line=line,
+                date=parse_date(row.get('date', '')),
+                amount=parse_amount(row.get('amount', '')),
+                category=row.get('category') or None,
+                description=row.get('description') or None,
+                category_type=category_type,
+            )
+        except StatementError as error:
+            yield _Invalid(line, str(error))
+
+
+def parse_ofx(stream, chunk_size=64 * 1024):
+    """
+    Потоково читает OFX (SGML и XML): файл разбирается по тегам кусками,
+    целиком в память не загружается.
+    """
+    current = None
+    number = 0
+    for closing, tag, value in _ofx_tags(stream, chunk_size):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if not closing:
+                current = {}
+                number += 1
+                continue
+            if current is not None:
+                yield _ofx_row(number, current)
+            current = None
+        elif current is not None and not closing:
+            current[tag] = value
+
+
+def _ofx_tags(stream, chunk_size):
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        # Хвост после последнего '<' может быть обрезанным тегом
+        last = buffer.rfind('<')
+        for match in OFX_TAG.finditer(buffer, 0, last):
+            yield match.group(1) == '/', match.group(2), match.group(3).strip()
+        buffer = buffer[last:]
+    for match in OFX_TAG.finditer(buffer):
+        yield match.group(1) == '/', match.group(2), match.group(3).strip()
+
+
+def _ofx_row(number, values):
+    try:
+        description = ' '.join(filter(None, (values.get('NAME'), values.get('MEMO'))))
+        return StatementRow(
+            line=number,
+            date=parse_date(values.get('DTPOSTED', '')[:8]),
+            amount=parse_amount(values.get('TRNAMT', '')),
+            category=None,
+            description=description or None,
+            category_type=None,
+        )
+    except StatementError as error:
+        return _Invalid(number, str(error))
+
+
+def _map_columns(header):
+    columns = {}
+    for index, title in enumerate(header):
+        title = title.strip().lstrip('\ufeff').lower()
+        for name, aliases in CSV_COLUMNS.items():
+            if title in aliases:
+                columns.setdefault(name, index)
+    missing = {'date', 'amount'} - columns.keys()
+    if missing:
+        raise StatementError(f'В заголовке нет колонок: {", ".join(sorted(missing))}')
+    return columns
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+class StatementImporter:
+    """
+    Загружает строки выписки пачками через bulk_create.
+    Память занимает текущая пачка, словарь категорий пользователя и ключи
+    транзакций, которые были в БД до импорта, за даты из выписки.
+    Дубликатом считается транзакция с теми же датой, суммой, категорией
+    и описанием, которая была в БД до начала импорта (с учётом количества
+    повторов). Одинаковые строки самой выписки — разные транзакции, где бы
+    ни проходила граница пачек.
+    """
+
+    def __init__(self, user, batch_size=1000, default_category='Импорт', progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.default_category = default_category
+        self.progress = progress
+        self.categories = {
+            (category.name.lower(), category.type): category
+            for category in Category.objects.filter(user=user)
+        }
+        # Транзакции до импорта: дата читается из БД один раз, до первой
+        # вставки за эту дату, и дальше только расходуется
+        self.existing = Counter()
+        self.loaded_dates = set()
+
+    def run(self, rows):
+        stats = ImportStats()
+        batch = []
+        for row in rows:
+            if isinstance(row, _Invalid):
+                self._error(stats, row.line, row.error)
+                continue
+            stats.read += 1
+            if not row.amount or abs(row.amount) >= MAX_AMOUNT:
+                self._error(stats, row.line, f'Недопустимая сумма: {row.amount}')
+                continue
+            batch.append(self._build(row))
+            if len(batch) >= self.batch_size:
+                self._flush(batch, stats)
+                batch = []
+        if batch:
+            self._flush(batch, stats)
+        return stats
+
+    def _build(self, row):
+        category_type = row.category_type or (
+            Category.EXPENSE if row.amount < 0 else Category.INCOME
+        )
+        category = self._category(row.category or self.default_category, category_type)
+        return Transaction(
+            user=self.user,
+            category=category,
+            transaction_type=category.type,
+            amount=abs(row.amount).quantize(CENT),
+            date=row.date,
+            description=row.description,
+        )
+
+    def _category(self, name, category_type):
+        key = (name.lower(), category_type)
+        category = self.categories.get(key)
+        if category is None:
+            category = Category.objects.create(user=self.user, name=name, type=category_type)
+            self.categories[key] = category
+        return category
+
+    def _flush(self, batch, stats):
+        dates = {obj.date for obj in batch} - self.loaded_dates
+        if dates:
+            self.existing.update(Transaction.objects.filter(
+                user=self.user,
+                date__in=dates,
+            ).values_list('date', 'amount', 'category_id', 'description').order_by())
+            self.loaded_dates |= dates
+
+        new = []
+        for obj in batch:
+            key = (obj.date, obj.amount, obj.category_id, obj.description)
+            if self.existing[key]:
+                self.existing[key] -= 1
+                stats.duplicates += 1
+            else:
+                new.append(obj)
+
+        with transaction.atomic():
+            Transaction.objects.bulk_create(new, batch_size=self.batch_size)
+        stats.created += len(new)
+        if self.progress:
+            self.progress(stats)
+
+    def _error(self, stats, line, message):
+        stats.skipped += 1
+        if len(stats.errors) < MAX_ERRORS:
+            stats.errors.append(f'{line}: {message}')
+
+
+def import_statement(user, stream, statement_format, **options):
+    """
+    Импортирует выписку из текстового потока.
+    :param statement_format: 'csv' или 'ofx'
+    :return: ImportStats
+    """
+    parser = PARSERS[statement_format]
+    importer = StatementImporter(user, **options)
+    return importer.run(parser(stream))
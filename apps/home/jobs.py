@@ -0,0 +1,343 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import io
+import logging
+import os
+import socket
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.home import statements
+from apps.home.exports import EXPORT_FORMATS, export_chunks, export_queryset
+from apps.home.importers import StatementError, import_statement
+from apps.home.models import Job
+from apps.home.signals import ledger_changed
+
+logger = logging.getLogger(__name__)
+
+# Обработчики по Job.kind: функция получает задачу и возвращает результат (JSON)
+TASKS = {}
+
+# Очистка по Job.kind: вызывается, когда задача завершилась успехом или
+# окончательной ошибкой (повторов больше не будет)
+CLEANUPS = {}
+
+# Сколько готовых задач перебирает захват сравнением и заменой (без SKIP LOCKED)
+CLAIM_CANDIDATES = 10
+
+# Пользователей на одну порцию пересчёта агрегатов
+REBUILD_CHUNK = 100
+
+
+class JobError(Exception):
+    """Ошибка во входных данных задачи: повтор не поможет."""
+
+
+class LeaseLost(Exception):
+    """Аренда задачи истекла, и её забрал другой воркер."""
+
+
+def task(kind, cleanup=None):
+    """
+    Регистрирует обработчик задач типа kind.
+    :param cleanup: Функция от задачи, освобождающая её ресурсы после завершения
+    """
+    def register(handler):
+        TASKS[kind] = handler
+        if cleanup is not None:
+            CLEANUPS[kind] = cleanup
+        return handler
+    return register
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, user=None, max_attempts=3, **params):
+    """
+    Ставит задачу в очередь. С JOBS_EAGER задача выполняется сразу
+    после фиксации транзакции, в текущем процессе.
+    :return: Job
+    """
+    if kind not in TASKS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    job = Job.objects.create(kind=kind, user=user, params=params, max_attempts=max_attempts)
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: work(worker_name(), pk=job.pk))
+    return job
+
+
+def claim(worker, kinds=None, pk=None):
+    """
+    Забирает следующую готовую задачу: из очереди или с истёкшей арендой
+    (воркер упал). Где есть SKIP LOCKED, строка блокируется, и параллельные
+    воркеры берут разные задачи; иначе задачу получает тот, чей UPDATE
+    застал её в прежнем состоянии.
+    :return: Job в статусе RUNNING или None
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by('run_after', 'pk')
+    if kinds:
+        ready = ready.filter(kind__in=kinds)
+    if pk is not None:
+        ready = ready.filter(pk=pk)
+
+    if connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is not None:
+                _start(job, worker, now, Job.objects.filter(pk=job.pk))
+            return job
+
+    for job in ready[:CLAIM_CANDIDATES]:
+        # attempts растёт при каждом захвате: второй воркер с тем же снимком строки промахнётся
+        if _start(job, worker, now, Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)):
+            return job
+    return None
+
+
+def _start(job, worker, now, rows):
+    fields = {
+        'status': Job.RUNNING,
+        'attempts': job.attempts + 1,
+        'worker': worker,
+        'started_at': now,
+        'locked_until': now + timedelta(seconds=settings.JOB_LEASE),
+    }
+    if not rows.update(**fields):
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return True
+
+
+def report(job, progress, message=''):
+    """
+    Сохраняет прогресс выполняющейся задачи (0–100) и продлевает аренду.
+    :raises LeaseLost: задачу уже выполняет другой воркер
+    """
+    progress = max(0, min(int(progress), 100))
+    updated = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+        progress=progress,
+        message=message[:255],
+        locked_until=timezone.now() + timedelta(seconds=settings.JOB_LEASE)
+    )
+    if not updated:
+        raise LeaseLost(job.pk)
+    job.progress, job.message = progress, message
+
+
+def run(job):
+    """Выполняет захваченную задачу и записывает результат, ошибку или повтор."""
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+    try:
+        if job.attempts > job.max_attempts:
+            # Воркер падал на этой задаче каждую попытку
+            raise JobError('Превышено число попыток')
+        handler = TASKS.get(job.kind)
+        if handler is None:
+            raise JobError(f'Неизвестный тип задачи: {job.kind}')
+        result = handler(job)
+    except LeaseLost:
+        logger.warning('Задача #%s перешла к другому воркеру', job.pk)
+        return
+    except Exception as error:
+        logger.exception('Задача %s #%s завершилась ошибкой', job.kind, job.pk)
+        now = timezone.now()
+        if isinstance(error, JobError) or job.attempts >= job.max_attempts:
+            if mine.update(status=Job.FAILED, error=traceback.format_exc(), finished_at=now, locked_until=None):
+                _cleanup(job)
+        else:
+            # Повтор с экспоненциальной задержкой: JOB_RETRY_DELAY, x2, x4...
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            mine.update(
+                status=Job.QUEUED, error=traceback.format_exc(), locked_until=None,
+                run_after=now + timedelta(seconds=delay)
+            )
+        return
+    if mine.update(
+        status=Job.DONE, progress=100, result=result, error='',
+        finished_at=timezone.now(), locked_until=None
+    ):
+        _cleanup(job)
+
+
+def _cleanup(job):
+    # Итог уже записан: ошибка очистки только попадает в лог
+    cleanup = CLEANUPS.get(job.kind)
+    if cleanup is None:
+        return
+    try:
+        cleanup(job)
+    except Exception:
+        logger.exception('Не удалось освободить ресурсы задачи %s #%s', job.kind, job.pk)
+
+
+def work(worker, kinds=None, stop=None, poll=1.0, pk=None):
+    """
+    Цикл воркера: забирает и выполняет задачи. Без stop — пока очередь
+    не опустеет; со stop (threading/multiprocessing Event) — пока его не установят.
+    :return: Количество выполненных задач
+    """
+    done = 0
+    while stop is None or not stop.is_set():
+        # Как между запросами: закрыть устаревшие и сломанные соединения
+        close_old_connections()
+        job = claim(worker, kinds, pk)
+        if job is None:
+            if stop is None:
+                break
+            stop.wait(poll)
+            continue
+        try:
+            run(job)
+        except DatabaseError:
+            # Итог не записан: задачу повторит воркер, который заберёт её после истечения аренды
+            logger.exception('Воркер %s потерял связь с БД на задаче #%s', worker, job.pk)
+            if stop is None:
+                break
+            stop.wait(poll)
+            continue
+        done += 1
+    return done
+
+
+def job_path(*parts):
+    """Путь к файлу задачи в JOB_FILES_DIR (каталог создаётся)."""
+    path = os.path.join(settings.JOB_FILES_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def as_json(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'attempts': job.attempts,
+        'result': job.result,
+        'file_url': reverse('job_file', args=[job.pk]) if job.result and 'file' in job.result else None,
+        # Трассировка остаётся в БД и в логе воркера
+        'error': job.error.strip().splitlines()[-1] if job.error else None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def remove_upload(job):
+    """Удаляет загруженный для задачи файл (params.path)."""
+    try:
+        os.remove(job.params['path'])
+    except FileNotFoundError:
+        pass
+
+
+@task('import_statement', cleanup=remove_upload)
+def import_statement_task(job):
+    """Импорт выписки, загруженной во view в JOB_FILES_DIR (params: path, format, default_category)."""
+    params = job.params
+    size = os.path.getsize(params['path']) or 1
+    with io.open(params['path'], 'rb') as raw:
+        stream = io.TextIOWrapper(raw, encoding=params.get('encoding', 'utf-8-sig'), newline='')
+
+        def progress(stats):
+            report(job, raw.tell() * 100 / size, f'Обработано строк: {stats.read}')
+
+        try:
+            stats = import_statement(
+                job.user, stream, params['format'],
+                default_category=params.get('default_category', 'Импорт'),
+                progress=progress,
+            )
+        except (StatementError, UnicodeDecodeError) as error:
+            raise JobError(f'Не удалось прочитать выписку: {error}')
+    return {
+        'created': stats.created,
+        'duplicates': stats.duplicates,
+        'skipped': stats.skipped,
+        'errors': stats.errors,
+    }
+
+
+@task('export')
+def export_task(job):
+    """Выгрузка журнала в файл (params: format, date_from, date_to, category_ids)."""
+    params = job.params
+    export_format = params['format']
+    serializer, content_type = EXPORT_FORMATS[export_format]
+    filters = {
+        'date_from': date.fromisoformat(params['date_from']) if params.get('date_from') else None,
+        'date_to': date.fromisoformat(params['date_to']) if params.get('date_to') else None,
+        'category_ids': params.get('category_ids'),
+    }
+    total = export_queryset(job.user, **filters).count() or 1
+    written = 0
+
+    def rows():
+        nonlocal written
+        for chunk in export_chunks(job.user, **filters):
+            yield from chunk
+            written += len(chunk)
+            report(job, written * 100 / total, f'Выгружено строк: {written}')
+
+    name = f'exports/{job.pk}.{export_format}'
+    with open(job_path(name), 'w', encoding='utf-8', newline='') as file:
+        file.writelines(serializer(rows()))
+    return {
+        'file': name,
+        'filename': f'transactions.{export_format}',
+        'content_type': content_type,
+        'rows': written,
+    }
+
+
+@task('rebuild_rollups')
+def rebuild_rollups_task(job):
+    """
+    Пересчёт агрегатов, бюджетов, кэша и снимков — тем же сигналом, что и
+    после массовых изменений журнала. params.user_ids: пусто — владелец задачи,
+    а у служебной задачи — все пользователи.
+    """
+    user_ids = job.params.get('user_ids')
+    if not user_ids:
+        user_ids = [job.user_id] if job.user_id else list(
+            get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        )
+    for offset in range(0, len(user_ids), REBUILD_CHUNK):
+        chunk = user_ids[offset:offset + REBUILD_CHUNK]
+        with transaction.atomic():
+            ledger_changed.send(sender=Job, user_ids=set(chunk), deltas=None)
+        done = offset + len(chunk)
+        report(job, done * 100 / len(user_ids), f'Пересчитано пользователей: {done}')
+    return {'users': len(user_ids)}
+
+
+@task('statements')
+def statements_task(job):
+    """
+    Выписки за месяц (params: month — YYYY-MM, user_ids). Без user_ids —
+    владелец задачи, а у служебной задачи — все пользователи. Процессы
+    не порождает: параллельность даёт число воркеров run_jobs.
+    """
+    month = date.fromisoformat(f"{job.params['month']}-01")
+    user_ids = job.params.get('user_ids') or ([job.user_id] if job.user_id else None)
+
+    def progress(done, total):
+        report(job, done * 100 / max(total, 1), f'Собрано выписок: {done}')
+
+    return {'month': f'{month:%Y-%m}', 'statements': statements.generate_month(month, user_ids, progress=progress)}
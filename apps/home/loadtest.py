@@ -0,0 +1,163 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.utils.module_loading import import_string
+
+GUNICORN_CONFIG = os.path.join(settings.BASE_DIR, 'gunicorn-cfg.py')
+
+
+def session_cookie(user):
+    """
+    Cookie сессии, в которой user уже вошёл: нагрузка идёт на страницы
+    под login_required без формы входа.
+    """
+    session = import_string(f'{settings.SESSION_ENGINE}.SessionStore')()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+class GunicornServer:
+    """
+    Gunicorn с gunicorn-cfg.py на свободном локальном порту. Размер задаётся
+    теми же переменными окружения, что и в production (GUNICORN_WORKERS, ...).
+    """
+
+    def __init__(self, workers, threads, asgi=False, start_timeout=30):
+        self.workers = workers
+        self.threads = threads
+        self.asgi = asgi
+        self.start_timeout = start_timeout
+        self.port = _free_port()
+        self.process = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        environment = dict(
+            os.environ,
+            GUNICORN_BIND=f'127.0.0.1:{self.port}',
+            GUNICORN_WORKERS=str(self.workers),
+            GUNICORN_THREADS=str(self.threads),
+            GUNICORN_ASGI=str(self.asgi),
+            GUNICORN_ACCESSLOG='',
+            GUNICORN_LOGLEVEL='warning',
+            # Рабочий каталог не меняется: относительный путь к SQLite указывает
+            # на ту же БД, что и у команды, запустившей тест
+            PYTHONPATH=os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get('PYTHONPATH')])),
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', GUNICORN_CONFIG], env=environment
+        )
+        self._wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=self.start_timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def _wait(self):
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn завершился с кодом {self.process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f'gunicorn не начал принимать соединения за {self.start_timeout} с')
+
+
+def run_load(base_url, paths, concurrency=8, duration=10, cookie=None, warmup=1):
+    """
+    concurrency клиентов с keep-alive по кругу запрашивают paths в течение
+    duration секунд.
+    :return: {'requests', 'errors', 'rps', 'median_ms', 'p95_ms'}
+    """
+    address = urlsplit(base_url)
+    headers = {'Cookie': cookie} if cookie else {}
+    timings = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    measure_from = [0.0]
+    stop_at = [0.0]
+
+    def client(offset):
+        connection = http.client.HTTPConnection(address.hostname, address.port, timeout=60)
+        done, failed = [], 0
+        start.wait()
+        number = offset
+        while time.monotonic() < stop_at[0]:
+            path = paths[number % len(paths)]
+            number += 1
+            started = time.monotonic()
+            ok = False
+            # Второй попытки требует закрытое сервером keep-alive соединение:
+            # воркер перезапустился после max_requests
+            for _ in range(2):
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status < 400
+                    break
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+            finished = time.monotonic()
+            # Первые warmup секунд не считаются: воркеры прогревают кэши
+            if started >= measure_from[0]:
+                if ok:
+                    done.append((finished - started) * 1000)
+                else:
+                    failed += 1
+        connection.close()
+        with lock:
+            timings.extend(done)
+            errors.append(failed)
+
+    workers = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    measure_from[0] = time.monotonic() + warmup
+    stop_at[0] = measure_from[0] + duration
+    start.wait()
+    for worker in workers:
+        worker.join()
+
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'errors': sum(errors),
+        'rps': round(len(timings) / duration, 1),
+        'median_ms': round(statistics.median(timings), 2) if timings else None,
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2) if timings else None,
+    }
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
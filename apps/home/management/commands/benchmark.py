@@ -0,0 +1,87 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apps.home.benchmarks import environment, prepare_user, run_benchmarks
+from apps.home.generators import LedgerGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет горячие пути (дашборд, get_monthly_balance, админка, вход) на '
+        'отдельной тестовой БД, заполненной синтетическими данными'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Количество пользователей')
+        parser.add_argument('--transactions', type=int, default=100000, help='Транзакций на пользователя')
+        parser.add_argument('--categories', type=int, default=15, help='Категорий на пользователя')
+        parser.add_argument('--years', type=float, default=3, help='Глубина истории в годах')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора данных')
+        parser.add_argument('--repeat', type=int, default=10, help='Повторов каждого сценария')
+        parser.add_argument('--only', action='append', help='Запустить только указанный сценарий')
+        parser.add_argument('--output', help='Записать результаты в JSON-файл')
+        parser.add_argument('--compare', help='JSON предыдущего прогона для сравнения медиан')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую БД и не заполнять её повторно')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        scale = {
+            key: options[key] for key in ('users', 'transactions', 'categories', 'years', 'seed')
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, keepdb=options['keepdb'])
+        try:
+            self._seed(options, today)
+            user = prepare_user('bench1')
+            results = run_benchmarks(user, repeat=options['repeat'], only=options['only'], today=today)
+            report = {'environment': environment(scale), 'results': results}
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self._print(results, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+
+    def _seed(self, options, today):
+        from django.contrib.auth.models import User
+
+        if options['keepdb'] and User.objects.filter(username='bench1').exists():
+            return
+        started = time.monotonic()
+        users, created = LedgerGenerator(
+            users=options['users'],
+            categories=options['categories'],
+            transactions=options['transactions'],
+            end=today,
+            start=today - timezone.timedelta(days=int(options['years'] * 365)),
+            seed=options['seed'],
+            prefix='bench',
+        ).run()
+        self.stdout.write(f'Данные: {users} пользователей, {created} транзакций '
+                          f'({time.monotonic() - started:.1f} с)')
+
+    def _print(self, results, compare):
+        baseline = {}
+        if compare:
+            with open(compare, encoding='utf-8') as previous:
+                baseline = json.load(previous)['results']
+
+        self.stdout.write(f'{"сценарий":<24}{"медиана, мс":>12}{"p95, мс":>10}{"запросы":>9}{"память, КБ":>12}')
+        for name, metrics in results.items():
+            line = (f'{name:<24}{metrics["median_ms"]:>12.2f}{metrics["p95_ms"]:>10.2f}'
+                    f'{metrics["queries"]:>9}{metrics["peak_memory_kb"]:>12.1f}')
+            if name in baseline:
+                ratio = metrics['median_ms'] / baseline[name]['median_ms'] if baseline[name]['median_ms'] else 0
+                line += f'  x{ratio:.2f} к базовому'
+            self.stdout.write(line)
@@ -0,0 +1,57 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.home.generators import LedgerGenerator
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями, категориями и транзакциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Количество пользователей (N)')
+        parser.add_argument('--categories', type=int, default=15, help='Категорий на пользователя (M)')
+        parser.add_argument('--transactions', type=int, default=1000, help='Транзакций на пользователя (K)')
+        parser.add_argument('--years', type=float, default=1, help='Глубина истории в годах')
+        parser.add_argument('--end', type=date.fromisoformat, help='Последний день истории (YYYY-MM-DD), по умолчанию сегодня')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора случайных чисел')
+        parser.add_argument('--prefix', default='user', help='Префикс имён пользователей: user1, user2, ...')
+        parser.add_argument('--password', default='testpass123', help='Пароль всех пользователей')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['transactions'] < 0 or options['categories'] < 2:
+            raise CommandError('Нужны хотя бы 1 пользователь и 2 категории')
+
+        end = options['end'] or timezone.now().date()
+        start = end - timezone.timedelta(days=int(options['years'] * 365))
+        total = options['users'] * options['transactions']
+        started = time.monotonic()
+        written = 0
+
+        def progress(count):
+            nonlocal written
+            written += count
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{written}/{total} транзакций, {written / elapsed:.0f} в секунду')
+
+        self.stdout.write("Создание тестовых данных...")
+        users, created = LedgerGenerator(
+            users=options['users'],
+            categories=options['categories'],
+            transactions=options['transactions'],
+            start=start,
+            end=end,
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        ).run()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Успешно созданы тестовые данные: {users} пользователей и {created} транзакций '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
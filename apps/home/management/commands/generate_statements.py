@@ -0,0 +1,47 @@
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.home import statements
+from apps.home.utils import shift_months
+
+
+def _month(value):
+    try:
+        return date.fromisoformat(f'{value}-01')
+    except ValueError:
+        raise ValueError(f'Месяц в формате YYYY-MM: {value}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает выписки за месяц (HTML, CSV и PDF при установленном reportlab) '
+        'для всех пользователей в несколько процессов и записывает манифест. '
+        'Запускается после закрытия месяца; повторный запуск пересобирает выписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=_month,
+                            help='Месяц (YYYY-MM), по умолчанию — прошлый')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Собрать только для этого пользователя (можно указать несколько раз)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Число процессов; по умолчанию — по числу ядер')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('Нужен хотя бы один процесс')
+        month = options['month'] or shift_months(timezone.now().date().replace(day=1), -1)
+        if not statements.pdf_available():
+            self.stdout.write(self.style.WARNING('PDF не собирается: нужен reportlab и STATEMENT_PDF_FONT'))
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total}')
+
+        count = statements.generate_month(month, options['user_ids'], options['workers'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выписок за {month:%Y-%m}: {count} ({", ".join(statements.formats())}), '
+            f'каталог {statements.month_directory(month)}'
+        ))
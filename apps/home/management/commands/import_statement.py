@@ -0,0 +1,62 @@
+import io
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home.importers import PARSERS, StatementError, import_statement
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Импортирует банковскую выписку (CSV или OFX) в транзакции пользователя'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу выписки')
+        parser.add_argument('--user', required=True, help='Имя пользователя')
+        parser.add_argument(
+            '--format', choices=sorted(PARSERS), dest='statement_format',
+            help='Формат файла; по умолчанию определяется по расширению'
+        )
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка файла')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create')
+        parser.add_argument('--default-category', default='Импорт',
+                            help='Категория для строк без категории (OFX)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["user"]} не найден')
+
+        path = options['path']
+        statement_format = options['statement_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if statement_format not in PARSERS:
+            raise CommandError('Укажите формат выписки через --format')
+
+        def progress(stats):
+            self.stdout.write(
+                f'Обработано {stats.read}: добавлено {stats.created}, '
+                f'дубликатов {stats.duplicates}, пропущено {stats.skipped}'
+            )
+
+        with io.open(path, encoding=options['encoding'], newline='') as stream:
+            try:
+                stats = import_statement(
+                    user,
+                    stream,
+                    statement_format,
+                    batch_size=options['batch_size'],
+                    default_category=options['default_category'],
+                    progress=progress,
+                )
+            except StatementError as error:
+                raise CommandError(str(error))
+
+        for error in stats.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён: добавлено {stats.created}, дубликатов {stats.duplicates}, '
+            f'пропущено {stats.skipped}'
+        ))
@@ -0,0 +1,75 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home.loadtest import GunicornServer, run_load, session_cookie
+
+DEFAULT_PATHS = ['/api/charts/balance/', '/api/charts/category/', '/api/analytics/?granularity=week']
+
+
+def _profile(value):
+    # '4x2' — 4 воркера по 2 потока
+    try:
+        workers, threads = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise CommandError(f'Профиль «{value}»: ожидается ВОРКЕРЫxПОТОКИ, например 4x2')
+    return workers, threads
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: запускает gunicorn с gunicorn-cfg.py в нескольких профилях '
+        '(воркеры × потоки) и сравнивает пропускную способность на текущей БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Имя пользователя, от которого идут запросы')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Путь для запросов (можно указать несколько раз)')
+        parser.add_argument('--profile', action='append', dest='profiles',
+                            help='ВОРКЕРЫxПОТОКИ (можно указать несколько раз); по умолчанию 1x1, 2x1, 2x4')
+        parser.add_argument('--asgi', action='store_true', help='Воркеры uvicorn вместо gthread')
+        parser.add_argument('--url', help='Нагружать уже запущенный сервер вместо запуска gunicorn')
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременных клиентов')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность замера, с')
+        parser.add_argument('--output', help='Записать результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["user"]} не найден')
+        paths = options['paths'] or DEFAULT_PATHS
+        cookie = session_cookie(user)
+
+        def load(url):
+            return run_load(url, paths, concurrency=options['concurrency'],
+                            duration=options['duration'], cookie=cookie)
+
+        results = {}
+        if options['url']:
+            results[options['url']] = load(options['url'])
+        else:
+            for workers, threads in map(_profile, options['profiles'] or ['1x1', '2x1', '2x4']):
+                name = f'{workers}x{threads}' + (' asgi' if options['asgi'] else '')
+                self.stdout.write(f'{name}: {options["duration"]:g} с, {options["concurrency"]} клиентов...')
+                with GunicornServer(workers, threads, asgi=options['asgi']) as server:
+                    results[name] = load(server.url)
+
+        self._print(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({'paths': paths, 'concurrency': options['concurrency'], 'results': results},
+                          output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+
+    def _print(self, results):
+        baseline = next(iter(results.values()))['rps']
+        self.stdout.write(f'{"профиль":<24}{"запр./с":>10}{"медиана, мс":>13}{"p95, мс":>10}{"ошибки":>8}')
+        for name, metrics in results.items():
+            line = (f'{name:<24}{metrics["rps"]:>10.1f}{metrics["median_ms"] or 0:>13.2f}'
+                    f'{metrics["p95_ms"] or 0:>10.2f}{metrics["errors"]:>8}')
+            if baseline:
+                line += f'  x{metrics["rps"] / baseline:.2f}'
+            self.stdout.write(line)
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.home import recurring
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт транзакции по регулярным шаблонам, у которых подошла дата, '
+        'в том числе пропущенные за время простоя. Можно запускать параллельно'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Создать повторения по эту дату (YYYY-MM-DD), по умолчанию сегодня')
+        parser.add_argument('--batch-size', type=int, default=500, help='Шаблонов в одной транзакции БД')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+        today = options['date'] or timezone.now().date()
+        created, claimed = recurring.materialize(today, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Создано транзакций: {created}, шаблонов обработано: {claimed}'))
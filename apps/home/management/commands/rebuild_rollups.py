@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home import budgets, rollups, snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает или проверяет агрегаты транзакций (MonthlyCategoryTotal, DailyCategoryTotal) '
+        'потраченные суммы бюджетов и снимки журнала'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='ID пользователя (можно указать несколько раз); по умолчанию — все'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить агрегаты с журналом, ничего не изменяя'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if options['verify']:
+            mismatches = rollups.verify(user_ids) + budgets.verify(user_ids) + snapshots.verify(user_ids)
+            for key, stored, expected in mismatches:
+                self.stdout.write(f'{key}: сохранено {stored}, ожидается {expected}')
+            if mismatches:
+                raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+            self.stdout.write(self.style.SUCCESS('Агрегаты совпадают с журналом транзакций'))
+            return
+
+        created = rollups.rebuild(user_ids)
+        updated = budgets.recompute(user_ids)
+        # Снимки соберутся из новых агрегатов при следующем чтении
+        snapshots.invalidate(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Агрегаты пересобраны: {created} строк, бюджетов: {updated}'))
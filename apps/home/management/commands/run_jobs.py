@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.home import jobs
+
+
+def _worker(kinds, stop, poll):
+    # Ctrl+C и SIGTERM обрабатывает родитель: он просит воркеры закончить текущую задачу
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    jobs.work(jobs.worker_name(), kinds, stop, poll)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркеры фоновых задач (импорт, выгрузка, пересчёт агрегатов, выписки). '
+        'Очередь — таблица Job, внешний брокер не нужен'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Число процессов-воркеров; по умолчанию — по числу ядер')
+        parser.add_argument('--kind', action='append', dest='kinds', choices=sorted(jobs.TASKS),
+                            help='Выполнять только задачи этого типа (можно указать несколько раз)')
+        parser.add_argument('--poll', type=float, default=1.0, help='Пауза при пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи в текущем процессе и завершиться')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('Нужен хотя бы один воркер')
+        if options['once']:
+            done = jobs.work(jobs.worker_name(), options['kinds'])
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+
+        # Дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        processes = [
+            context.Process(target=_worker, args=(options['kinds'], stop, options['poll']), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено воркеров: {len(processes)}')
+
+        def shutdown(signum, frame):
+            self.stdout.write('Остановка: воркеры завершают текущие задачи')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.8 on 2026-10-18 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def fill_monthly_totals(apps, schema_editor):
+    Transaction = apps.get_model('home', 'Transaction')
+    MonthlyCategoryTotal = apps.get_model('home', 'MonthlyCategoryTotal')
+    rows = Transaction.objects.annotate(
+        month=TruncMonth('date')
+    ).values('user_id', 'category_id', 'month').annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
+    MonthlyCategoryTotal.objects.bulk_create(
+        (MonthlyCategoryTotal(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('home', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество транзакций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.category', verbose_name='Категория')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Итог за месяц',
+                'verbose_name_plural': 'Итоги за месяц',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycategorytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'month'), name='home_monthly_total_unique'),
+        ),
+        migrations.RunPython(fill_monthly_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_monthlycategorytotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='monthlycategorytotal',
+            index=models.Index(fields=['user', 'month'], name='home_total_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date'], name='home_trans_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'date'], name='home_trans_user_cat_date_idx'),
+        ),
+    ]
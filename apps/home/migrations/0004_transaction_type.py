@@ -0,0 +1,33 @@
+# Generated by Django 4.2.8 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+def copy_category_type(apps, schema_editor):
+    Category = apps.get_model('home', 'Category')
+    Transaction = apps.get_model('home', 'Transaction')
+    for category_type in ('income', 'expense'):
+        Transaction.objects.filter(
+            category__in=Category.objects.filter(type=category_type)
+        ).update(transaction_type=category_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], default='', editable=False, max_length=10, verbose_name='Тип транзакции'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_category_type, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_type', 'date'], name='home_trans_user_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.8 on 2026-10-18 21:05
+
+from django.db import migrations
+
+# SQL зафиксирован здесь, а не импортируется из apps.home.search: миграция
+# должна применяться одинаково, как бы ни менялся модуль поиска
+FTS_TABLE = 'home_transaction_fts'
+MYSQL_INDEX = 'home_trans_desc_fts'
+
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"description, category, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+SQLITE_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON home_transaction BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, description, category, owner)
+        VALUES (new.id, new.description, (SELECT name FROM home_category WHERE id = new.category_id),
+                'u' || new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON home_transaction BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description, category_id, user_id
+        ON home_transaction BEGIN
+        UPDATE {FTS_TABLE}
+        SET description = new.description,
+            category = (SELECT name FROM home_category WHERE id = new.category_id),
+            owner = 'u' || new.user_id
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_category AFTER UPDATE OF name ON home_category BEGIN
+        UPDATE {FTS_TABLE} SET category = new.name
+        WHERE rowid IN (SELECT id FROM home_transaction WHERE category_id = new.id);
+    END""",
+)
+
+SQLITE_FILL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, description, category, owner) "
+    f"SELECT t.id, t.description, c.name, 'u' || t.user_id "
+    f"FROM home_transaction t JOIN home_category c ON c.id = t.category_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+                # Без FTS5 поиск работает через icontains (apps.home.search)
+                return
+            cursor.execute(SQLITE_CREATE)
+            for sql in SQLITE_TRIGGERS:
+                cursor.execute(sql)
+            cursor.execute(SQLITE_FILL)
+    elif connection.vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE home_transaction ADD FULLTEXT INDEX {MYSQL_INDEX} (description)')
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in ('insert', 'delete', 'update', 'category'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif connection.vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE home_transaction DROP INDEX {MYSQL_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_transaction_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.8 on 2026-10-18 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_daily_totals(apps, schema_editor):
+    Transaction = apps.get_model('home', 'Transaction')
+    DailyCategoryTotal = apps.get_model('home', 'DailyCategoryTotal')
+    rows = Transaction.objects.values('user_id', 'category_id', 'date').annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
+    DailyCategoryTotal.objects.bulk_create(
+        (DailyCategoryTotal(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('home', '0005_transaction_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество транзакций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.category', verbose_name='Категория')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Итог за день',
+                'verbose_name_plural': 'Итоги за день',
+                'indexes': [models.Index(fields=['user', 'date'], name='home_daily_user_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'date'), name='home_daily_total_unique'),
+        ),
+        migrations.RunPython(fill_daily_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-18 20:16
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_budget_spent(apps, schema_editor):
+    Budget = apps.get_model('home', 'Budget')
+    DailyCategoryTotal = apps.get_model('home', 'DailyCategoryTotal')
+    spent = DailyCategoryTotal.objects.filter(
+        user_id=OuterRef('user_id'),
+        category_id=OuterRef('category_id'),
+        date__gte=OuterRef('start_date'),
+        date__lte=OuterRef('end_date')
+    ).values('category_id').annotate(spent=Sum('total')).values('spent')
+    Budget.objects.update(spent=Coalesce(
+        Subquery(spent), Value(Decimal(0)), output_field=DecimalField(max_digits=14, decimal_places=2)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_dailycategorytotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Потрачено'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'category', 'start_date'], name='home_budget_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'end_date'], name='home_budget_user_end_idx'),
+        ),
+        migrations.RunPython(fill_budget_spent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-18 20:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_budget_spent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savingsgoal',
+            name='categories',
+            field=models.ManyToManyField(blank=True, related_name='savings_goals', to='home.category', verbose_name='Категории накоплений'),
+        ),
+        migrations.AddField(
+            model_name='savingsgoal',
+            name='start_date',
+            field=models.DateField(default=django.utils.timezone.now, verbose_name='Начало накопления'),
+        ),
+        migrations.AlterField(
+            model_name='savingsgoal',
+            name='current_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Начальная сумма'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.8 on 2026-10-18 20:27
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def drop_search_triggers(apps, schema_editor):
+    # Ограничение на home_transaction в SQLite пересоздаёт таблицу, а триггер
+    # на home_category ссылается на журнал: SQLite не даёт переименовать новую
+    # таблицу, пока он существует. Триггеры возвращаются после миграции
+    # (handlers.restore_search_triggers)
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in ('insert', 'delete', 'update', 'category'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS home_transaction_fts_{name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('home', '0008_savings_goal_categories'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RecurringTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Сумма')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('frequency', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно'), ('monthly', 'Ежемесячно'), ('yearly', 'Ежегодно')], default='monthly', max_length=10, verbose_name='Периодичность')),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Повторять каждые N периодов', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Интервал')),
+                ('start_date', models.DateField(default=django.utils.timezone.now, help_text='Прошедшие даты будут созданы при следующем запуске планировщика', verbose_name='Первая дата')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Последняя дата')),
+                ('next_date', models.DateField(editable=False, null=True, verbose_name='Следующая дата')),
+            ],
+            options={
+                'verbose_name': 'Регулярная транзакция',
+                'verbose_name_plural': 'Регулярные транзакции',
+            },
+        ),
+        migrations.AddField(
+            model_name='recurringtransaction',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.category', verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='recurringtransaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='home.recurringtransaction', verbose_name='Регулярная транзакция'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'date'), name='home_trans_recurrence_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtransaction',
+            index=models.Index(fields=['next_date'], name='home_recurring_next_idx'),
+        ),
+        # Откат тоже пересоздаёт home_transaction
+        migrations.RunPython(migrations.RunPython.noop, drop_search_triggers),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-18 20:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recurringtransaction',
+            name='start_date',
+            field=models.DateField(default=django.utils.timezone.localdate, help_text='Прошедшие даты будут созданы при следующем запуске планировщика', verbose_name='Первая дата'),
+        ),
+        migrations.AlterField(
+            model_name='savingsgoal',
+            name='categories',
+            field=models.ManyToManyField(blank=True, limit_choices_to={'type': 'income'}, related_name='savings_goals', to='home.category', verbose_name='Категории накоплений'),
+        ),
+        migrations.AlterField(
+            model_name='savingsgoal',
+            name='start_date',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='Начало накопления'),
+        ),
+    ]
@@ -1,12 +1,55 @@
-from datetime import timedelta
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db.models import Sum, Q
-from django.db.models.functions import TruncMonth
+from django.db.models import Count, Sum
 from django.utils import timezone
 
+from apps.home.signals import LedgerDelta, delta_for, ledger_changed
+
+class CategoryQuerySet(models.QuerySet):
+    """Массовые изменения категорий меняют и представление журнала."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._changed({obj.user_id for obj in objs})
+        return objs
+
+    def update(self, **kwargs):
+        category_ids = list(self.values_list('pk', flat=True))
+        user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+        rows = super().update(**kwargs)
+        if 'type' in kwargs:
+            self._sync_transaction_types(category_ids, kwargs['type'])
+        self._changed(user_ids)
+        return rows
+
+    update.alters_data = True
+
+    def _sync_transaction_types(self, category_ids, category_type):
+        """
+        Переписывает transaction_type журнала: один UPDATE на тип, а не на категорию.
+        bulk_update передаёт тип выражением CASE по pk категорий — тогда
+        новые типы перечитываются после UPDATE категорий.
+        """
+        if hasattr(category_type, 'resolve_expression'):
+            by_type = defaultdict(list)
+            for pk, value in self.model.objects.filter(pk__in=category_ids).values_list('pk', 'type'):
+                by_type[value].append(pk)
+        else:
+            by_type = {category_type: category_ids}
+        for value, pks in by_type.items():
+            Transaction.objects.filter(category_id__in=pks).exclude(
+                transaction_type=value
+            ).update(transaction_type=value)
+
+    def _changed(self, user_ids):
+        if user_ids:
+            ledger_changed.send(sender=self.model, user_ids=user_ids, deltas=[])
+
+
 class Category(models.Model):
     INCOME = 'income'
     EXPENSE = 'expense'
@@ -23,6 +66,8 @@ class Category(models.Model):
         verbose_name="Тип категории"
     )
 
+    objects = CategoryQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.get_type_display()} - {self.name}"
 
@@ -31,6 +76,84 @@ class Category(models.Model):
         verbose_name_plural = "Категории"
 
 
+class TransactionQuerySet(models.QuerySet):
+    """
+    Массовые операции не вызывают post_save/post_delete,
+    поэтому об изменениях журнала сообщаем явно через ledger_changed.
+    """
+    # Поля, от которых зависят суммы в агрегатах
+    LEDGER_FIELDS = {'user', 'user_id', 'category', 'category_id', 'date', 'amount'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self._fill_transaction_type(objs)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        user_ids = {obj.user_id for obj in objs}
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            # Неизвестно, какие строки реально вставлены
+            deltas = None
+        else:
+            deltas = [delta_for(obj) for obj in objs]
+        if user_ids:
+            ledger_changed.send(sender=self.model, user_ids=user_ids, deltas=deltas)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        user_ids = {obj.user_id for obj in objs}
+        if user_ids:
+            ledger_changed.send(sender=self.model, user_ids=user_ids, deltas=None)
+        return rows
+
+    def update(self, **kwargs):
+        user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+        rows = super().update(**kwargs)
+        if 'user' in kwargs:
+            user_ids.add(getattr(kwargs['user'], 'pk', kwargs['user']))
+        # Если суммы, даты и категории не менялись, приращений нет
+        deltas = None if self.LEDGER_FIELDS & kwargs.keys() else []
+        if user_ids:
+            ledger_changed.send(sender=self.model, user_ids=user_ids, deltas=deltas)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        # Приращения считаются одним сгруппированным запросом до удаления.
+        # Получателя post_delete у Transaction нет, поэтому Django удаляет
+        # строки одним DELETE, не загружая их (и так же — каскадом)
+        with transaction.atomic(using=self.db):
+            removed = list(self.order_by().values_list('user_id', 'category_id', 'date').annotate(
+                total=Sum('amount'), count=Count('pk')
+            ))
+            result = super().delete()
+            if removed:
+                ledger_changed.send(
+                    sender=self.model,
+                    user_ids={user_id for user_id, *_ in removed},
+                    deltas=[
+                        LedgerDelta(user_id, category_id, day, -total, -count)
+                        for user_id, category_id, day, total, count in removed
+                    ]
+                )
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    @staticmethod
+    def _fill_transaction_type(objs):
+        """Проставляет тип из категории одним запросом на всю пачку."""
+        missing = {obj.category_id for obj in objs if not obj.transaction_type}
+        if not missing:
+            return
+        types = dict(Category.objects.filter(pk__in=missing).values_list('pk', 'type'))
+        for obj in objs:
+            if not obj.transaction_type:
+                obj.transaction_type = types[obj.category_id]
+
+
 class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(
@@ -53,10 +176,54 @@ class Transaction(models.Model):
         null=True,
         verbose_name="Описание"
     )
+    # Копия Category.type: фильтры по типу не требуют JOIN с категориями.
+    # Синхронизируется в save() и при смене типа категории (handlers.py)
+    transaction_type = models.CharField(
+        max_length=10,
+        choices=Category.TYPE_CHOICES,
+        editable=False,
+        verbose_name="Тип транзакции"
+    )
+    # Шаблон, по которому транзакция создана планировщиком; вместе с датой —
+    # ключ идемпотентности (apps.home.recurring). Отдельный индекс не нужен:
+    # его заменяет уникальное ограничение (recurrence, date)
+    recurrence = models.ForeignKey(
+        'RecurringTransaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        related_name='transactions',
+        verbose_name="Регулярная транзакция"
+    )
 
-    @property
-    def transaction_type(self):
-        return self.category.type
+    objects = TransactionQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженное состояние, чтобы при сохранении
+        # снять старую сумму с агрегатов без дополнительного запроса
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', {})
+        if not self.transaction_type or self.category_id != loaded.get('category_id'):
+            self.transaction_type = self.category.type
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'transaction_type' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'transaction_type']
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Вместо post_delete: с получателем сигнала каскадные удаления
+        # (категория, пользователь) загружали бы каждую транзакцию
+        with transaction.atomic(using=kwargs.get('using') or self._state.db):
+            result = super().delete(*args, **kwargs)
+            ledger_changed.send(sender=Transaction, user_ids={self.user_id}, deltas=[delta_for(self, sign=-1)])
+        return result
 
     def __str__(self):
         return f"{self.date} - {self.category.name}: {self.amount}"
@@ -65,6 +232,21 @@ class Transaction(models.Model):
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
         ordering = ['-date']
+        constraints = [
+            # Повторение шаблона создаётся не больше одного раза
+            models.UniqueConstraint(
+                fields=['recurrence', 'date'],
+                name='home_trans_recurrence_unique'
+            ),
+        ]
+        indexes = [
+            # Журнал пользователя за период: дашборд, админка, пересчёт агрегатов
+            models.Index(fields=['user', 'date'], name='home_trans_user_date_idx'),
+            # Суммы по категории за период (бюджеты, фильтры админки)
+            models.Index(fields=['user', 'category', 'date'], name='home_trans_user_cat_date_idx'),
+            # Доходы или расходы пользователя за период
+            models.Index(fields=['user', 'transaction_type', 'date'], name='home_trans_user_type_date_idx'),
+        ]
 
     @classmethod
     def get_monthly_balance(cls, user, months=6):
@@ -75,40 +257,76 @@ class Transaction(models.Model):
         :param months: Количество месяцев для анализа (по умолчанию 6)
         :return: Словарь с метками (месяцы) и данными (разница)
         """
-        MONTH_TRANSLATIONS = {
-            'Jan': 'Янв',
-            'Feb': 'Фев',
-            'Mar': 'Мар',
-            'Apr': 'Апр',
-            'May': 'Май',
-            'Jun': 'Июн',
-            'Jul': 'Июл',
-            'Aug': 'Авг',
-            'Sep': 'Сен',
-            'Oct': 'Окт',
-            'Nov': 'Ноя',
-            'Dec': 'Дек'
-        }
-        # Определяем начальную и конечную даты
-        monthly_data = cls.objects.filter(
-            user=user,
-            date__gte=timezone.now() - timedelta(days=30 * months)
-        ).annotate(
-            month=TruncMonth('date')
-        ).values('month').annotate(
-            income=Sum('amount', filter=Q(category__type='income')),
-            expense=Sum('amount', filter=Q(category__type='expense'))
-        ).order_by('month')
-
-        # Форматируем месяцы и переводим их
-        labels = [MONTH_TRANSLATIONS[entry['month'].strftime('%b')] for entry in monthly_data]
-        data = [float((entry['income'] or 0) - (entry['expense'] or 0)) for entry in monthly_data]
+        from apps.home.cache import get_dashboard
+
+        dashboard = get_dashboard(user, months=months)
 
         return {
-            'labels': labels,
-            'data': data
+            'labels': dashboard.labels,
+            'data': dashboard.balance
         }
 
+class MonthlyCategoryTotal(models.Model):
+    """
+    Сумма и количество транзакций пользователя по категории за месяц.
+    Поддерживается инкрементально при записи транзакций (apps.home.rollups).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория"
+    )
+    month = models.DateField(verbose_name="Месяц")
+    total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма"
+    )
+    count = models.IntegerField(
+        default=0,
+        verbose_name="Количество транзакций"
+    )
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.category_id}: {self.total}"
+
+    class Meta:
+        verbose_name = "Итог за месяц"
+        verbose_name_plural = "Итоги за месяц"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'month'],
+                name='home_monthly_total_unique'
+            ),
+        ]
+        indexes = [
+            # Дашборд читает агрегаты пользователя за диапазон месяцев
+            models.Index(fields=['user', 'month'], name='home_total_user_month_idx'),
+        ]
+
+
+class BudgetQuerySet(models.QuerySet):
+    # Поля, от которых зависит spent
+    WINDOW_FIELDS = {'user', 'user_id', 'category', 'category_id', 'start_date', 'end_date'}
+
+    def update(self, **kwargs):
+        if not self.WINDOW_FIELDS & kwargs.keys():
+            return super().update(**kwargs)
+        from apps.home.budgets import refresh_spent
+
+        # Окно меняется массово (update, bulk_update) — spent пересчитывается
+        # вторым UPDATE: в первом подзапрос видел бы прежние даты и категорию
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            refresh_spent(Budget.objects.using(self.db).filter(pk__in=pks))
+        return rows
+
+    update.alters_data = True
+
+
 class Budget(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(
@@ -129,13 +347,34 @@ class Budget(models.Model):
     end_date = models.DateField(
         verbose_name="Конец периода"
     )
+    # Сумма транзакций категории за период бюджета. Поддерживается
+    # инкрементально при записи транзакций (apps.home.budgets)
+    spent = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Потрачено"
+    )
+
+    objects = BudgetQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.category.name} ({self.start_date} - {self.end_date})"
 
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': "Конец периода раньше начала"})
+
     class Meta:
         verbose_name = "Бюджет"
         verbose_name_plural = "Бюджеты"
+        indexes = [
+            # Бюджеты, в окно которых попадает транзакция категории
+            models.Index(fields=['user', 'category', 'start_date'], name='home_budget_window_idx'),
+            # Активные бюджеты пользователя на дату
+            models.Index(fields=['user', 'end_date'], name='home_budget_user_end_idx'),
+        ]
 
 class SavingsGoal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -149,11 +388,23 @@ class SavingsGoal(models.Model):
         validators=[MinValueValidator(0.01)],
         verbose_name="Целевая сумма"
     )
+    # Накоплено до start_date; дальше сумма растёт транзакциями категорий цели
     current_amount = models.DecimalField(
         max_digits=10,
         decimal_places=2,
         default=0,
-        verbose_name="Текущая сумма"
+        verbose_name="Начальная сумма"
+    )
+    categories = models.ManyToManyField(
+        Category,
+        blank=True,
+        related_name='savings_goals',
+        limit_choices_to={'type': Category.INCOME},
+        verbose_name="Категории накоплений"
+    )
+    start_date = models.DateField(
+        default=timezone.localdate,
+        verbose_name="Начало накопления"
     )
     target_date = models.DateField(
         verbose_name="Целевая дата"
@@ -164,12 +415,195 @@ class SavingsGoal(models.Model):
         verbose_name="Описание"
     )
 
+    def validate_categories(self, categories):
+        """Накопления растут доходами: в цель входят только доходные категории её владельца."""
+        if any(category.type != Category.INCOME or category.user_id != self.user_id for category in categories):
+            raise ValidationError({'categories': "Категории накоплений — только свои категории доходов"})
+
     def progress(self):
-        return (self.current_amount / self.target_amount) * 100
+        # saved добавляет apps.home.goals.with_progress(); без неё — только начальная сумма
+        saved = getattr(self, 'saved', self.current_amount)
+        return (saved / self.target_amount) * 100
 
     def __str__(self):
         return f"{self.name} - {self.progress():.1f}%"
 
     class Meta:
         verbose_name = "Цель накопления"
-        verbose_name_plural = "Цели накопления"
\ No newline at end of file
+        verbose_name_plural = "Цели накопления"
+
+class DailyCategoryTotal(models.Model):
+    """
+    Сумма и количество транзакций пользователя по категории за день.
+    Ряды по дням и неделям за несколько лет читаются отсюда, а не из журнала.
+    Поддерживается вместе с MonthlyCategoryTotal (apps.home.rollups).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория"
+    )
+    date = models.DateField(verbose_name="Дата")
+    total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма"
+    )
+    count = models.IntegerField(
+        default=0,
+        verbose_name="Количество транзакций"
+    )
+
+    def __str__(self):
+        return f"{self.date:%Y-%m-%d} - {self.category_id}: {self.total}"
+
+    class Meta:
+        verbose_name = "Итог за день"
+        verbose_name_plural = "Итоги за день"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'date'],
+                name='home_daily_total_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='home_daily_user_date_idx'),
+        ]
+
+
+class RecurringTransaction(models.Model):
+    """
+    Шаблон регулярной транзакции (аренда, зарплата, подписки) с расписанием
+    по образцу RRULE: FREQ, INTERVAL, DTSTART и UNTIL. День месяца и недели
+    берётся из start_date. Транзакции создаёт команда materialize_recurring.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Ежедневно'),
+        (WEEKLY, 'Еженедельно'),
+        (MONTHLY, 'Ежемесячно'),
+        (YEARLY, 'Ежегодно'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория"
+    )
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0.01)],
+        verbose_name="Сумма"
+    )
+    description = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Описание"
+    )
+    frequency = models.CharField(
+        max_length=10,
+        choices=FREQUENCY_CHOICES,
+        default=MONTHLY,
+        verbose_name="Периодичность"
+    )
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        verbose_name="Интервал",
+        help_text="Повторять каждые N периодов"
+    )
+    start_date = models.DateField(
+        default=timezone.localdate,
+        verbose_name="Первая дата",
+        help_text="Прошедшие даты будут созданы при следующем запуске планировщика"
+    )
+    end_date = models.DateField(
+        blank=True,
+        null=True,
+        verbose_name="Последняя дата"
+    )
+    # Ближайшая ещё не созданная дата; None — расписание исчерпано.
+    # Планировщик сдвигает её в той же транзакции, что создаёт повторения
+    next_date = models.DateField(
+        null=True,
+        editable=False,
+        verbose_name="Следующая дата"
+    )
+
+    def __str__(self):
+        return f"{self.category.name}: {self.amount} ({self.get_frequency_display().lower()})"
+
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': "Последняя дата раньше первой"})
+
+    class Meta:
+        verbose_name = "Регулярная транзакция"
+        verbose_name_plural = "Регулярные транзакции"
+        indexes = [
+            # Шаблоны, у которых подошла дата (планировщик)
+            models.Index(fields=['next_date'], name='home_recurring_next_idx'),
+        ]
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди на таблице БД: импорт, выгрузка, пересчёт
+    агрегатов. Выполняется воркерами команды run_jobs (apps.home.jobs).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    # Пусто — служебная задача без владельца (например, пересчёт для всех)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Статус"
+    )
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Прогресс, %")
+    message = models.CharField(max_length=255, blank=True, verbose_name="Сообщение")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="Максимум попыток")
+    # Очередная попытка не раньше этого момента (отложенный повтор после ошибки)
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Запуск не раньше")
+    # Аренда выполняющейся задачи: продлевается отчётами о прогрессе, после
+    # истечения задачу упавшего воркера забирает другой
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Занята до")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}: {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            # Выборка следующей задачи воркером
+            models.Index(fields=['status', 'run_after'], name='home_job_claim_idx'),
+            # Задачи пользователя, новые сверху
+            models.Index(fields=['user', '-created_at'], name='home_job_user_created_idx'),
+        ]
@@ -0,0 +1,117 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import hashlib
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from apps.home import rollups
+from apps.home.cache import ledger_version
+
+# Начиная с такого размера журнала точный COUNT(*) по фильтру кэшируется
+LARGE_LEDGER = 100000
+
+# Порядок, для которого работает keyset-пагинация (порядок админки по умолчанию)
+KEYSET_ORDERINGS = (('-date', '-pk'), ('-date', '-id'))
+
+
+def ledger_period(params, field='date'):
+    """
+    Период из параметров date_hierarchy, если кроме них фильтров нет.
+    :return: (первый месяц, последний месяц) — оба None для всего журнала;
+             None, если количество нельзя взять из агрегатов по месяцам
+    """
+    if not set(params) <= {f'{field}__year', f'{field}__month'}:
+        return None
+    try:
+        year = params.get(f'{field}__year')
+        month = params.get(f'{field}__month')
+        if year is None:
+            return None if month else (None, None)
+        if month is None:
+            return date(int(year), 1, 1), date(int(year), 12, 1)
+        return date(int(year), int(month), 1), date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+class LedgerPaginator(Paginator):
+    """
+    Пагинатор журнала транзакций одного пользователя.
+    Количество берётся из месячных агрегатов, а если фильтр не ложится
+    на месяцы — из COUNT(*), закэшированного до изменения журнала.
+    Страницы при сортировке по дате выбираются по ключу (date, id) вместо OFFSET:
+    граница каждой показанной страницы запоминается для следующей.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, user=None, period=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.user = user
+        self.period = period
+
+    @cached_property
+    def _signature(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode(), usedforsecurity=False).hexdigest()
+        return f'{self.user.pk}:{ledger_version(self.user.pk)}:{digest}'
+
+    @cached_property
+    def count(self):
+        if self.period is not None:
+            return rollups.ledger_count(self.user.pk, *self.period)
+        if rollups.ledger_count(self.user.pk) <= LARGE_LEDGER:
+            return super().count
+
+        cache = caches[settings.DASHBOARD_CACHE_ALIAS]
+        key = f'ledger:count:{self._signature}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.DASHBOARD_CACHE_TIMEOUT)
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if tuple(self.object_list.query.order_by) not in KEYSET_ORDERINGS or number == 1:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        size = self.per_page
+        if bottom + size + self.orphans >= self.count:
+            size = self.count - bottom
+
+        boundary = self._boundary(number, bottom)
+        if boundary is None:
+            return super().page(number)
+        last_date, last_pk = boundary
+        rows = list(self.object_list.filter(
+            Q(date__lt=last_date) | Q(date=last_date, pk__lt=last_pk)
+        )[:size])
+        if rows:
+            self._remember(number + 1, (rows[-1].date, rows[-1].pk))
+        return self._get_page(rows, number, self)
+
+    def _boundary(self, number, bottom):
+        """Ключ (date, id) последней строки предыдущей страницы."""
+        boundary = caches[settings.DASHBOARD_CACHE_ALIAS].get(self._boundary_key(number))
+        if boundary is None:
+            # Перешли сразу на дальнюю страницу: OFFSET по одному индексу,
+            # без чтения самих строк
+            boundary = self.object_list.values_list('date', 'pk')[bottom - 1:bottom].first()
+            if boundary is not None:
+                self._remember(number, boundary)
+        return boundary
+
+    def _remember(self, number, boundary):
+        caches[settings.DASHBOARD_CACHE_ALIAS].set(
+            self._boundary_key(number), boundary, settings.DASHBOARD_CACHE_TIMEOUT
+        )
+
+    def _boundary_key(self, number):
+        return f'ledger:page:{self._signature}:{self.per_page}:{number}'
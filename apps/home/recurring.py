@@ -0,0 +1,137 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import calendar
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from apps.home.models import RecurringTransaction, Transaction
+from apps.home.utils import shift_months
+
+
+def occurrence(rule, index):
+    """Дата повторения номер index (с нуля), отсчитанная от start_date."""
+    start = rule.start_date
+    if rule.frequency in (RecurringTransaction.DAILY, RecurringTransaction.WEEKLY):
+        days = 7 if rule.frequency == RecurringTransaction.WEEKLY else 1
+        return start + timedelta(days=days * rule.interval * index)
+    months = 12 if rule.frequency == RecurringTransaction.YEARLY else 1
+    month = shift_months(start, months * rule.interval * index)
+    # 31-е число в коротком месяце — последний день месяца, без сдвига следующих дат
+    return month.replace(day=min(start.day, calendar.monthrange(month.year, month.month)[1]))
+
+
+def _index_after(rule, day):
+    """Номер первого повторения позже day."""
+    start = rule.start_date
+    if day < start:
+        return 0
+    if rule.frequency in (RecurringTransaction.DAILY, RecurringTransaction.WEEKLY):
+        days = 7 if rule.frequency == RecurringTransaction.WEEKLY else 1
+        return (day - start).days // (days * rule.interval) + 1
+    months = (12 if rule.frequency == RecurringTransaction.YEARLY else 1) * rule.interval
+    index = ((day.year - start.year) * 12 + day.month - start.month) // months
+    while occurrence(rule, index) <= day:
+        index += 1
+    return index
+
+
+def next_occurrence(rule, after=None):
+    """Первое повторение позже after (None — первое вообще) или None, если расписание закончилось."""
+    day = occurrence(rule, 0 if after is None else _index_after(rule, after))
+    if rule.end_date and day > rule.end_date:
+        return None
+    return day
+
+
+def due_dates(rule, today):
+    """
+    Даты повторений с rule.next_date по today включительно.
+    :return: (даты, новое значение next_date)
+    """
+    dates = []
+    day = rule.next_date
+    index = _index_after(rule, day - timedelta(days=1))
+    while day is not None and day <= today:
+        dates.append(day)
+        index += 1
+        day = occurrence(rule, index)
+        if rule.end_date and day > rule.end_date:
+            day = None
+    return dates, day
+
+
+def last_materialized(rule):
+    """Дата последней созданной по шаблону транзакции."""
+    if rule.pk is None:
+        return None
+    return rule.transactions.aggregate(last=Max('date'))['last']
+
+
+def materialize(today, batch_size=500):
+    """
+    Создаёт транзакции всех шаблонов, у которых подошла дата, включая
+    пропущенные за время простоя. Пачка шаблонов стоит постоянное число
+    запросов: выборка с блокировкой, проверка ключей, bulk_create (вместе
+    с агрегатами и бюджетами, см. ledger_changed) и bulk_update.
+    Параллельные запуски разбирают разные шаблоны (SKIP LOCKED), на SQLite
+    пачки выполняются по очереди; ключ (recurrence, date) исключает дубли.
+    :return: (создано транзакций, обработано шаблонов)
+    """
+    created = claimed = 0
+    while True:
+        batch_created, batch_claimed = _materialize_batch(today, batch_size)
+        created += batch_created
+        claimed += batch_claimed
+        if batch_claimed < batch_size:
+            return created, claimed
+
+
+def _materialize_batch(today, batch_size):
+    with transaction.atomic():
+        connection = connections[router.db_for_write(RecurringTransaction)]
+        if connection.vendor == 'sqlite':
+            # SQLite не блокирует строки, а запись после чтения в отложенной
+            # транзакции падает с «database is locked», если другой планировщик
+            # успел записать. Пустой UPDATE сразу берёт блокировку записи:
+            # параллельные запуски ждут друг друга (busy_timeout)
+            with connection.cursor() as cursor:
+                cursor.execute(f'UPDATE {RecurringTransaction._meta.db_table} SET next_date = next_date WHERE 0')
+        return _claim_and_create(today, batch_size)
+
+
+def _claim_and_create(today, batch_size):
+    rules = list(
+        RecurringTransaction.objects.select_for_update(skip_locked=True).filter(
+            next_date__lte=today
+        ).order_by('next_date', 'pk')[:batch_size]
+    )
+    if not rules:
+        return 0, 0
+
+    due = {}
+    for rule in rules:
+        due[rule.pk], rule.next_date = due_dates(rule, today)
+
+    # Ключ уже занят, если расписание меняли после создания транзакций
+    existing = set(Transaction.objects.filter(
+        recurrence__in=rules,
+        date__gte=min(dates[0] for dates in due.values())
+    ).values_list('recurrence_id', 'date'))
+    created = Transaction.objects.bulk_create([
+        Transaction(
+            user_id=rule.user_id,
+            category_id=rule.category_id,
+            amount=rule.amount,
+            date=day,
+            description=rule.description,
+            recurrence=rule
+        )
+        for rule in rules for day in due[rule.pk]
+        if (rule.pk, day) not in existing
+    ])
+    RecurringTransaction.objects.bulk_update(rules, ['next_date'])
+    return len(created), len(rules)
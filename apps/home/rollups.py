@@ -0,0 +1,202 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from apps.home.models import DailyCategoryTotal, MonthlyCategoryTotal, Transaction
+from apps.home.utils import month_start
+
+CENT = Decimal('0.01')
+
+# Таблицы агрегатов: модель, поле периода, начало периода для даты
+# и то же усечение на стороне БД (None — период совпадает с датой)
+ROLLUPS = (
+    (MonthlyCategoryTotal, 'month', month_start, TruncMonth),
+    (DailyCategoryTotal, 'date', lambda value: value, None),
+)
+
+# Приращения по уникальному ключу (пользователь, категория, период)
+# одним запросом на пачку: строка создаётся или увеличивается
+UPSERT_SQL = {
+    'sqlite': (
+        'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({key}) DO UPDATE SET '
+        '{total} = {table}.{total} + excluded.{total}, {count} = {table}.{count} + excluded.{count}'
+    ),
+    'postgresql': (
+        'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({key}) DO UPDATE SET '
+        '{total} = {table}.{total} + excluded.{total}, {count} = {table}.{count} + excluded.{count}'
+    ),
+    'mysql': (
+        'INSERT INTO {table} ({columns}) VALUES {values} ON DUPLICATE KEY UPDATE '
+        '{total} = {total} + VALUES({total}), {count} = {count} + VALUES({count})'
+    ),
+}
+
+
+def apply_deltas(deltas):
+    """
+    Применяет приращения ко всем таблицам агрегатов.
+    Приращения схлопываются по ключу (пользователь, категория, период)
+    и записываются пачками INSERT ... ON CONFLICT DO UPDATE, поэтому
+    bulk_create стоит по одному запросу на таблицу, а не на ключ.
+    Отрицательные приращения приходят только для строк, учтённых в этой же
+    транзакции (каскады сигнал не отправляют), так что строка для них есть.
+    """
+    for model, period_field, period_of, _ in ROLLUPS:
+        grouped = defaultdict(lambda: [Decimal(0), 0])
+        for delta in deltas:
+            key = (delta.user_id, delta.category_id, period_of(delta.date))
+            grouped[key][0] += delta.amount
+            grouped[key][1] += delta.count
+
+        rows = [key + tuple(value) for key, value in grouped.items() if value[0] or value[1]]
+        if rows:
+            _upsert(model, period_field, rows)
+
+
+def _upsert(model, period_field, rows):
+    """
+    :param rows: Список (user_id, category_id, период, сумма, количество)
+    """
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor not in UPSERT_SQL:
+        for user_id, category_id, period, amount, count in rows:
+            _apply(model, {'user_id': user_id, 'category_id': category_id, period_field: period}, amount, count)
+        return
+
+    fields = [model._meta.get_field(name) for name in ('user', 'category', period_field, 'total', 'count')]
+    quote = connection.ops.quote_name
+    columns = [quote(field.column) for field in fields]
+    placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            sql = UPSERT_SQL[connection.vendor].format(
+                table=quote(model._meta.db_table),
+                columns=', '.join(columns),
+                values=', '.join([placeholders] * len(batch)),
+                key=', '.join(columns[:3]),
+                total=columns[3],
+                count=columns[4],
+            )
+            cursor.execute(sql, [
+                field.get_db_prep_value(value, connection)
+                for row in batch for field, value in zip(fields, row)
+            ])
+
+
+def _apply(model, key, amount, count):
+    # Для баз без upsert: UPDATE по ключу, при отсутствии строки — INSERT
+    rows = model.objects.filter(**key)
+    if rows.update(total=F('total') + amount, count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(total=amount, count=count, **key)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+def aggregate_ledger(user_ids=None, model=MonthlyCategoryTotal):
+    """Считает агрегаты с нуля по журналу транзакций."""
+    _, period_field, _, truncate = _rollup(model)
+    queryset = Transaction.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    if truncate is not None:
+        queryset = queryset.annotate(**{period_field: truncate('date')})
+    return queryset.values('user_id', 'category_id', period_field).annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """
+    Пересобирает агрегаты пользователей (или всех, если user_ids не указан).
+    :return: Количество созданных строк
+    """
+    created = 0
+    with transaction.atomic():
+        for model, period_field, _, _ in ROLLUPS:
+            stored = model.objects.all()
+            if user_ids is not None:
+                stored = stored.filter(user_id__in=user_ids)
+            stored.delete()
+
+            batch = []
+            for row in aggregate_ledger(user_ids, model).iterator():
+                batch.append(model(**row))
+                if len(batch) >= batch_size:
+                    model.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def verify(user_ids=None):
+    """
+    Сравнивает сохранённые агрегаты с пересчитанными по журналу.
+    :return: Список расхождений (ключ, сохранено, ожидается)
+    """
+    mismatches = []
+    for model, period_field, _, _ in ROLLUPS:
+        expected = {
+            # Sum на SQLite считается во float: сверяем с точностью до копейки,
+            # как хранит DecimalField
+            (model._meta.model_name, row['user_id'], row['category_id'], row[period_field]): (
+                row['total'].quantize(CENT), row['count']
+            )
+            for row in aggregate_ledger(user_ids, model).iterator()
+        }
+        stored = model.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user_id__in=user_ids)
+
+        for row in stored.values_list('user_id', 'category_id', period_field, 'total', 'count').iterator():
+            key, value = (model._meta.model_name, *row[:3]), row[3:]
+            expected_value = expected.pop(key, None)
+            if value == (0, 0) and expected_value is None:
+                continue
+            if value != expected_value:
+                mismatches.append((key, value, expected_value))
+        mismatches.extend((key, None, value) for key, value in expected.items())
+    return mismatches
+
+
+def _rollup(model):
+    return next(rollup for rollup in ROLLUPS if rollup[0] is model)
+
+
+def ledger_count(user_id, first_month=None, last_month=None):
+    """
+    Количество транзакций пользователя по агрегатам — без обхода журнала.
+    :param first_month: Первый месяц периода (включительно)
+    :param last_month: Последний месяц периода (включительно)
+    """
+    queryset = MonthlyCategoryTotal.objects.filter(user_id=user_id)
+    if first_month:
+        queryset = queryset.filter(month__gte=first_month)
+    if last_month:
+        queryset = queryset.filter(month__lte=last_month)
+    return queryset.aggregate(count=Sum('count'))['count'] or 0
+
+
+def active_months(user_id, first_month=None, last_month=None):
+    """Месяцы, в которых у пользователя есть транзакции, по возрастанию."""
+    queryset = MonthlyCategoryTotal.objects.filter(user_id=user_id, count__gt=0)
+    if first_month:
+        queryset = queryset.filter(month__gte=first_month)
+    if last_month:
+        queryset = queryset.filter(month__lte=last_month)
+    return list(queryset.order_by('month').values_list('month', flat=True).distinct())
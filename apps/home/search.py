@@ -0,0 +1,190 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from apps.home.models import Category, Transaction
+
+# SQLite: FTS5-таблица с описанием, названием категории и владельцем
+# (токен 'u<id>'), rowid = id транзакции. Отбор по пользователю идёт внутри
+# MATCH, поэтому запрос не соединяется с home_transaction.
+# MySQL: FULLTEXT-индекс по home_transaction.description (миграция 0005)
+FTS_TABLE = 'home_transaction_fts'
+MYSQL_INDEX = 'home_trans_desc_fts'
+
+MAX_TERMS = 8
+
+# bm25 считается для каждого совпадения. Если совпадений больше,
+# результаты отдаются от новых к старым: на таком объёме ранжирование
+# дорого и почти не различает строки
+RANKED_MATCHES = 5000
+
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"description, category, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+SQLITE_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON home_transaction BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, description, category, owner)
+        VALUES (new.id, new.description, (SELECT name FROM home_category WHERE id = new.category_id),
+                'u' || new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON home_transaction BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description, category_id, user_id
+        ON home_transaction BEGIN
+        UPDATE {FTS_TABLE}
+        SET description = new.description,
+            category = (SELECT name FROM home_category WHERE id = new.category_id),
+            owner = 'u' || new.user_id
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_category AFTER UPDATE OF name ON home_category BEGIN
+        UPDATE {FTS_TABLE} SET category = new.name
+        WHERE rowid IN (SELECT id FROM home_transaction WHERE category_id = new.id);
+    END""",
+)
+
+SQLITE_FILL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, description, category, owner) "
+    f"SELECT t.id, t.description, c.name, 'u' || t.user_id "
+    f"FROM home_transaction t JOIN home_category c ON c.id = t.category_id"
+)
+
+# Вес столбцов в bm25: описание, категория, владелец (не влияет на релевантность)
+SQLITE_RANK = f'bm25({FTS_TABLE}, 1.0, 0.5, 0.0)'
+
+
+def install_sqlite_index(cursor, fill=False):
+    """
+    Создаёт FTS5-таблицу и триггеры, если их нет.
+    Триггеры вызываются и после каждой миграции: при пересоздании таблицы
+    home_transaction (ALTER на SQLite) они удаляются вместе со старой таблицей.
+    """
+    cursor.execute(SQLITE_CREATE)
+    for sql in SQLITE_TRIGGERS:
+        cursor.execute(sql)
+    if fill:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(SQLITE_FILL)
+
+
+def search_terms(query):
+    """Слова запроса в нижнем регистре: операторы и кавычки отбрасываются."""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def search_backend(using):
+    """
+    'fts5', 'mysql' или None (поиск через icontains).
+    :param using: Алиас базы данных
+    """
+    connection = connections[using]
+    if connection.vendor == 'mysql':
+        return 'mysql'
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return 'fts5'
+    return None
+
+
+class TransactionSearch:
+    """
+    Поиск транзакций пользователя по словам в описании и названии категории.
+    Каждое слово ищется как префикс, все слова обязательны.
+    """
+
+    def __init__(self, user, query):
+        self.user = user
+        self.terms = search_terms(query)
+
+    def filter(self, queryset):
+        """Ограничивает queryset найденными транзакциями (без ранжирования)."""
+        if not self.terms:
+            return queryset
+        backend = search_backend(queryset.db)
+        if backend == 'fts5':
+            return queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self._fts_query()]
+            ))
+        if backend == 'mysql':
+            return queryset.annotate(search_rank=self._mysql_rank()).filter(
+                Q(search_rank__gt=0) | Q(category__in=self._categories())
+            )
+        for term in self.terms:
+            queryset = queryset.filter(Q(description__icontains=term) | Q(category__name__icontains=term))
+        return queryset
+
+    def ranked(self, offset=0, limit=20):
+        """
+        Страница результатов по убыванию релевантности (при большом числе
+        совпадений на SQLite — от новых к старым, см. RANKED_MATCHES).
+        :return: (количество найденных, список Transaction с атрибутом search_rank)
+        """
+        if not self.terms:
+            return 0, []
+        using = router.db_for_read(Transaction)
+        backend = search_backend(using)
+        if backend == 'fts5':
+            return self._ranked_fts(using, offset, limit)
+
+        queryset = self.filter(Transaction.objects.using(using).filter(user=self.user))
+        if backend != 'mysql':
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        total = queryset.count()
+        rows = queryset.select_related('category').order_by('-search_rank', '-date', '-pk')
+        return total, list(rows[offset:offset + limit])
+
+    def _ranked_fts(self, using, offset, limit):
+        # bm25 отрицательный: чем меньше значение, тем релевантнее
+        match = self._fts_query()
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+            total = cursor.fetchone()[0]
+            if total > RANKED_MATCHES:
+                cursor.execute(
+                    f'SELECT rowid, 0.0 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY rowid DESC LIMIT %s OFFSET %s',
+                    [match, limit, offset]
+                )
+            else:
+                cursor.execute(
+                    f'SELECT rowid, -{SQLITE_RANK} AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY score DESC, rowid DESC LIMIT %s OFFSET %s',
+                    [match, limit, offset]
+                )
+            ranks = dict(cursor.fetchall())
+
+        rows = Transaction.objects.using(using).select_related('category').in_bulk(list(ranks))
+        result = []
+        for pk, rank in ranks.items():
+            # Строку могли удалить между поиском по индексу и загрузкой
+            row = rows.get(pk)
+            if row is None:
+                continue
+            row.search_rank = rank
+            result.append(row)
+        return total, result
+
+    def _fts_query(self):
+        terms = ' '.join(f'"{term}"*' for term in self.terms)
+        return f'owner:u{self.user.pk} AND {{description category}}: ({terms})'
+
+    def _mysql_rank(self):
+        query = ' '.join(f'+{term}*' for term in self.terms)
+        return RawSQL(
+            'MATCH (home_transaction.description) AGAINST (%s IN BOOLEAN MODE)', [query],
+            output_field=FloatField()
+        )
+
+    def _categories(self):
+        categories = Category.objects.filter(user=self.user)
+        for term in self.terms:
+            categories = categories.filter(name__icontains=term)
+        return categories.values('pk')
@@ -0,0 +1,31 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from collections import namedtuple
+
+from django.dispatch import Signal
+
+# Изменение суммы в разрезе (пользователь, категория, дата).
+# count = +1 для появившейся транзакции и -1 для исчезнувшей.
+LedgerDelta = namedtuple('LedgerDelta', ['user_id', 'category_id', 'date', 'amount', 'count'])
+
+# Отправляется после любой записи в журнал транзакций.
+# Аргументы: user_ids — затронутые пользователи;
+# deltas — список LedgerDelta (пустой, если суммы не менялись) или None,
+# если изменение нельзя выразить приращениями и агрегаты нужно пересчитать.
+ledger_changed = Signal()
+
+
+def delta_for(transaction, sign=1):
+    """Приращение, которое вносит транзакция (sign=-1 — при её удалении)."""
+    # Значения приводим через поля модели: в date может лежать datetime,
+    # а в amount — int или строка, если объект создан вручную
+    opts = transaction._meta
+    return LedgerDelta(
+        transaction.user_id,
+        transaction.category_id,
+        opts.get_field('date').to_python(transaction.date),
+        opts.get_field('amount').to_python(transaction.amount) * sign,
+        sign
+    )
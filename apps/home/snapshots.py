@@ -0,0 +1,305 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import json
+import os
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, router
+
+from apps.home.models import DailyCategoryTotal
+from apps.home.utils import file_lock
+
+try:
+    import numpy as np
+except ImportError:
+    # Без NumPy снимки выключены, аналитика (apps.home.trends) тоже
+    np = None
+
+EPOCH = date(1970, 1, 1)
+
+# Снимок журнала пользователя — каталог LEDGER_SNAPSHOT_DIR/<user_id>:
+#   days.<поколение>, cents.<поколение>, categories.<поколение> — столбцы
+#   фиксированной ширины (типы ниже), строка — приращение суммы категории за день;
+#   meta.json — формат столбцов, поколение, число строк, pk категорий по кодам
+#   и время сборки по агрегатам (built_at, time.time_ns() после чтения);
+#   dirty — снимок устарел и будет собран заново при следующем чтении.
+# Приращения только дописываются в конец столбцов, поэтому читатели открывают
+# файлы через mmap без блокировок: страницы общие для всех воркеров gunicorn.
+COLUMNS = (('days', '<i4'), ('cents', '<i8'), ('categories', '<i4'))
+
+# Версия типов COLUMNS: снимки другой версии собираются заново
+FORMAT = 2
+
+# Дописанные строки схлопываются по (день, категория), когда строк становится
+# вдвое больше, чем после последней сборки, но не раньше COMPACT_MIN_ROWS
+COMPACT_MIN_ROWS = 4096
+
+# Столбцы журнала: день от 1970-01-01, сумма в копейках, код категории
+# и pk категорий по кодам
+Columns = namedtuple('Columns', ['days', 'cents', 'categories', 'category_ids'])
+
+
+def enabled():
+    return bool(settings.LEDGER_SNAPSHOT_DIR) and np is not None
+
+
+def to_day(value):
+    """Номер дня от 1970-01-01 (совместим с datetime64[D])."""
+    return (value - EPOCH).days
+
+
+def from_rollups(user_id, using=None):
+    """
+    Столбцы журнала из дневных агрегатов: строка — сумма категории за день.
+    :param using: Алиас БД; по умолчанию — как для чтения (может быть реплика)
+    """
+    using = using or router.db_for_read(DailyCategoryTotal)
+    table = DailyCategoryTotal._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT date, category_id, total FROM {table} WHERE user_id = %s AND total <> 0', [user_id]
+        )
+        rows = cursor.fetchall()
+
+    category_ids = sorted({row[1] for row in rows})
+    codes = {pk: code for code, pk in enumerate(category_ids)}
+    count = len(rows)
+    (_, days), (_, cents), (_, categories) = COLUMNS
+    return Columns(
+        np.fromiter((to_day(row[0]) for row in rows), dtype=days, count=count),
+        np.fromiter((round(row[2] * 100) for row in rows), dtype=cents, count=count),
+        np.fromiter((codes[row[1]] for row in rows), dtype=categories, count=count),
+        category_ids,
+    )
+
+
+def compact(columns):
+    """Суммирует строки по (день, категория), убирает нулевые суммы и неиспользуемые категории."""
+    if not len(columns.days):
+        return columns
+    width = len(columns.category_ids)
+    keys, inverse = np.unique(
+        columns.days.astype(np.int64) * width + columns.categories, return_inverse=True
+    )
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, inverse, columns.cents)
+    keys, totals = keys[totals != 0], totals[totals != 0]
+    days, codes = np.divmod(keys, width)
+    used, codes = np.unique(codes, return_inverse=True)
+    (_, days_type), (_, cents_type), (_, categories_type) = COLUMNS
+    return Columns(
+        days.astype(days_type),
+        totals.astype(cents_type),
+        codes.astype(categories_type),
+        [columns.category_ids[code] for code in used],
+    )
+
+
+def load(user_id):
+    """
+    Столбцы журнала пользователя: из снимка, если снимки включены
+    (отсутствующий или устаревший снимок сначала собирается), иначе из агрегатов.
+    """
+    if not enabled():
+        return from_rollups(user_id)
+    directory = _directory(user_id)
+    meta = _current_meta(directory)
+    if meta is None:
+        meta = _ensure(user_id)
+    try:
+        return _open(directory, meta)
+    except FileNotFoundError:
+        # Файлы этого поколения уже заменила параллельная сборка
+        return from_rollups(user_id)
+
+
+def append(deltas, written=None):
+    """
+    Дописывает приращения журнала (LedgerDelta) в собранные снимки
+    пользователей; остальные снимки соберутся при первом чтении.
+    :param written: time.time_ns() до записи приращений в дневные агрегаты.
+        Снимок, собранный позже, мог прочитать их из агрегатов: чтобы не
+        учесть их дважды, такой снимок собирается заново
+    """
+    by_user = defaultdict(list)
+    for delta in deltas:
+        if delta.amount:
+            by_user[delta.user_id].append(delta)
+
+    for user_id, user_deltas in by_user.items():
+        directory = _directory(user_id)
+        if not os.path.exists(_meta_path(directory)):
+            continue
+        with file_lock(directory):
+            meta = _current_meta(directory)
+            if meta is None:
+                continue
+            if written is not None and written <= meta.get('built_at', 0):
+                _mark_dirty(directory)
+                continue
+            categories = meta['categories']
+            codes = {pk: code for code, pk in enumerate(categories)}
+            for delta in user_deltas:
+                if delta.category_id not in codes:
+                    codes[delta.category_id] = len(categories)
+                    categories.append(delta.category_id)
+
+            values = (
+                [to_day(delta.date) for delta in user_deltas],
+                [round(delta.amount * 100) for delta in user_deltas],
+                [codes[delta.category_id] for delta in user_deltas],
+            )
+            for (name, dtype), column in zip(COLUMNS, values):
+                with open(_column_path(directory, name, meta['generation']), 'r+b') as file:
+                    # Хвост, оставшийся от прерванной записи, отбрасывается
+                    file.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+                    file.seek(0, os.SEEK_END)
+                    file.write(np.asarray(column, dtype=dtype).tobytes())
+            meta['rows'] += len(user_deltas)
+
+            if meta['rows'] > max(2 * meta['base_rows'], COMPACT_MIN_ROWS):
+                _store(directory, compact(_open(directory, meta)), meta, meta.get('built_at', 0))
+            else:
+                _write_meta(directory, meta)
+
+
+def invalidate(user_ids=None):
+    """Помечает снимки устаревшими (None — все); они соберутся при следующем чтении."""
+    for user_id in _existing(user_ids):
+        directory = _directory(user_id)
+        with file_lock(directory):
+            _mark_dirty(directory)
+
+
+def verify(user_ids=None):
+    """
+    Сравнивает собранные снимки с дневными агрегатами.
+    :return: Список расхождений (ключ, в снимке, ожидается)
+    """
+    mismatches = []
+    for user_id in _existing(user_ids):
+        directory = _directory(user_id)
+        meta = _current_meta(directory)
+        if meta is None:
+            continue
+        stored = _by_key(compact(_open(directory, meta)))
+        expected = _by_key(from_rollups(user_id, router.db_for_write(DailyCategoryTotal)))
+        for key in sorted(stored.keys() | expected.keys()):
+            if stored.get(key, 0) != expected.get(key, 0):
+                mismatches.append((('snapshot', user_id) + key, stored.get(key, 0), expected.get(key, 0)))
+    return mismatches
+
+
+def _by_key(columns):
+    return {
+        (EPOCH + timedelta(days=int(day)), columns.category_ids[code]): Decimal(int(cents)) / 100
+        for day, cents, code in zip(columns.days, columns.cents, columns.categories)
+    }
+
+
+def _ensure(user_id):
+    directory = _directory(user_id)
+    with file_lock(directory):
+        # Пока ждали блокировку, снимок мог собрать другой воркер
+        meta = _current_meta(directory)
+        if meta is None:
+            # Из основной БД: отстающая реплика не содержит приращений, которые
+            # уже дописаны (или будут дописаны) в снимок после фиксации
+            columns = from_rollups(user_id, router.db_for_write(DailyCategoryTotal))
+            meta = _store(directory, columns, _read_meta(directory), time.time_ns())
+        return meta
+
+
+def _store(directory, columns, previous, built_at):
+    """
+    Записывает столбцы новым поколением и переключает на него meta.json.
+    :param built_at: Время чтения агрегатов, из которых получены столбцы
+    """
+    generation = previous['generation'] + 1 if previous else 1
+    for (name, dtype), values in zip(COLUMNS, columns):
+        with open(_column_path(directory, name, generation), 'wb') as file:
+            file.write(np.asarray(values, dtype=dtype).tobytes())
+    meta = {
+        'format': FORMAT,
+        'generation': generation,
+        'rows': len(columns.days),
+        'base_rows': len(columns.days),
+        'categories': list(columns.category_ids),
+        'built_at': built_at,
+    }
+    _write_meta(directory, meta)
+    dirty = os.path.join(directory, 'dirty')
+    if os.path.exists(dirty):
+        os.remove(dirty)
+    if previous:
+        # Открытые читателями отображения старых файлов остаются действительными
+        for name, _ in COLUMNS:
+            os.remove(_column_path(directory, name, previous['generation']))
+    return meta
+
+
+def _mark_dirty(directory):
+    open(os.path.join(directory, 'dirty'), 'w').close()
+
+
+def _open(directory, meta):
+    rows = meta['rows']
+    return Columns(*(
+        np.memmap(_column_path(directory, name, meta['generation']), dtype=dtype, mode='r', shape=(rows,))
+        if rows else np.zeros(0, dtype=dtype)
+        for name, dtype in COLUMNS
+    ), meta['categories'])
+
+
+def _current_meta(directory):
+    """meta.json собранного и не устаревшего снимка, иначе None."""
+    if os.path.exists(os.path.join(directory, 'dirty')):
+        return None
+    meta = _read_meta(directory)
+    if meta is None or meta.get('format') != FORMAT:
+        return None
+    return meta
+
+
+def _read_meta(directory):
+    try:
+        with open(_meta_path(directory)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory, meta):
+    # Замена файла атомарна: читатель видит либо старое, либо новое число строк
+    temporary = _meta_path(directory) + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(meta, file)
+    os.replace(temporary, _meta_path(directory))
+
+
+def _existing(user_ids):
+    if not enabled():
+        return []
+    if user_ids is not None:
+        return [user_id for user_id in user_ids if os.path.isdir(_directory(user_id))]
+    if not os.path.isdir(settings.LEDGER_SNAPSHOT_DIR):
+        return []
+    return [int(name) for name in os.listdir(settings.LEDGER_SNAPSHOT_DIR) if name.isdigit()]
+
+
+def _directory(user_id):
+    return os.path.join(settings.LEDGER_SNAPSHOT_DIR, str(user_id))
+
+
+def _meta_path(directory):
+    return os.path.join(directory, 'meta.json')
+
+
+def _column_path(directory, name, generation):
+    return os.path.join(directory, f'{name}.{generation}')
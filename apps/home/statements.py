@@ -0,0 +1,345 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import repeat
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from apps.home.budgets import BudgetStatus, with_spent_until
+from apps.home.goals import GoalProgress, with_progress
+from apps.home.models import Budget, Category, MonthlyCategoryTotal, SavingsGoal
+from apps.home.utils import file_lock, shift_months
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:
+    # Без reportlab выписки собираются только в HTML и CSV
+    pdfmetrics = None
+
+# Выписки месяца — каталог STATEMENTS_DIR/<YYYY-MM>:
+#   <user_id>.html, <user_id>.csv, <user_id>.pdf — готовые файлы, их отдаёт view;
+#   manifest.json — когда и в каких форматах собрана выписка каждого пользователя.
+# Файлы заменяются атомарно, поэтому пересборка не мешает скачиванию.
+FORMATS = {
+    'html': 'text/html; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+# Пользователей в одной порции: выписки порции собираются тремя запросами
+CHUNK_SIZE = 200
+
+PDF_FONT = 'StatementFont'
+
+BUDGET_STATES = {
+    'ok': 'В норме',
+    'at_risk': 'Риск перерасхода',
+    'over': 'Превышен',
+}
+
+CategoryTotal = namedtuple('CategoryTotal', ['name', 'type', 'total', 'count'])
+
+
+@dataclass
+class Statement:
+    """Выписка пользователя за месяц: итоги по категориям, бюджеты и цели на конец месяца."""
+    user: object
+    month: date
+    categories: list = field(default_factory=list)
+    budgets: list = field(default_factory=list)
+    goals: list = field(default_factory=list)
+
+    @property
+    def month_end(self):
+        return shift_months(self.month, 1) - timedelta(days=1)
+
+    @property
+    def income(self):
+        return sum((row.total for row in self.categories if row.type == Category.INCOME), Decimal(0))
+
+    @property
+    def expense(self):
+        return sum((row.total for row in self.categories if row.type == Category.EXPENSE), Decimal(0))
+
+    def tables(self):
+        """
+        Разделы выписки одинаково для всех форматов.
+        :return: Список (заголовок, шапка таблицы, строки)
+        """
+        expense = self.expense
+        tables = [
+            ('Итоги', ('Показатель', 'Сумма'), [
+                ('Доходы', _money(self.income)),
+                ('Расходы', _money(expense)),
+                ('Чистый поток', _money(self.income - expense)),
+            ]),
+            ('Доходы по категориям', ('Категория', 'Сумма', 'Транзакций'), [
+                (row.name, _money(row.total), row.count)
+                for row in self.categories if row.type == Category.INCOME
+            ]),
+            ('Расходы по категориям', ('Категория', 'Сумма', 'Доля, %', 'Транзакций'), [
+                (row.name, _money(row.total), _percent(row.total, expense), row.count)
+                for row in self.categories if row.type == Category.EXPENSE
+            ]),
+            ('Бюджеты', ('Категория', 'Период', 'Лимит', 'Потрачено', 'Остаток', 'Состояние'), [
+                (
+                    status.budget.category.name,
+                    f'{status.budget.start_date:%d.%m.%Y} – {status.budget.end_date:%d.%m.%Y}',
+                    _money(status.budget.amount),
+                    _money(status.budget.spent),
+                    _money(status.remaining),
+                    BUDGET_STATES[status.state],
+                )
+                for status in self.budgets
+            ]),
+            ('Цели накопления', ('Цель', 'Сумма цели', 'Накоплено', 'Прогресс, %', 'Срок', 'Прогноз'), [
+                (
+                    progress.goal.name,
+                    _money(progress.goal.target_amount),
+                    _money(progress.saved),
+                    _percent(progress.saved, progress.goal.target_amount),
+                    f'{progress.goal.target_date:%d.%m.%Y}',
+                    f'{progress.projected_date:%d.%m.%Y}' if progress.projected_date else '—',
+                )
+                for progress in self.goals
+            ]),
+        ]
+        return [table for table in tables if table[2]]
+
+
+def build(users, month):
+    """
+    Выписки пользователей за месяц (month — первый день месяца). Порция
+    пользователей стоит трёх запросов: месячные агрегаты, бюджеты и цели
+    с прогрессом на последний день месяца; журнал не читается.
+    :return: {user_id: Statement}
+    """
+    statements = {user.pk: Statement(user, month) for user in users}
+    month_end = shift_months(month, 1) - timedelta(days=1)
+
+    totals = MonthlyCategoryTotal.objects.filter(
+        user_id__in=statements, month=month
+    ).exclude(count=0).order_by('-total', 'category__name').values_list(
+        'user_id', 'category__name', 'category__type', 'total', 'count'
+    )
+    for user_id, *row in totals:
+        statements[user_id].categories.append(CategoryTotal(*row))
+
+    # Потрачено на конец месяца, а не сейчас: выписку можно пересобрать позже
+    budgets = with_spent_until(Budget.objects.filter(
+        user_id__in=statements, start_date__lte=month_end, end_date__gte=month
+    ), month_end).select_related('category').order_by('end_date', 'pk')
+    for budget in budgets:
+        budget.spent = budget.spent_until
+        statements[budget.user_id].budgets.append(BudgetStatus(budget, month_end))
+
+    goals = with_progress(
+        SavingsGoal.objects.filter(user_id__in=statements, start_date__lte=month_end), month_end
+    ).order_by('target_date', 'pk')
+    for goal in goals:
+        statements[goal.user_id].goals.append(GoalProgress(goal, month_end))
+    return statements
+
+
+def render_html(statement):
+    return render_to_string('statements/statement.html', {
+        'statement': statement,
+        'tables': statement.tables(),
+        'generated_at': timezone.now(),
+    }).encode('utf-8')
+
+
+def render_csv(statement):
+    # Одна таблица: раздел и столбцы его строки; для каждого раздела — своя шапка
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for title, header, rows in statement.tables():
+        writer.writerow(('Раздел',) + header)
+        writer.writerows((title,) + tuple(row) for row in rows)
+    # BOM — чтобы Excel распознал UTF-8
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_pdf(statement):
+    _register_font()
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = PDF_FONT
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4, title=f'Выписка за {statement.month:%m.%Y}')
+    story = [
+        Paragraph(f'Выписка за {statement.month:%m.%Y}', styles['Title']),
+        Paragraph(escape(statement.user.get_username()), styles['Normal']),
+    ]
+    for title, header, rows in statement.tables():
+        table = Table([header] + [tuple(str(value) for value in row) for row in rows], repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), PDF_FONT),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ]))
+        story += [Spacer(1, 12), Paragraph(title, styles['Heading2']), table]
+    document.build(story)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'html': render_html,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+
+def pdf_available():
+    """PDF собирается, если установлен reportlab и есть шрифт с кириллицей."""
+    return pdfmetrics is not None and os.path.exists(settings.STATEMENT_PDF_FONT)
+
+
+def formats():
+    """Форматы, в которых собираются выписки."""
+    return [name for name in FORMATS if name != 'pdf' or pdf_available()]
+
+
+def month_directory(month):
+    return os.path.join(settings.STATEMENTS_DIR, f'{month:%Y-%m}')
+
+
+def statement_path(user_id, month, statement_format):
+    return os.path.join(month_directory(month), f'{user_id}.{statement_format}')
+
+
+def available(user_id):
+    """
+    Готовые выписки пользователя — по файлам, без запросов к БД.
+    :return: [(первый день месяца, [форматы])] от новых месяцев к старым
+    """
+    if not os.path.isdir(settings.STATEMENTS_DIR):
+        return []
+    result = []
+    for name in os.listdir(settings.STATEMENTS_DIR):
+        try:
+            month = date.fromisoformat(f'{name}-01')
+        except ValueError:
+            continue
+        found = [
+            statement_format for statement_format in FORMATS
+            if os.path.exists(statement_path(user_id, month, statement_format))
+        ]
+        if found:
+            result.append((month, found))
+    return sorted(result, reverse=True)
+
+
+def generate(user_ids, month):
+    """
+    Собирает и записывает выписки пользователей за месяц.
+    :return: {user_id: запись манифеста}
+    """
+    entries = {}
+    names = formats()
+    directory = month_directory(month)
+    os.makedirs(directory, exist_ok=True)
+    for offset in range(0, len(user_ids), CHUNK_SIZE):
+        users = get_user_model().objects.filter(pk__in=user_ids[offset:offset + CHUNK_SIZE])
+        for user_id, statement in build(users, month).items():
+            for name in names:
+                _write(statement_path(user_id, month, name), RENDERERS[name](statement))
+            entries[user_id] = {
+                'formats': names,
+                'generated_at': timezone.now().isoformat(),
+            }
+    return entries
+
+
+def generate_month(month, user_ids=None, workers=1, progress=None):
+    """
+    Собирает выписки за месяц для всех (или перечисленных) пользователей
+    порциями по CHUNK_SIZE в workers процессах и обновляет манифест.
+    progress(готово, всего) вызывается после каждой порции.
+    :return: Число собранных выписок
+    """
+    if user_ids is None:
+        user_ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+    chunks = [user_ids[offset:offset + CHUNK_SIZE] for offset in range(0, len(user_ids), CHUNK_SIZE)]
+
+    entries = {}
+    if workers > 1 and len(chunks) > 1:
+        # Дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(min(workers, len(chunks)), mp_context=context) as pool:
+            for chunk_entries in pool.map(generate, chunks, repeat(month)):
+                entries.update(chunk_entries)
+                if progress:
+                    progress(len(entries), len(user_ids))
+    else:
+        for chunk in chunks:
+            entries.update(generate(chunk, month))
+            if progress:
+                progress(len(entries), len(user_ids))
+
+    update_manifest(month, entries)
+    return len(entries)
+
+
+def read_manifest(month):
+    try:
+        with open(os.path.join(month_directory(month), 'manifest.json')) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def update_manifest(month, entries):
+    """Добавляет записи в манифест месяца (пересборка части пользователей сохраняет остальных)."""
+    directory = month_directory(month)
+    with file_lock(directory):
+        manifest = read_manifest(month) or {'month': f'{month:%Y-%m}', 'users': {}}
+        manifest['users'].update({str(user_id): entry for user_id, entry in entries.items()})
+        manifest['generated_at'] = timezone.now().isoformat()
+        _write(os.path.join(directory, 'manifest.json'), json.dumps(manifest).encode('utf-8'))
+    return manifest
+
+
+def _write(path, content):
+    # Замена файла атомарна: скачивание во время пересборки получает старую или новую выписку
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(content)
+    os.replace(temporary, path)
+
+
+def _register_font():
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT, settings.STATEMENT_PDF_FONT))
+
+
+def _money(value):
+    return f'{value:.2f}'
+
+
+def _percent(value, total):
+    return f'{value / total * 100:.1f}' if total else '0.0'
@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.home import rollups, trends
+from apps.home.analytics import ledger_series
+from apps.home.budgets import budget_statuses
+from apps.home.cache import get_dashboard, get_goals, get_trends
+from apps.home.models import Transaction
+from apps.home.utils import month_start
+
+# Ограниченный пул для запросов сводки: у каждого потока своё соединение с БД,
+# так что размер пула — это и предел соединений, открытых дашбордом
+_executor = ThreadPoolExecutor(
+    max_workers=settings.DASHBOARD_QUERY_THREADS,
+    thread_name_prefix='dashboard'
+)
+
+RECENT_TRANSACTIONS = 5
+
+
+def _in_pool(func):
+    """Выполняет func в пуле сводки, проверив соединение потока перед запросом."""
+    def run(*args, **kwargs):
+        # Соединение потока пула живёт между запросами: закрываем его,
+        # если оно устарело (CONN_MAX_AGE) или сломано
+        close_old_connections()
+        return func(*args, **kwargs)
+    return sync_to_async(run, thread_sensitive=False, executor=_executor)
+
+
+def _charts(user, months):
+    return get_dashboard(user, months=months).as_charts()
+
+
+def _month_by_day(user, today):
+    return ledger_series(user, month_start(today), today, 'day').as_json()
+
+
+def _year(user, today):
+    series = ledger_series(user, today.replace(month=1, day=1), today, 'year')
+    return {
+        'income': float(series.income[0]),
+        'expense': float(series.expense[0]),
+        'balance': float(series.balance[0]),
+        'count': series.count[0],
+    }
+
+
+def _budgets(user, today):
+    return [status.as_json() for status in budget_statuses(user, today)]
+
+
+def _trends(user):
+    return get_trends(user) if trends.available() else None
+
+
+def _recent(user):
+    rows = Transaction.objects.filter(user=user).select_related('category').order_by('-date', '-pk')
+    return [
+        {
+            'id': row.pk,
+            'date': row.date.isoformat(),
+            'amount': str(row.amount),
+            'type': row.transaction_type,
+            'category': row.category.name,
+            'description': row.description or '',
+        }
+        for row in rows[:RECENT_TRANSACTIONS]
+    ]
+
+
+async def dashboard_summary(user, months=6, today=None):
+    """
+    Все панели дашборда одним ответом. Запросы независимы и выполняются
+    параллельно в пуле потоков, поэтому время ответа близко к самому
+    медленному запросу, а не к их сумме.
+    """
+    today = today or timezone.now().date()
+    charts, month_by_day, year, total, recent, budgets, goals, ledger_trends = await asyncio.gather(
+        _in_pool(_charts)(user, months),
+        _in_pool(_month_by_day)(user, today),
+        _in_pool(_year)(user, today),
+        _in_pool(rollups.ledger_count)(user.pk),
+        _in_pool(_recent)(user),
+        _in_pool(_budgets)(user, today),
+        _in_pool(get_goals)(user),
+        _in_pool(_trends)(user),
+    )
+    return {
+        'charts': charts,
+        'month_by_day': month_by_day,
+        'year': year,
+        'transactions': total,
+        'recent': recent,
+        'budgets': budgets,
+        'goals': goals,
+        'trends': ledger_trends,
+    }
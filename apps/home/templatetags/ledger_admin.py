@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from apps.home import rollups
+from apps.home.pagination import ledger_period
+
+register = template.Library()
+
+
+def ledger_date_hierarchy(context, cl):
+    """
+    date_hierarchy админки по месячным агрегатам: годы и месяцы берутся
+    из MonthlyCategoryTotal, а не через SELECT DISTINCT по журналу.
+    Дни месяца и отфильтрованные списки — стандартным тегом.
+    """
+    field_name = cl.date_hierarchy
+    period = ledger_period(cl.get_filters_params(), field_name)
+    if period is None or cl.query:
+        return date_hierarchy(cl)
+
+    user_id = context['request'].user.pk
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    year_lookup = cl.params.get(year_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if year_lookup is None:
+        months = rollups.active_months(user_id)
+        if months and months[0] == months[-1]:
+            # Вся история в одном месяце: как и стандартный тег, сразу показываем дни
+            return date_hierarchy(cl)
+        if not months or months[0].year != months[-1].year:
+            years = sorted({month.year for month in months})
+            return {
+                'show': True,
+                'back': None,
+                'choices': [{'link': link({year_field: str(year)}), 'title': str(year)} for year in years],
+            }
+        year_lookup = months[0].year
+    elif cl.params.get(month_field) is not None:
+        return date_hierarchy(cl)
+    else:
+        months = rollups.active_months(user_id, *period)
+
+    return {
+        'show': True,
+        'back': {'link': link({}), 'title': _('All dates')},
+        'choices': [
+            {
+                'link': link({year_field: year_lookup, month_field: month.month}),
+                'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+            }
+            for month in months
+        ],
+    }
+
+
+@register.tag(name='ledger_date_hierarchy')
+def ledger_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=ledger_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=True,
+    )
@@ -2,7 +2,1385 @@
 """
 Copyright (c) 2019 - present AppSeed.us
 """
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from apps.home import budgets, jobs, recurring, rollups, snapshots, statements, trends
+from apps.home.analytics import ledger_series
+from apps.home.cache import dashboard_stats, get_dashboard, ledger_version
+from apps.home.dashboard import build_dashboard
+from apps.home.exports import export_rows
+from apps.home.goals import with_progress
+from apps.home.importers import import_statement, parse_csv, parse_ofx
+from apps.home.pagination import LedgerPaginator
+from apps.home.search import TransactionSearch, search_backend
+from apps.home.summary import RECENT_TRANSACTIONS, dashboard_summary
+from apps.home.utils import shift_months
+from apps.home.models import (
+    Budget, Category, DailyCategoryTotal, Job, MonthlyCategoryTotal, RecurringTransaction, SavingsGoal,
+    Transaction
+)
+from apps.instrumentation import QueryBudgetExceeded
+from apps.routers import ReplicaRouter, replica_reads
+
+
+class QueryPlanTests(TestCase):
+    """
+    Горячие запросы журнала должны идти по индексам.
+    Тест снимает EXPLAIN (SQLite или MySQL) и падает на полном сканировании
+    таблиц журнала и агрегатов (HOT_TABLES).
+    """
+    HOT_TABLES = ('home_transaction', 'home_monthlycategorytotal', 'home_dailycategorytotal', 'home_budget')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='plan')
+        cls.income = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        cls.expense = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=cls.user,
+                category=cls.income if day % 2 else cls.expense,
+                amount=100 + day,
+                date=date(2026, month, day)
+            )
+            for month in range(1, 13) for day in range(1, 28)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset):
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            scans = [
+                table for table in self.HOT_TABLES
+                if re.search(r'"table_name": "%s",[^}]*"access_type": "ALL"' % table, plan)
+            ]
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            scans = [
+                table for table in self.HOT_TABLES
+                if re.search(r'\bSCAN %s\b(?! USING (COVERING )?INDEX)' % table, plan)
+            ]
+        else:
+            self.skipTest(f'EXPLAIN не разбирается для {connection.vendor}')
+        self.assertFalse(scans, f'Полное сканирование {scans}:\n{plan}\n{queryset.query}')
+
+    def test_changelist_page(self):
+        self.assertNoFullScan(Transaction.objects.filter(user=self.user).order_by('-date', '-pk')[:100])
+
+    def test_date_hierarchy_month(self):
+        self.assertNoFullScan(Transaction.objects.filter(
+            user=self.user,
+            date__gte=date(2026, 3, 1),
+            date__lt=date(2026, 4, 1)
+        ).order_by('-date', '-pk'))
+
+    def test_type_filter_for_period(self):
+        self.assertNoFullScan(Transaction.objects.filter(
+            user=self.user,
+            transaction_type=Category.EXPENSE,
+            date__gte=date(2026, 3, 1),
+            date__lte=date(2026, 8, 31)
+        ).values('transaction_type').annotate(total=Sum('amount')).order_by())
+
+    def test_category_for_period(self):
+        self.assertNoFullScan(Transaction.objects.filter(
+            user=self.user,
+            category=self.expense,
+            date__range=(date(2026, 3, 1), date(2026, 3, 31))
+        ))
+
+    def test_rollup_rebuild(self):
+        self.assertNoFullScan(rollups.aggregate_ledger([self.user.pk]))
+        self.assertNoFullScan(rollups.aggregate_ledger([self.user.pk], DailyCategoryTotal))
+
+    def test_dashboard_rollups(self):
+        self.assertNoFullScan(MonthlyCategoryTotal.objects.filter(
+            user=self.user,
+            month__gte=date(2026, 5, 1),
+            month__lte=date(2026, 10, 1)
+        ).values('month', 'category__type', 'category__name').annotate(
+            total=Sum('total')
+        ).order_by())
+
+    def test_analytics_daily_rollups(self):
+        self.assertNoFullScan(DailyCategoryTotal.objects.filter(
+            user=self.user,
+            date__gte=date(2026, 1, 5),
+            date__lt=date(2026, 6, 1)
+        ).values_list('date', 'category__type').annotate(
+            total=Sum('total')
+        ).order_by())
+
+    def test_active_budgets(self):
+        self.assertNoFullScan(Budget.objects.filter(
+            user=self.user,
+            start_date__lte=date(2026, 6, 15),
+            end_date__gte=date(2026, 6, 15)
+        ).select_related('category'))
+
+    def test_goal_progress(self):
+        goal = SavingsGoal.objects.create(
+            user=self.user, name='Отпуск', target_amount=5000, current_amount=100,
+            start_date=date(2026, 3, 1), target_date=date(2026, 12, 31)
+        )
+        goal.categories.add(self.income)
+        goals = with_progress(SavingsGoal.objects.filter(user=self.user), date(2026, 3, 31))
+        self.assertNoFullScan(goals)
+
+    def test_budget_spent(self):
+        Budget.objects.create(
+            user=self.user, category=self.expense, amount=1000,
+            start_date=date(2026, 3, 10), end_date=date(2026, 4, 5)
+        )
+        # Пересчёт spent (refresh_spent, verify) — подзапрос по дневным агрегатам окна
+        self.assertNoFullScan(Budget.objects.filter(user=self.user).annotate(spent_now=budgets._spent_subquery()))
+
+    def test_trends_totals(self):
+        if not trends.available():
+            self.skipTest('numpy не установлен')
+        # Журнал не единственного пользователя: иначе фильтр по user_id не избирателен
+        other = User.objects.create(username='plan-other')
+        category = Category.objects.create(user=other, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=other, category=category, amount=10, date=date(2026, month, day))
+            for month in range(1, 13) for day in range(1, 28)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # Тот же запрос, что snapshots.from_rollups при загрузке журнала
+        self.assertNoFullScan(DailyCategoryTotal.objects.filter(user=self.user).exclude(total=0).values_list(
+            'date', 'category_id', 'total'
+        ))
+
+
+@override_settings(QUERY_BUDGETS_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """
+    Бюджеты SQL-запросов горячих страниц (apps.instrumentation).
+    В строгом режиме превышение бюджета роняет запрос и тест.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='budget', password='budgetpass123')
+        cls.categories = [
+            Category.objects.create(user=cls.user, name=f'Категория {number}', type=Category.EXPENSE)
+            for number in range(20)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_transactions(self, count):
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user,
+                category=self.categories[number % len(self.categories)],
+                amount=100,
+                date=date(2026, 1 + number % 12, 1)
+            )
+            for number in range(count)
+        ])
+
+    def test_dashboard_within_budget(self):
+        self.add_transactions(50)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_admin_changelist_without_n_plus_one(self):
+        url = reverse('admin:home_transaction_changelist')
+        self.add_transactions(2)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self.add_transactions(100)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many), [query['sql'] for query in many])
+
+    @override_settings(QUERY_BUDGETS={'home': 1})
+    def test_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('home'))
+
+    def test_metrics(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('fintracker_db_queries_total{view="home"}', response.content.decode())
+
+
+@override_settings(DB_REPLICA_NAME='replica')
+@mock.patch('apps.routers._replica_available', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    """Выбор БД для чтения (apps.routers); сама реплика не подключается."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='replica', password='replicapass123')
+        cls.category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+
+    def setUp(self):
+        # Создание категории в setUpTestData уже пометило пользователя как писавшего
+        cache.clear()
+
+    def test_reads_and_stickiness(self, available):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+        with replica_reads(self.user.pk):
+            self.assertEqual(router.db_for_read(Transaction), 'replica')
+            self.assertEqual(router.db_for_write(Transaction), 'default')
+
+        # После записи пользователь читает свои данные из основной БД
+        Transaction.objects.create(user=self.user, category=self.category, amount=100, date=date(2026, 1, 1))
+        with replica_reads(self.user.pk):
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), 'replica')
+
+
+class LedgerSnapshotTests(TestCase):
+    """Снимок журнала (apps.home.snapshots) совпадает с дневными агрегатами после записей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='snapshot')
+        cls.category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=cls.category, amount=10 + day, date=date(2026, 1, day))
+            for day in range(1, 29)
+        ])
+
+    def setUp(self):
+        if not trends.available():
+            self.skipTest('numpy не установлен')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        snapshot_dir = override_settings(LEDGER_SNAPSHOT_DIR=directory.name)
+        snapshot_dir.enable()
+        self.addCleanup(snapshot_dir.disable)
+
+    def test_appends_and_compaction(self):
+        self.assertEqual(len(snapshots.load(self.user.pk).days), 28)
+        other = Category.objects.create(user=self.user, name='Кафе', type=Category.EXPENSE)
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = Transaction.objects.create(user=self.user, category=other, amount=5, date=date(2026, 2, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            changed.amount = 7
+            changed.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.filter(user=self.user, date=date(2026, 1, 3)).delete()
+        self.assertEqual(len(snapshots.load(self.user.pk).days), 28 + 3 + 1)
+        self.assertEqual(snapshots.verify([self.user.pk]), [])
+
+        # Строк стало больше чем вдвое против сборки — снимок схлопывается
+        with mock.patch.object(snapshots, 'COMPACT_MIN_ROWS', 0), self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.bulk_create([
+                Transaction(user=self.user, category=other, amount=1, date=date(2026, 2, 1)) for _ in range(30)
+            ])
+        self.assertEqual(len(snapshots.load(self.user.pk).days), 28)
+        self.assertEqual(snapshots.verify([self.user.pk]), [])
+
+    def test_build_reads_primary(self):
+        # Реплика могла не получить приращения, уже дописанные в снимок
+        with mock.patch.object(snapshots.router, 'db_for_read', return_value='missing'):
+            self.assertEqual(len(snapshots.load(self.user.pk).days), 28)
+
+    def test_build_between_commit_and_append(self):
+        snapshots.load(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(user=self.user, category=self.category, amount=5, date=date(2026, 1, 1))
+        # Агрегаты уже содержат запись, приращение в снимок ещё не дописано:
+        # снимок собирается заново и читает запись из агрегатов
+        snapshots.invalidate([self.user.pk])
+        snapshots.load(self.user.pk)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(snapshots.load(self.user.pk).days), 28)
+        self.assertEqual(snapshots.verify([self.user.pk]), [])
+
+    def test_rebuilds_other_format(self):
+        snapshots.load(self.user.pk)
+        directory = snapshots._directory(self.user.pk)
+        meta = snapshots._read_meta(directory)
+        del meta['format']
+        snapshots._write_meta(directory, meta)
+        self.assertEqual(len(snapshots.load(self.user.pk).days), 28)
+        self.assertEqual(snapshots._read_meta(directory)['generation'], meta['generation'] + 1)
+        self.assertEqual(snapshots.verify([self.user.pk]), [])
+
+
+class RecurringTransactionTests(TestCase):
+    """Планировщик регулярных транзакций (apps.home.recurring)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='recurring')
+        cls.rent = Category.objects.create(user=cls.user, name='Жилье', type=Category.EXPENSE)
+
+    def test_catch_up_is_idempotent(self):
+        rule = RecurringTransaction.objects.create(
+            user=self.user, category=self.rent, amount=35000, start_date=date(2026, 1, 31)
+        )
+        self.assertEqual(rule.next_date, date(2026, 1, 31))
+        self.assertEqual(recurring.materialize(date(2026, 4, 30)), (4, 1))
+        self.assertEqual(
+            list(rule.transactions.order_by('date').values_list('date', flat=True)),
+            [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+        )
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, date(2026, 5, 31))
+
+        self.assertEqual(recurring.materialize(date(2026, 4, 30)), (0, 0))
+        # Расписание изменили: созданные даты не повторяются
+        rule.start_date = date(2026, 1, 15)
+        rule.save()
+        self.assertEqual(rule.next_date, date(2026, 5, 15))
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+    def test_batch_queries(self):
+        RecurringTransaction.objects.bulk_create([
+            RecurringTransaction(
+                user=self.user, category=self.rent, amount=100, frequency=RecurringTransaction.DAILY,
+                start_date=date(2026, 1, 1), next_date=date(2026, 1, 1)
+            )
+            for _ in range(3)
+        ])
+        Budget.objects.bulk_create([
+            Budget(user=self.user, category=self.rent, amount=5000, start_date=start, end_date=end)
+            for start, end in ((date(2026, 1, 1), date(2026, 1, 31)), (date(2026, 2, 1), date(2026, 3, 31)))
+        ])
+        # Все запросы пачки, включая агрегаты и бюджеты, не зависят от числа
+        # шаблонов и повторений: 270 транзакций по 90 дням
+        with CaptureQueriesContext(connection) as queries:
+            created, claimed = recurring.materialize(date(2026, 3, 31), batch_size=10)
+        self.assertEqual((created, claimed), (3 * 90, 3))
+        self.assertLessEqual(len(queries), 14, [query['sql'][:80] for query in queries.captured_queries])
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+        self.assertEqual(budgets.verify([self.user.pk]), [])
+
+
+class JobQueueTests(TestCase):
+    """Очередь фоновых задач (apps.home.jobs): выполнение, прогресс и повторы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jobs')
+        category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=category, amount=day, date=date(2026, 1, day))
+            for day in range(1, 11)
+        ])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        job_files = override_settings(JOB_FILES_DIR=directory.name, JOB_RETRY_DELAY=30)
+        job_files.enable()
+        self.addCleanup(job_files.disable)
+
+    def test_export_job(self):
+        job = jobs.enqueue('export', user=self.user, format='csv')
+        self.assertEqual(jobs.work(jobs.worker_name()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.attempts), (Job.DONE, 100, 1))
+        self.assertEqual(job.result['rows'], 10)
+        with open(jobs.job_path(job.result['file']), encoding='utf-8') as file:
+            self.assertEqual(len(file.read().splitlines()), 11)
+
+        self.client.force_login(self.user)
+        status = self.client.get(reverse('job_status', args=[job.pk])).json()
+        self.assertEqual(status['file_url'], reverse('job_file', args=[job.pk]))
+
+    def test_retry_with_backoff(self):
+        failing = mock.Mock(side_effect=RuntimeError('сбой'))
+        with mock.patch.dict(jobs.TASKS, {'export': failing}):
+            job = jobs.enqueue('export', user=self.user, max_attempts=2, format='csv')
+            with self.assertLogs('apps.home.jobs', 'ERROR'):
+                jobs.work(jobs.worker_name())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertGreater(job.run_after, job.started_at)
+
+            # Задержка ещё не прошла — воркер задачу не берёт
+            self.assertEqual(jobs.work(jobs.worker_name()), 0)
+            Job.objects.filter(pk=job.pk).update(run_after=job.started_at)
+            with self.assertLogs('apps.home.jobs', 'ERROR'):
+                jobs.work(jobs.worker_name())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('RuntimeError', job.error)
+
+    def upload(self, content):
+        path = jobs.job_path('uploads', 'statement.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_upload_removed_on_any_outcome(self):
+        path = self.upload('date,amount,category\n2026-01-05,-100,Кафе\n')
+        job = jobs.enqueue('import_statement', user=self.user, path=path, format='csv')
+        jobs.work(jobs.worker_name())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result['created']), (Job.DONE, 1))
+        self.assertFalse(os.path.exists(path))
+
+        # Ошибка во входных данных — повторов не будет
+        path = self.upload('сумма;описание\n')
+        job = jobs.enqueue('import_statement', user=self.user, path=path, format='csv')
+        with self.assertLogs('apps.home.jobs', 'ERROR'):
+            jobs.work(jobs.worker_name())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertFalse(os.path.exists(path))
+
+        # Сбой с повтором оставляет файл до последней попытки
+        path = self.upload('date,amount,category\n')
+        failing = mock.Mock(side_effect=RuntimeError('сбой'))
+        with mock.patch.dict(jobs.TASKS, {'import_statement': failing}):
+            job = jobs.enqueue('import_statement', user=self.user, max_attempts=2, path=path, format='csv')
+            with self.assertLogs('apps.home.jobs', 'ERROR'):
+                jobs.work(jobs.worker_name())
+            self.assertTrue(os.path.exists(path))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            with self.assertLogs('apps.home.jobs', 'ERROR'):
+                jobs.work(jobs.worker_name())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertFalse(os.path.exists(path))
+
+
+class MonthlyStatementTests(TestCase):
+    """Выписки за месяц (apps.home.statements) собираются заранее и отдаются готовыми файлами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='statement')
+        salary = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=salary, amount=1000, date=date(2026, 9, 1)),
+            Transaction(user=cls.user, category=food, amount=150, date=date(2026, 9, 10)),
+            Transaction(user=cls.user, category=food, amount=50, date=date(2026, 9, 30)),
+            # Другой месяц в выписку не попадает
+            Transaction(user=cls.user, category=food, amount=999, date=date(2026, 10, 1)),
+        ])
+        Budget.objects.create(
+            user=cls.user, category=food, amount=300, start_date=date(2026, 9, 1), end_date=date(2026, 9, 30)
+        )
+        goal = SavingsGoal.objects.create(
+            user=cls.user, name='Отпуск', target_amount=5000, current_amount=100,
+            start_date=date(2026, 1, 1), target_date=date(2026, 12, 31)
+        )
+        goal.categories.add(salary)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        statements_dir = override_settings(STATEMENTS_DIR=directory.name)
+        statements_dir.enable()
+        self.addCleanup(statements_dir.disable)
+
+    def test_build(self):
+        statement = statements.build([self.user], date(2026, 9, 1))[self.user.pk]
+        self.assertEqual((statement.income, statement.expense), (1000, 200))
+        self.assertEqual(statement.budgets[0].budget.spent, 200)
+        self.assertEqual(statement.goals[0].saved, 1100)
+
+    def test_budget_spent_at_month_end(self):
+        # Бюджет переходит на следующий месяц: траты октября в сентябрьскую выписку не входят
+        budget = Budget.objects.create(
+            user=self.user, category=Category.objects.get(user=self.user, name='Продукты'), amount=2000,
+            start_date=date(2026, 9, 15), end_date=date(2026, 10, 15)
+        )
+        self.assertEqual(budget.spent, 1049)
+        with self.assertNumQueries(3):
+            statement = statements.build([self.user], date(2026, 9, 1))[self.user.pk]
+        self.assertEqual([status.budget.spent for status in statement.budgets], [200, 50])
+        self.assertEqual(statement.budgets[1].remaining, 1950)
+
+    def test_generate_and_serve(self):
+        self.assertEqual(statements.generate_month(date(2026, 9, 1), [self.user.pk]), 1)
+        manifest = statements.read_manifest(date(2026, 9, 1))
+        self.assertEqual(manifest['users'][str(self.user.pk)]['formats'], statements.formats())
+
+        self.client.force_login(self.user)
+        url = reverse('statement_file', args=['2026-09', 'csv'])
+        # Выписка — готовый файл: запросы только к сессии и пользователю
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('Итоги,Расходы,200.00', content)
+        self.assertIn('Бюджеты,Продукты,01.09.2026 – 30.09.2026,300.00,200.00,100.00', content)
+        self.assertNotIn('999', content)
+
+        self.assertEqual(self.client.get(reverse('statement_file', args=['2026-08', 'csv'])).status_code, 404)
+        self.assertContains(self.client.get(reverse('statements')), url)
+
+
+class DashboardTests(TestCase):
+    """Ряды дашборда (apps.home.dashboard) из одной выборки помесячных агрегатов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='dashboard')
+        salary = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cafe = Category.objects.create(user=cls.user, name='Кафе', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=salary, amount=1000, date=date(2026, 1, 5)),
+            Transaction(user=cls.user, category=food, amount=300, date=date(2026, 1, 20)),
+            # Февраль и март без транзакций
+            Transaction(user=cls.user, category=food, amount=200, date=date(2026, 4, 2)),
+            Transaction(user=cls.user, category=cafe, amount=50, date=date(2026, 4, 3)),
+            Transaction(user=cls.user, category=cafe, amount=200, date=date(2026, 4, 28)),
+            # До окна дашборда
+            Transaction(user=cls.user, category=salary, amount=999, date=date(2025, 10, 1)),
+        ])
+
+    def test_zero_filled_series_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = build_dashboard(self.user, months=4, today=date(2026, 4, 15))
+        self.assertEqual(data.months, [date(2026, month, 1) for month in range(1, 5)])
+        self.assertEqual(data.income, [1000, 0, 0, 0])
+        self.assertEqual(data.expense, [300, 0, 0, 450])
+        self.assertEqual(data.balance, [700, 0, 0, -450])
+        self.assertEqual(data.category_labels, ['Кафе', 'Продукты'])
+        self.assertEqual(data.category_expenses, [250, 200])
+
+
+class RollupMaintenanceTests(TestCase):
+    """Агрегаты (apps.home.rollups) следуют за журналом при любых видах записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='rollups')
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.cafe = Category.objects.create(user=cls.user, name='Кафе', type=Category.EXPENSE)
+
+    def totals(self, model=MonthlyCategoryTotal):
+        period = 'month' if model is MonthlyCategoryTotal else 'date'
+        return {
+            (category_id, day): (total, count)
+            for category_id, day, total, count in model.objects.filter(
+                user=self.user, count__gt=0
+            ).values_list('category_id', period, 'total', 'count')
+        }
+
+    def test_create_update_delete(self):
+        first = Transaction.objects.create(user=self.user, category=self.food, amount=100, date=date(2026, 1, 5))
+        Transaction.objects.create(user=self.user, category=self.food, amount=50, date=date(2026, 1, 20))
+        self.assertEqual(self.totals(), {(self.food.pk, date(2026, 1, 1)): (150, 2)})
+
+        first.amount, first.category, first.date = 70, self.cafe, date(2026, 2, 3)
+        first.save()
+        self.assertEqual(self.totals(), {
+            (self.food.pk, date(2026, 1, 1)): (50, 1),
+            (self.cafe.pk, date(2026, 2, 1)): (70, 1),
+        })
+        self.assertEqual(self.totals(DailyCategoryTotal), {
+            (self.food.pk, date(2026, 1, 20)): (50, 1),
+            (self.cafe.pk, date(2026, 2, 3)): (70, 1),
+        })
+
+        first.delete()
+        self.assertEqual(self.totals(), {(self.food.pk, date(2026, 1, 1)): (50, 1)})
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+    def test_bulk_operations(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=self.food, amount=10, date=date(2026, 3, day))
+            for day in range(1, 29)
+        ])
+        self.assertEqual(self.totals(), {(self.food.pk, date(2026, 3, 1)): (280, 28)})
+
+        Transaction.objects.filter(user=self.user, date__day__lte=10).update(category=self.cafe)
+        transactions = list(Transaction.objects.filter(user=self.user, date__day=28))
+        transactions[0].amount = 100
+        Transaction.objects.bulk_update(transactions, ['amount'])
+        self.assertEqual(self.totals(), {
+            (self.cafe.pk, date(2026, 3, 1)): (100, 10),
+            (self.food.pk, date(2026, 3, 1)): (270, 18),
+        })
+
+        # Удаление не загружает строки: запросы не зависят от их числа
+        with CaptureQueriesContext(connection) as queries:
+            Transaction.objects.filter(user=self.user, category=self.food).delete()
+        loaded = [query['sql'] for query in queries.captured_queries if 'description' in query['sql']]
+        self.assertEqual(loaded, [])
+        self.assertEqual(self.totals(), {(self.cafe.pk, date(2026, 3, 1)): (100, 10)})
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+        # Каскад удаляет транзакции и агрегаты категории вместе с ней
+        self.cafe.delete()
+        self.assertEqual(self.totals(), {})
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+    def test_verify_ignores_float_sum_error(self):
+        # На SQLite эта сумма считается как 77778.2600000001
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=self.food, amount=amount, date=date(2026, 4, 1))
+            for amount in [Decimal('77777.77')] + [Decimal('0.07')] * 7
+        ])
+        rollups.rebuild([self.user.pk])
+        self.assertEqual(self.totals(), {(self.food.pk, date(2026, 4, 1)): (Decimal('77778.26'), 8)})
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+    def test_rollup_writes_do_not_grow_with_keys(self):
+        Transaction.objects.create(user=self.user, category=self.food, amount=5, date=date(2026, 5, 1))
+        with CaptureQueriesContext(connection) as queries:
+            Transaction.objects.bulk_create([
+                Transaction(user=self.user, category=category, amount=10, date=date(2026, 5, day))
+                for day in range(1, 31) for category in (self.food, self.cafe)
+            ])
+        # 60 дневных ключей и 2 месячных: по одному upsert на таблицу агрегатов
+        for model in (DailyCategoryTotal, MonthlyCategoryTotal):
+            writes = [query for query in queries.captured_queries if model._meta.db_table in query['sql']]
+            self.assertEqual(len(writes), 1)
+        self.assertEqual(self.totals(), {
+            (self.food.pk, date(2026, 5, 1)): (305, 31),
+            (self.cafe.pk, date(2026, 5, 1)): (300, 30),
+        })
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+
+class DashboardCacheTests(TestCase):
+    """Кэш дашборда (apps.home.cache): попадания, изоляция пользователей и инвалидация записью."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='cached')
+        cls.other = User.objects.create(username='neighbour')
+        cls.category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.other_category = Category.objects.create(user=cls.other, name='Продукты', type=Category.EXPENSE)
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, user, category, amount, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=user, category=category, amount=amount, date=timezone.now().date(), **kwargs
+            )
+
+    def test_hit_and_miss(self):
+        self.add(self.user, self.category, 100)
+        first = get_dashboard(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard(self.user).expense, first.expense)
+        self.assertEqual(dashboard_stats(), {'hits': 1, 'misses': 1})
+
+    def test_users_are_isolated(self):
+        self.add(self.user, self.category, 100)
+        get_dashboard(self.user)
+        version = ledger_version(self.user.pk)
+        self.add(self.other, self.other_category, 30)
+        self.assertEqual(ledger_version(self.user.pk), version)
+        self.assertEqual(get_dashboard(self.other).expense[-1], 30)
+        self.assertEqual(get_dashboard(self.user).expense[-1], 100)
+
+    def test_invalidation_after_commit(self):
+        get_dashboard(self.user)
+        version = ledger_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(user=self.user, category=self.category, amount=5, date=timezone.now().date())
+            # До фиксации читатели видят прежнюю версию и прежние данные
+            self.assertEqual(ledger_version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(ledger_version(self.user.pk), version)
+        self.assertEqual(get_dashboard(self.user).expense[-1], 5)
+
+        today = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.bulk_create([
+                Transaction(user=self.user, category=self.category, amount=10, date=today) for _ in range(3)
+            ])
+        self.assertEqual(get_dashboard(self.user).expense[-1], 35)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.filter(user=self.user).update(amount=1)
+        self.assertEqual(get_dashboard(self.user).expense[-1], 4)
+
+
+class StatementImportTests(TestCase):
+    """Разбор выписок и поиск дубликатов (apps.home.importers)."""
+
+    CSV = (
+        'Дата;Сумма;Категория;Описание\n'
+        '05.03.2026;-350,50;Кафе;Кофе\n'
+        '05.03.2026;-350,50;Кафе;Кофе\n'
+        '2026-03-06;120 000,00;Зарплата;\n'
+        'вчера;-10;Кафе;\n'
+        '07.03.2026;-12,5;;Такси\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='importer')
+
+    def import_csv(self, content, batch_size=1000):
+        return import_statement(self.user, io.StringIO(content), 'csv', batch_size=batch_size)
+
+    def test_parse_csv(self):
+        rows = list(parse_csv(io.StringIO(self.CSV)))
+        self.assertEqual(rows[0].date, date(2026, 3, 5))
+        self.assertEqual(rows[0].amount, Decimal('-350.50'))
+        self.assertEqual((rows[0].category, rows[0].description), ('Кафе', 'Кофе'))
+        self.assertEqual(rows[2].amount, Decimal('120000.00'))
+        self.assertIsNone(rows[2].description)
+        self.assertEqual(rows[3].line, 5)
+        self.assertIn('формат даты', rows[3].error)
+        self.assertIsNone(rows[4].category)
+
+    def test_parse_ofx_across_chunks(self):
+        ofx = (
+            '<OFX><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260305120000<TRNAMT>-99.90<NAME>Аптека</STMTTRN>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260306<TRNAMT>1500<MEMO>Возврат</STMTTRN>'
+            '</BANKTRANLIST></OFX>'
+        )
+        # Куски по 7 символов режут теги посередине
+        rows = list(parse_ofx(io.StringIO(ofx), chunk_size=7))
+        self.assertEqual(
+            [(row.date, row.amount, row.description) for row in rows],
+            [(date(2026, 3, 5), Decimal('-99.90'), 'Аптека'), (date(2026, 3, 6), Decimal('1500'), 'Возврат')]
+        )
+
+    def test_equal_rows_across_batches(self):
+        # Две одинаковые покупки кофе в разных пачках — обе настоящие
+        stats = self.import_csv(self.CSV, batch_size=1)
+        self.assertEqual((stats.created, stats.duplicates, stats.skipped), (4, 0, 1))
+        self.assertEqual(Transaction.objects.filter(user=self.user, description='Кофе').count(), 2)
+        self.assertEqual(rollups.verify([self.user.pk]), [])
+
+        # Повторный импорт той же выписки ничего не добавляет
+        stats = self.import_csv(self.CSV, batch_size=1)
+        self.assertEqual((stats.created, stats.duplicates), (0, 4))
+
+        # В выписке стало три одинаковые покупки — добавляется одна
+        stats = self.import_csv(self.CSV + '05.03.2026;-350,50;Кафе;Кофе\n', batch_size=2)
+        self.assertEqual((stats.created, stats.duplicates), (1, 4))
+        self.assertEqual(Transaction.objects.filter(user=self.user, description='Кофе').count(), 3)
+
+
+class TransactionExportTests(TestCase):
+    """Выгрузка журнала (apps.home.exports) порциями по ключу (date, id)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='exporterpass123')
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.cafe = Category.objects.create(user=cls.user, name='Кафе', type=Category.EXPENSE)
+        # Несколько транзакций на одну дату: порции режут группы одинаковых дат
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=cls.user, category=cls.food if number % 3 else cls.cafe,
+                amount=number + 1, date=date(2026, 5, 1 + number // 4), description=f'#{number}'
+            )
+            for number in range(10)
+        ])
+
+    def test_chunks_match_single_query(self):
+        expected = list(Transaction.objects.filter(user=self.user).order_by('date', 'id').values_list(
+            'date', 'amount', 'transaction_type', 'category__name', 'description'
+        ))
+        for chunk_size in (1, 3, 4, 100):
+            self.assertEqual(list(export_rows(self.user, chunk_size=chunk_size)), expected)
+        filtered = list(export_rows(self.user, date_from=date(2026, 5, 2), category_ids=[self.cafe.pk], chunk_size=1))
+        self.assertEqual([row[-1] for row in filtered], ['#6', '#9'])
+
+    def test_streaming_download(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('export_transactions', args=['csv']), {'date_to': '2026-05-01'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'date,amount,type,category,description')
+        self.assertEqual(lines[1:], [
+            f'2026-05-01,{number + 1}.00,expense,{"Продукты" if number % 3 else "Кафе"},#{number}'
+            for number in range(4)
+        ])
+
+        response = self.client.get(reverse('export_transactions', args=['jsonl']))
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records[-1]['amount'], '10.00')
+
+
+class LedgerPaginatorTests(TestCase):
+    """Keyset-страницы журнала (apps.home.pagination) совпадают со страницами по OFFSET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='paginator')
+        category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        # По семь транзакций на дату: границы страниц попадают внутрь групп одинаковых дат
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=category, amount=number + 1, date=date(2026, 2, 1 + number // 7))
+            for number in range(47)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, paginator, numbers):
+        return [[row.pk for row in paginator.page(number).object_list] for number in numbers]
+
+    def test_pages_match_offset_pagination(self):
+        queryset = Transaction.objects.filter(user=self.user).order_by('-date', '-pk')
+        numbers = range(1, 11)
+        expected = self.pages(Paginator(queryset, 5), numbers)
+        self.assertEqual(sum(map(len, expected)), 47)
+
+        # Подряд (граница берётся с предыдущей страницы) и сразу на дальние страницы
+        self.assertEqual(self.pages(LedgerPaginator(queryset, 5, user=self.user), numbers), expected)
+        cache.clear()
+        self.assertEqual(self.pages(LedgerPaginator(queryset, 5, user=self.user), [7, 3, 10]),
+                         [expected[6], expected[2], expected[9]])
+
+
+class TransactionSearchTests(TestCase):
+    """Полнотекстовый поиск (apps.home.search): индекс следует за журналом через триггеры."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='search')
+        cls.other = User.objects.create(username='search-other')
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.taxi = Transaction.objects.create(
+            user=cls.user, category=cls.food, amount=300, date=date(2026, 3, 1), description='Такси до вокзала'
+        )
+        other_food = Category.objects.create(user=cls.other, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.create(
+            user=cls.other, category=other_food, amount=100, date=date(2026, 3, 2), description='Такси домой'
+        )
+
+    def found(self, query):
+        return [row.pk for row in TransactionSearch(self.user, query).ranked()[1]]
+
+    def test_fts_index_is_installed(self):
+        if connection.vendor == 'sqlite':
+            self.assertEqual(search_backend('default'), 'fts5')
+
+    def test_insert_update_and_category_rename(self):
+        self.assertEqual(self.found('такс'), [self.taxi.pk])
+        self.assertEqual(self.found('вокзал продук'), [self.taxi.pk])
+
+        self.taxi.description = 'Аренда самоката'
+        self.taxi.save()
+        self.assertEqual(self.found('такси'), [])
+        self.assertEqual(self.found('самокат'), [self.taxi.pk])
+
+        self.food.name = 'Транспорт'
+        self.food.save()
+        self.assertEqual(self.found('продукты'), [])
+        self.assertEqual(self.found('транспорт самокат'), [self.taxi.pk])
+
+    def test_delete(self):
+        self.taxi.delete()
+        self.assertEqual(self.found('такси'), [])
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search_transactions'), {'q': 'такси', 'per_page': 5})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['total'], data['page'], data['per_page']), (1, 1, 5))
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['id'], self.taxi.pk)
+        self.assertEqual(data['results'][0]['category'], 'Продукты')
+        self.assertEqual(data['results'][0]['amount'], '300.00')
+
+        self.assertEqual(self.client.get(reverse('search_transactions')).status_code, 400)
+
+
+class ConditionalResponseTests(TestCase):
+    """Last-Modified и 304 у JSON API: версия журнала и начало окна ответа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='conditional')
+        cls.category = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, name, since=None):
+        # Только If-Modified-Since, без If-None-Match
+        headers = {'HTTP_IF_MODIFIED_SINCE': since} if since else {}
+        return self.client.get(reverse(name), **headers)
+
+    def test_not_modified_until_write(self):
+        first = self.get('budgets')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get('budgets', first['Last-Modified']).status_code, 304)
+
+        # Заголовок с точностью до секунды: запись «через две секунды»
+        with mock.patch('apps.home.cache.time') as clock:
+            clock.time_ns.return_value = ledger_version(self.user.pk) + 2 * 10 ** 9
+            with self.captureOnCommitCallbacks(execute=True):
+                Transaction.objects.create(
+                    user=self.user, category=self.category, amount=5, date=timezone.now().date()
+                )
+        second = self.get('budgets', first['Last-Modified'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['Last-Modified'], first['Last-Modified'])
+
+    def test_window_start_bounds_last_modified(self):
+        # Журнал не менялся с прошлого года: ответ всё равно новее начала окна
+        with mock.patch('apps.home.cache.time') as clock:
+            clock.time_ns.return_value = 1735689600 * 10 ** 9  # 2025-01-01 00:00 UTC
+            ledger_version(self.user.pk)
+        today = timezone.now().date()
+        self.assertEqual(self.get('budgets')['Last-Modified'], f'{today:%a, %d %b %Y} 00:00:00 GMT')
+        response = self.client.get(reverse('chart_data', args=['expense']))
+        self.assertEqual(response['Last-Modified'], f'{today.replace(day=1):%a, %d %b %Y} 00:00:00 GMT')
+        self.assertEqual(self.get('budgets', 'Tue, 31 Dec 2024 12:00:00 GMT').status_code, 200)
+
+
+class AnalyticsSeriesTests(TestCase):
+    """Ряды аналитики (apps.home.analytics): корзины выровнены по началу периода, пропуски — нули."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='analytics')
+        salary = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            # Воскресенье и понедельник — разные недели
+            Transaction(user=cls.user, category=food, amount=10, date=date(2026, 1, 4)),
+            Transaction(user=cls.user, category=food, amount=20, date=date(2026, 1, 5)),
+            Transaction(user=cls.user, category=salary, amount=500, date=date(2026, 1, 7)),
+            # Следующая транзакция — через две пустые недели
+            Transaction(user=cls.user, category=food, amount=40, date=date(2026, 1, 28)),
+            # Второй квартал пуст
+            Transaction(user=cls.user, category=salary, amount=700, date=date(2026, 8, 15)),
+        ])
+
+    def test_weeks(self):
+        with self.assertNumQueries(1):
+            series = ledger_series(self.user, date(2026, 1, 1), date(2026, 1, 28), 'week')
+        # Период расширен до понедельника 29.12.2025 и воскресенья 01.02.2026
+        self.assertEqual(series.buckets, [
+            date(2025, 12, 29), date(2026, 1, 5), date(2026, 1, 12), date(2026, 1, 19), date(2026, 1, 26)
+        ])
+        self.assertEqual(series.expense, [10, 20, 0, 0, 40])
+        self.assertEqual(series.income, [0, 500, 0, 0, 0])
+        self.assertEqual(series.count, [1, 2, 0, 0, 1])
+        data = series.as_json()
+        self.assertEqual((data['start'], data['end']), ('2025-12-29', '2026-02-01'))
+        self.assertEqual(data['labels'], ['2026-W01', '2026-W02', '2026-W03', '2026-W04', '2026-W05'])
+
+    def test_quarters(self):
+        with self.assertNumQueries(1):
+            series = ledger_series(self.user, date(2026, 2, 10), date(2026, 8, 1), 'quarter')
+        self.assertEqual(series.buckets, [date(2026, 1, 1), date(2026, 4, 1), date(2026, 7, 1)])
+        self.assertEqual(series.income, [500, 0, 700])
+        self.assertEqual(series.expense, [70, 0, 0])
+        self.assertEqual(series.balance, [430, 0, 700])
+        data = series.as_json()
+        self.assertEqual((data['start'], data['end']), ('2026-01-01', '2026-09-30'))
+        self.assertEqual(data['labels'], ['2026-Q1', '2026-Q2', '2026-Q3'])
+
+
+class DashboardSummaryTests(TransactionTestCase):
+    """
+    Сводка дашборда (apps.home.summary). Панели читаются в потоках пула со
+    своими соединениями, поэтому данные фиксируются, а не живут в транзакции теста.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.user = User.objects.create(username='summary')
+        salary = Category.objects.create(user=self.user, name='Зарплата', type=Category.INCOME)
+        self.food = Category.objects.create(user=self.user, name='Продукты', type=Category.EXPENSE)
+        Transaction.objects.create(user=self.user, category=salary, amount=1000, date=self.today.replace(day=1))
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=self.food, amount=10 * number, date=self.today.replace(day=1),
+                        description=f'Покупка {number}')
+            for number in range(1, 7)
+        ])
+        Budget.objects.create(
+            user=self.user, category=self.food, amount=500, start_date=self.today.replace(day=1), end_date=self.today
+        )
+
+    def test_panels(self):
+        summary = async_to_sync(dashboard_summary)(self.user, months=3, today=self.today)
+        self.assertEqual(summary['transactions'], 7)
+        self.assertEqual(summary['year']['income'], 1000)
+        self.assertEqual(summary['year']['expense'], 210)
+        self.assertEqual(summary['month_by_day']['expense'][0], 210)
+        self.assertEqual(len(summary['month_by_day']['labels']), self.today.day)
+        self.assertEqual(len(summary['charts']['main_chart']['labels']), 3)
+        self.assertEqual(len(summary['recent']), RECENT_TRANSACTIONS)
+        self.assertEqual(summary['recent'][0]['description'], 'Покупка 6')
+        self.assertEqual([budget['spent'] for budget in summary['budgets']], [210])
+        self.assertEqual(summary['goals'], [])
+        self.assertEqual(summary['trends'] is None, not trends.available())
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('dashboard'), {'months': 0}).status_code, 400)
+        response = self.client.get(reverse('dashboard'), {'months': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['transactions'], 7)
+        self.assertEqual(len(data['charts']['main_chart']['labels']), 2)
+
+
+class BudgetSpentTests(TestCase):
+    """Budget.spent (apps.home.budgets) считается в UPDATE и следует за окном бюджета."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='budget-spent')
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.cafe = Category.objects.create(user=cls.user, name='Кафе', type=Category.EXPENSE)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=category, amount=amount, date=date(2026, 3, day))
+            for day in range(1, 31) for category, amount in ((cls.food, 10), (cls.cafe, 1))
+        ])
+
+    def create(self, start_date=date(2026, 3, 1), end_date=date(2026, 3, 31)):
+        return Budget.objects.create(
+            user=self.user, category=self.food, amount=500, start_date=start_date, end_date=end_date
+        )
+
+    def test_save_keeps_concurrent_increments(self):
+        budget = self.create()
+        self.assertEqual(budget.spent, 300)
+        # Транзакция записана после загрузки бюджета формой
+        Transaction.objects.create(user=self.user, category=self.food, amount=25, date=date(2026, 3, 15))
+        budget.amount = 600
+        budget.save()
+        self.assertEqual(budget.spent, 325)
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent, 325)
+
+    def test_queryset_update_of_window(self):
+        budget = self.create()
+        other = self.create()
+        Budget.objects.filter(pk=budget.pk).update(start_date=date(2026, 3, 21))
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent, 100)
+        Budget.objects.filter(pk=other.pk).update(category=self.cafe)
+        self.assertEqual(Budget.objects.get(pk=other.pk).spent, 30)
+
+        # Остальные поля spent не трогают
+        with self.assertNumQueries(1):
+            Budget.objects.filter(user=self.user).update(amount=700)
+
+        budget.end_date, other.end_date = date(2026, 3, 25), date(2026, 3, 10)
+        Budget.objects.bulk_update([budget, other], ['end_date'])
+        self.assertEqual(
+            dict(Budget.objects.filter(user=self.user).values_list('pk', 'spent')),
+            {budget.pk: 50, other.pk: 10}
+        )
+        self.assertEqual(budgets.verify([self.user.pk]), [])
+
+    def test_window_across_months(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=self.food, amount=7, date=date(2026, 4, day))
+            for day in range(1, 11)
+        ])
+        budget = self.create(start_date=date(2026, 3, 21), end_date=date(2026, 4, 5))
+        self.assertEqual(budget.spent, 135)
+        self.assertEqual(budget.spent, budgets.spent_for(budget))
+
+        Transaction.objects.create(user=self.user, category=self.food, amount=50, date=date(2026, 3, 31))
+        Transaction.objects.filter(user=self.user, date=date(2026, 4, 2)).delete()
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent, 178)
+        self.assertEqual(budgets.verify([self.user.pk]), [])
+
+    def test_verify_ignores_float_sum_error(self):
+        budget = self.create()
+        # На SQLite сумма дневных агрегатов окна считается как 77778.2600000001
+        Transaction.objects.filter(user=self.user, category=self.food).delete()
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=self.food, amount=amount, date=date(2026, 3, day))
+            for day, amount in enumerate([Decimal('77777.77')] + [Decimal('0.07')] * 7, start=1)
+        ])
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent, Decimal('77778.26'))
+        self.assertEqual(budgets.verify([self.user.pk]), [])
+
+
+class SavingsGoalCategoryTests(TestCase):
+    """Категории цели накопления — только доходные категории её владельца."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='goal-categories')
+        cls.salary = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        other = User.objects.create(username='goal-categories-other')
+        cls.foreign = Category.objects.create(user=other, name='Зарплата', type=Category.INCOME)
+        cls.goal = SavingsGoal.objects.create(
+            user=cls.user, name='Отпуск', target_amount=1000, target_date=date(2026, 12, 31)
+        )
+
+    def test_start_date_defaults_to_local_date(self):
+        self.assertEqual(SavingsGoal().start_date, timezone.localdate())
+        self.assertEqual(RecurringTransaction().start_date, timezone.localdate())
+
+    def test_only_own_income_categories(self):
+        self.goal.categories.add(self.salary)
+        # Ошибка откатывает транзакцию, как нарушение ограничения БД
+        for category in (self.food, self.foreign):
+            with self.assertRaises(ValidationError), transaction.atomic():
+                self.goal.categories.add(category)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.food.savings_goals.add(self.goal)
+        self.assertEqual(list(self.goal.categories.all()), [self.salary])
+
+    def test_progress_counts_goal_window(self):
+        goal = SavingsGoal.objects.create(
+            user=self.user, name='Ремонт', target_amount=5000, current_amount=100,
+            start_date=date(2026, 3, 1), target_date=date(2026, 12, 31)
+        )
+        goal.categories.add(self.salary)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=category, amount=amount, date=day)
+            for category, amount, day in (
+                (self.salary, 1000, date(2026, 2, 28)),
+                (self.salary, 200, date(2026, 3, 5)),
+                (self.salary, 300, date(2026, 3, 31)),
+                (self.salary, 400, date(2026, 4, 1)),
+                (self.food, 50, date(2026, 3, 10)),
+            )
+        ])
+        progress = with_progress(SavingsGoal.objects.filter(pk=goal.pk), date(2026, 3, 31)).get()
+        self.assertEqual((progress.saved, progress.recent), (600, 500))
+
+    def test_admin_offers_income_categories(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:home_savingsgoal_change', args=[self.goal.pk]))
+        self.assertEqual(list(response.context['adminform'].form.fields['categories'].queryset), [self.salary])
+
+
+class TrendsTests(TestCase):
+    """Тренды (apps.home.trends) на журнале, посчитанном вручную."""
+    TODAY = date(2026, 7, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='trends')
+        cls.salary = Category.objects.create(user=cls.user, name='Зарплата', type=Category.INCOME)
+        cls.food = Category.objects.create(user=cls.user, name='Продукты', type=Category.EXPENSE)
+        cls.rent = Category.objects.create(user=cls.user, name='Аренда', type=Category.EXPENSE)
+
+    def setUp(self):
+        if not trends.available():
+            self.skipTest('numpy не установлен')
+
+    def ledger(self, rows):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=category, amount=amount, date=day)
+            for category, amount, day in rows
+        ])
+        return trends.load_ledger(self.user)
+
+    def test_rolling_average(self):
+        self.assertEqual(list(trends.rolling_average([1, 2, 3, 4, 5], 3)), [1, 1.5, 2, 3, 4])
+
+        ledger = self.ledger([(self.food, 70, date(2026, 7, day)) for day in range(9, 16)])
+        result = trends.rolling(ledger, self.TODAY, days=7)
+        self.assertEqual(result['expense'], [70.0] * 7)
+        self.assertEqual(result['expense_7'], [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0])
+        self.assertEqual(result['expense_30'][-1], round(490 / 30, 2))
+
+    def test_monthly_totals(self):
+        ledger = self.ledger([
+            (self.salary, 1000, date(2025, 12, 31)),
+            (self.salary, 1000, date(2026, 1, 5)),
+            (self.food, 250, date(2026, 1, 10)),
+            (self.food, 50, date(2026, 1, 31)),
+            (self.salary, 1200, date(2026, 3, 5)),
+            (self.rent, 400, date(2026, 4, 1)),
+        ])
+        income, expense = trends.monthly_totals(ledger, date(2026, 1, 1), 3)
+        self.assertEqual(list(income), [100000, 0, 120000])
+        self.assertEqual(list(expense), [30000, 0, 0])
+
+    def test_month_over_month(self):
+        ledger = self.ledger([
+            (self.salary, 1000, date(2026, 5, 5)),
+            (self.food, 400, date(2026, 5, 20)),
+            (self.salary, 1000, date(2026, 6, 5)),
+            (self.food, 700, date(2026, 6, 20)),
+            (self.food, 150, date(2026, 7, 2)),
+        ])
+        result = trends.month_over_month(ledger, self.TODAY, months=3)
+        self.assertEqual(result['labels'], ['2026-05', '2026-06', '2026-07'])
+        self.assertEqual(result['income'], [1000.0, 1000.0, 0.0])
+        self.assertEqual(result['expense'], [400.0, 700.0, 150.0])
+        self.assertEqual(result['net'], [600.0, 300.0, -150.0])
+        self.assertEqual(result['delta'], [600.0, -300.0, -450.0])
+        # В апреле движений не было: изменение к нулю не определено
+        self.assertEqual(result['change_percent'], [None, -50.0, -150.0])
+
+    def test_forecast_linear_series(self):
+        # С июля 2025 по июнь 2026 доход растёт на 100, расход — на 50 в месяц
+        ledger = self.ledger([
+            row
+            for month in range(12)
+            for row in (
+                (self.salary, 1000 + 100 * month, shift_months(date(2025, 7, 1), month)),
+                (self.food, 500 + 50 * month, shift_months(date(2025, 7, 1), month)),
+            )
+        ])
+        result = trends.forecast(ledger, self.TODAY)
+        self.assertEqual(result['labels'], ['2026-08', '2026-09', '2026-10'])
+        self.assertEqual(result['income'], [2300.0, 2400.0, 2500.0])
+        self.assertEqual(result['expense'], [1150.0, 1200.0, 1250.0])
+        self.assertEqual(result['net'], [1150.0, 1200.0, 1250.0])
+        # Июльский доход ещё не пришёл — берётся тренд; расход достраивается
+        # средним за 90 дней (1 мая и 1 июня) на оставшиеся 16 дней июля
+        self.assertEqual(result['current_month'], {
+            'label': '2026-07', 'income': 2200.0, 'expense': round((1000 + 1050) / 90 * 16, 2),
+        })
+
+    def test_anomalies(self):
+        # С апреля 2025: продукты попеременно 1000 и 1100, в мае 2026 — 5000
+        food = [1000 + 100 * (month % 2) for month in range(15)]
+        food[13] = 5000
+        ledger = self.ledger([
+            row
+            for month, amount in enumerate(food)
+            for row in (
+                (self.food, amount, shift_months(date(2025, 4, 1), month)),
+                (self.rent, 2000, shift_months(date(2025, 4, 1), month)),
+            )
+        ])
+        self.assertEqual(trends.anomalies(ledger, self.TODAY), [{
+            'category_id': self.food.pk, 'category': 'Продукты', 'month': '2026-05',
+            'amount': 5000.0, 'mean': 1050.0, 'z': 79.0,
+        }])
+
+    def test_anomalies_flat_series(self):
+        ledger = self.ledger([(self.rent, 2000, shift_months(date(2025, 4, 1), month)) for month in range(15)])
+        self.assertEqual(trends.anomalies(ledger, self.TODAY), [])
+
+    def test_empty_ledger(self):
+        result = trends.trends(self.user, self.TODAY, months=3)
+        self.assertEqual(result['months']['net'], [0.0] * 3)
+        self.assertEqual(result['months']['change_percent'], [None] * 3)
+        self.assertEqual(result['rolling']['net_30'], [0.0] * 90)
+        self.assertEqual(result['forecast']['income'], [0.0] * 3)
+        self.assertEqual(result['forecast']['current_month']['expense'], 0.0)
+        self.assertEqual(result['anomalies'], [])
+
+
+class CategoryTypeTests(TestCase):
+    """Смена типа категории переписывает Transaction.transaction_type её транзакций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='category-type')
+        cls.categories = [
+            Category.objects.create(user=cls.user, name=f'Категория {number}', type=Category.EXPENSE)
+            for number in range(4)
+        ]
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=category, amount=10, date=date(2026, 3, day))
+            for category in cls.categories for day in range(1, 4)
+        ])
+
+    def types(self):
+        return dict(Transaction.objects.filter(user=self.user).values_list('category_id', 'transaction_type'))
+
+    def test_bulk_update_writes_ledger_once_per_type(self):
+        for number, category in enumerate(self.categories):
+            category.type = Category.INCOME if number % 2 else Category.EXPENSE
+        table = Transaction._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            Category.objects.bulk_update(self.categories, ['type'])
+        writes = [query for query in queries.captured_queries if query['sql'].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(self.types(), {category.pk: category.type for category in self.categories})
+
+    def test_save(self):
+        category, other = self.categories[:2]
+        category.type = Category.INCOME
+        category.save()
+        self.assertEqual(self.types()[category.pk], Category.INCOME)
+        self.assertEqual(self.types()[other.pk], Category.EXPENSE)
+
+    def test_queryset_update(self):
+        changed = [category.pk for category in self.categories[:3]]
+        Category.objects.filter(pk__in=changed).update(type=Category.INCOME)
+        self.assertEqual(self.types(), {
+            category.pk: Category.INCOME if category.pk in changed else Category.EXPENSE
+            for category in self.categories
+        })
+
+    def test_bulk_update(self):
+        category, other = self.categories[:2]
+        category.type = Category.INCOME
+        Category.objects.bulk_update([category, other], ['type'], batch_size=1)
+        self.assertEqual(self.types()[category.pk], Category.INCOME)
+        self.assertEqual(self.types()[other.pk], Category.EXPENSE)
+
+
+class LoadDataTests(TestCase):
+    """Генератор синтетического журнала (apps.home.generators, generate_load_data)."""
+
+    def test_generate_load_data(self):
+        output = io.StringIO()
+        call_command(
+            'generate_load_data', users=2, categories=6, transactions=300, end=date(2026, 6, 30),
+            prefix='load', batch_size=100, stdout=output
+        )
+        self.assertIn('2 пользователей и 600 транзакций', output.getvalue())
+
+        users = User.objects.filter(username__in=['load1', 'load2'])
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Category.objects.filter(user__in=users).count(), 12)
+        for user in users:
+            self.assertEqual(Transaction.objects.filter(user=user).count(), 300)
+        self.assertFalse(Transaction.objects.filter(user__in=users).exclude(transaction_type=F('category__type')))
+        self.assertEqual(rollups.verify([user.pk for user in users]), [])
+
+
+class SqlitePragmaTests(TestCase):
+    """PRAGMA из settings.SQLITE_PRAGMAS применяются к каждому новому соединению SQLite."""
+
+    def test_new_connection_is_tuned(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('PRAGMA только для SQLite')
+        # Тестовая БД в памяти всегда в journal_mode=memory: нужен файл
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+        wrapper.settings_dict = {**wrapper.settings_dict, 'NAME': os.path.join(directory.name, 'tuned.sqlite3')}
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['journal_mode'].lower())
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
@@ -0,0 +1,243 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from apps.home import snapshots
+from apps.home.models import Category
+from apps.home.snapshots import to_day
+from apps.home.utils import shift_months
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy необязателен: без него API трендов отвечает 501, остальное работает
+    np = None
+
+# Аномалия — траты категории за месяц дальше ANOMALY_Z стандартных отклонений
+# от среднего за ANOMALY_HISTORY предыдущих месяцев
+ANOMALY_Z = 2.5
+ANOMALY_HISTORY = 12
+ANOMALY_MIN_MONTHS = 3
+
+ROLLING_WINDOWS = (7, 30)
+
+
+def available():
+    return np is not None
+
+
+@dataclass
+class Ledger:
+    """
+    Журнал пользователя в столбцах: день (от 1970-01-01), сумма в копейках
+    и код категории (индекс в category_ids). Строка — сумма категории за день
+    или отдельная транзакция: все расчёты ниже суммируют, поэтому результат
+    одинаков для обоих видов строк.
+    """
+    days: 'np.ndarray'
+    cents: 'np.ndarray'
+    categories: 'np.ndarray'
+    category_ids: list
+    category_names: list
+    income: 'np.ndarray'
+
+    def daily(self, start, end):
+        """
+        Доходы и расходы по дням с start по end включительно (копейки).
+        :return: (income, expense) — массивы длиной end - start + 1
+        """
+        first, length = to_day(start), (end - start).days + 1
+        offsets = self.days - first
+        inside = (offsets >= 0) & (offsets < length)
+        offsets, cents, income = offsets[inside], self.cents[inside], self.income[self.categories[inside]]
+        return (
+            np.bincount(offsets[income], weights=cents[income], minlength=length),
+            np.bincount(offsets[~income], weights=cents[~income], minlength=length),
+        )
+
+    def months(self):
+        """Индекс месяца (год * 12 + месяц - 1) для каждой строки."""
+        months = self.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return months + 1970 * 12
+
+
+def load_ledger(user):
+    """
+    Журнал пользователя из снимка (apps.home.snapshots) или из дневных агрегатов:
+    строк столько, сколько пар (день, категория), а не транзакций, поэтому
+    миллион транзакций загружается за миллисекунды.
+    """
+    columns = snapshots.load(user.pk)
+    # Категорию могли удалить, а снимок ещё не пересобран (это происходит после фиксации удаления)
+    known = {
+        pk: (name, kind)
+        for pk, name, kind in Category.objects.filter(user=user).values_list('pk', 'name', 'type')
+    }
+    categories = [known.get(pk, ('', Category.EXPENSE)) for pk in columns.category_ids]
+    return Ledger(
+        days=columns.days,
+        cents=columns.cents,
+        categories=columns.categories,
+        category_ids=list(columns.category_ids),
+        category_names=[name for name, _ in categories],
+        income=np.array([kind == Category.INCOME for _, kind in categories], dtype=bool),
+    )
+
+
+def rolling_average(values, window):
+    """Скользящее среднее по window последним значениям (в начале ряда — по имеющимся)."""
+    totals = np.cumsum(values, dtype=np.float64)
+    totals[window:] = totals[window:] - totals[:-window]
+    sizes = np.minimum(np.arange(1, len(values) + 1), window)
+    return totals / sizes
+
+
+def monthly_totals(ledger, first_month, months):
+    """
+    Доходы и расходы по месяцам, начиная с first_month (копейки).
+    :return: (income, expense) — массивы длиной months
+    """
+    offsets = ledger.months() - (first_month.year * 12 + first_month.month - 1)
+    inside = (offsets >= 0) & (offsets < months)
+    offsets, cents, income = offsets[inside], ledger.cents[inside], ledger.income[ledger.categories[inside]]
+    return (
+        np.bincount(offsets[income], weights=cents[income], minlength=months),
+        np.bincount(offsets[~income], weights=cents[~income], minlength=months),
+    )
+
+
+def month_over_month(ledger, today, months=12):
+    """Итоги последних months месяцев (включая текущий) и изменение к предыдущему месяцу."""
+    first = shift_months(today.replace(day=1), -months)
+    income, expense = monthly_totals(ledger, first, months + 1)
+    net = income - expense
+    previous = np.abs(net[:-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(previous > 0, (net[1:] - net[:-1]) / previous * 100, np.nan)
+    return {
+        'labels': [f'{shift_months(first, offset):%Y-%m}' for offset in range(1, months + 1)],
+        'income': _money(income[1:]),
+        'expense': _money(expense[1:]),
+        'net': _money(net[1:]),
+        'delta': _money(net[1:] - net[:-1]),
+        'change_percent': [None if np.isnan(value) else round(float(value), 1) for value in change],
+    }
+
+
+def rolling(ledger, today, days=90):
+    """Чистый поток и расходы по дням за days дней со скользящими средними ROLLING_WINDOWS."""
+    start = today - timedelta(days=days - 1)
+    # Окна в начале периода заполняются днями до него
+    history_start = start - timedelta(days=max(ROLLING_WINDOWS) - 1)
+    income, expense = ledger.daily(history_start, today)
+    net = income - expense
+    skip = len(net) - days
+    result = {
+        'labels': [(start + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'net': _money(net[skip:]),
+        'expense': _money(expense[skip:]),
+    }
+    for window in ROLLING_WINDOWS:
+        result[f'net_{window}'] = _money(rolling_average(net, window)[skip:])
+        result[f'expense_{window}'] = _money(rolling_average(expense, window)[skip:])
+    return result
+
+
+def forecast(ledger, today, months=3, history=12):
+    """
+    Прогноз доходов, расходов и чистого потока на months месяцев вперёд:
+    линейный тренд по history завершённым месяцам. Текущий месяц
+    достраивается по среднему расходу в день за последние 90 дней.
+    """
+    current = today.replace(day=1)
+    first = shift_months(current, -history)
+    income, expense = monthly_totals(ledger, first, history + 1)
+    x = np.arange(history)
+
+    def trend(values):
+        if np.count_nonzero(values) < 2:
+            return lambda points: np.full(len(points), values.mean())
+        slope, intercept = np.polyfit(x, values, 1)
+        return lambda points: np.maximum(slope * points + intercept, 0)
+
+    income_trend, expense_trend = trend(income[:-1]), trend(expense[:-1])
+    ahead = np.arange(history + 1, history + 1 + months)
+
+    days_in_month = (shift_months(current, 1) - current).days
+    _, recent_expense = ledger.daily(today - timedelta(days=89), today)
+    month_end_expense = expense[-1] + recent_expense.mean() * (days_in_month - today.day)
+
+    predicted_income, predicted_expense = income_trend(ahead), expense_trend(ahead)
+    return {
+        'current_month': {
+            'label': f'{current:%Y-%m}',
+            # Доход обычно приходит разово: до его поступления берётся тренд
+            'income': _money([max(income[-1], income_trend(np.array([history]))[0])])[0],
+            'expense': _money([month_end_expense])[0],
+        },
+        'labels': [f'{shift_months(current, offset):%Y-%m}' for offset in range(1, months + 1)],
+        'income': _money(predicted_income),
+        'expense': _money(predicted_expense),
+        'net': _money(predicted_income - predicted_expense),
+    }
+
+
+def anomalies(ledger, today, months=3):
+    """
+    Траты категорий за последние months завершённых месяцев, необычные
+    относительно ANOMALY_HISTORY предыдущих месяцев той же категории (z-оценка).
+    Текущий месяц не проверяется: неполный месяц всегда выглядит экономным.
+    Считается матрицей категории × месяцы, без цикла по категориям.
+    """
+    span = ANOMALY_HISTORY + months
+    first = shift_months(today.replace(day=1), -span)
+    offsets = ledger.months() - (first.year * 12 + first.month - 1)
+    expense = ~ledger.income[ledger.categories]
+    inside = (offsets >= 0) & (offsets < span) & expense
+
+    matrix = np.zeros((len(ledger.category_ids), span), dtype=np.float64)
+    np.add.at(matrix, (ledger.categories[inside], offsets[inside]), ledger.cents[inside])
+
+    # Скользящие среднее и отклонение по ANOMALY_HISTORY месяцам перед каждым проверяемым
+    windows = np.lib.stride_tricks.sliding_window_view(matrix[:, :-1], ANOMALY_HISTORY, axis=1)[:, -months:]
+    checked = matrix[:, -months:]
+    mean = windows.mean(axis=2)
+    std = windows.std(axis=2)
+    active = np.count_nonzero(windows, axis=2) >= ANOMALY_MIN_MONTHS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(std > 0, (checked - mean) / std, 0)
+    found = np.argwhere(active & (np.abs(score) >= ANOMALY_Z))
+
+    result = []
+    for code, offset in found:
+        month = shift_months(first, ANOMALY_HISTORY + int(offset))
+        result.append({
+            'category_id': ledger.category_ids[code],
+            'category': ledger.category_names[code],
+            'month': f'{month:%Y-%m}',
+            'amount': round(float(checked[code, offset]) / 100, 2),
+            'mean': round(float(mean[code, offset]) / 100, 2),
+            'z': round(float(score[code, offset]), 2),
+        })
+    result.sort(key=lambda row: (row['month'], -abs(row['z'])), reverse=True)
+    return result
+
+
+def trends(user, today, months=12):
+    """Все расчёты для API и дашборда по одной загрузке журнала."""
+    ledger = load_ledger(user)
+    return {
+        'date': today.isoformat(),
+        'rolling': rolling(ledger, today),
+        'months': month_over_month(ledger, today, months),
+        'forecast': forecast(ledger, today),
+        'anomalies': anomalies(ledger, today),
+    }
+
+
+def _money(values):
+    """Копейки → рубли для JSON."""
+    return [round(float(value) / 100, 2) for value in values]
@@ -11,6 +11,41 @@ urlpatterns = [
     # The home page
     path('', views.index, name='home'),
 
+    # Импорт банковской выписки
+    path('transactions/import/', views.import_transactions, name='import_transactions'),
+
+    # Выгрузка журнала: /transactions/export/csv/, /transactions/export/jsonl/ (POST — фоновой задачей)
+    path('transactions/export/<str:export_format>/', views.export_transactions, name='export_transactions'),
+
+    # Поиск по описаниям и категориям (JSON): /transactions/search/?q=такси&page=2
+    path('transactions/search/', views.search_transactions, name='search_transactions'),
+
+    # Данные графиков дашборда (JSON, ETag/Last-Modified): /api/charts/balance/?months=6
+    path('api/charts/<str:chart>/', views.chart_data, name='chart_data'),
+
+    # Доходы, расходы и баланс по дням, неделям, месяцам, кварталам или годам (JSON)
+    path('api/analytics/', views.analytics, name='analytics'),
+
+    # Исполнение активных бюджетов (JSON)
+    path('api/budgets/', views.budgets, name='budgets'),
+
+    # Прогресс и прогноз целей накопления (JSON)
+    path('api/goals/', views.goals, name='goals'),
+
+    # Скользящие средние, изменения по месяцам, прогноз и аномалии трат (JSON)
+    path('api/trends/', views.trends_data, name='trends'),
+
+    # Выписки за месяц: список и готовые файлы /statements/2026-09.pdf (html, csv, pdf)
+    path('statements/', views.statement_list, name='statements'),
+    path('statements/<str:month>.<str:statement_format>', views.statement_file, name='statement_file'),
+
+    # Статус фоновой задачи (JSON) и подготовленный ею файл
+    path('api/jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('api/jobs/<int:pk>/file/', views.job_file, name='job_file'),
+
+    # Все панели дашборда одним ответом (async view, запросы выполняются параллельно)
+    path('api/dashboard/', views.dashboard, name='dashboard'),
+
     # Matches any html file
     re_path(r'^.*\.*', views.pages, name='pages'),
 
@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+
+MONTH_TRANSLATIONS = {
+    'Jan': 'Янв',
+    'Feb': 'Фев',
+    'Mar': 'Мар',
+    'Apr': 'Апр',
+    'May': 'Май',
+    'Jun': 'Июн',
+    'Jul': 'Июл',
+    'Aug': 'Авг',
+    'Sep': 'Сен',
+    'Oct': 'Окт',
+    'Nov': 'Ноя',
+    'Dec': 'Дек'
+}
+
+
+def month_start(value):
+    """Первый день месяца, в который попадает дата."""
+    return value.replace(day=1)
+
+
+def shift_months(value, months):
+    """Сдвигает первый день месяца на указанное число месяцев (можно отрицательное)."""
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_label(value):
+    """Короткое русское название месяца для подписей графиков."""
+    return MONTH_TRANSLATIONS[value.strftime('%b')]
+
+
+@contextmanager
+def file_lock(directory):
+    """Блокировка каталога между процессами (flock на файле .lock, каталог создаётся)."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -2,125 +2,339 @@
 """
 Copyright (c) 2019 - present AppSeed.us
 """
-from datetime import timedelta
+import hashlib
+import os
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
 
+from asgiref.sync import sync_to_async
 from django import template
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from django.db.models.functions import TruncMonth
-from django.http import HttpResponse, HttpResponseRedirect
+from django.contrib.auth.views import redirect_to_login
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404
 from django.template import loader
 from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from apps.home.models import Transaction
+from apps.home.analytics import AnalyticsError, default_start, ledger_series
+from apps.home.budgets import budget_statuses
+from apps.home import jobs, statements, trends
+from apps.home.cache import get_dashboard, get_goals, get_trends, ledger_version
+from apps.home.dashboard import CHARTS
+from apps.home.exports import EXPORT_FORMATS, export_rows
+from apps.home.forms import AnalyticsForm, StatementImportForm, TransactionExportForm, TransactionSearchForm
+from apps.home.models import Job
+from apps.home.search import TransactionSearch
+from apps.home.summary import dashboard_summary
+from apps.instrumentation import query_budget
+from apps.routers import read_alias, reads_from, use_replica
 
 
+@query_budget(2)  # сессия и пользователь: графики загружаются отдельно через API
 @login_required(login_url="/login/")
 def index(request):
-    # Получаем данные за последние 6 месяцев
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=180)  # 6 месяцев назад
-
-    # Агрегируем доходы по месяцам
-    monthly_income = Transaction.objects.filter(
-        user=request.user,
-        category__type='income',  # Фильтруем только доходы
-        date__gte=start_date,
-        date__lte=end_date
-    ).annotate(
-        month=TruncMonth('date')  # Группируем по месяцам
-    ).values('month').annotate(
-        total_income=Sum('amount')  # Суммируем доходы
-    ).order_by('month')
-
-    # Агрегируем расходы по месяцам
-    monthly_expense = Transaction.objects.filter(
-        user=request.user,
-        category__type='expense',  # Фильтруем только расходы
-        date__gte=start_date,
-        date__lte=end_date
-    ).annotate(
-        month=TruncMonth('date')  # Группируем по месяцам
-    ).values('month').annotate(
-        total_expense=Sum('amount')  # Суммируем расходы
-    ).order_by('month')
-
-    # Подготавливаем данные для графиков
-    labels = [entry['month'].strftime('%b') for entry in monthly_income]  # Месяцы
-    income_data = [float(entry['total_income'] or 0) for entry in monthly_income]  # Доходы
-    expense_data = [float(entry['total_expense'] or 0) for entry in monthly_expense]  # Расходы
-
-    start_date = timezone.now().replace(day=1).date()  # Первый день текущего месяца
-    end_date = timezone.now().date()  # Сегодняшняя дата
-
-    # Агрегируем расходы по категориям за текущий месяц
-    category_expenses = Transaction.objects.filter(
-        user=request.user,
-        category__type='expense',  # Фильтруем только расходы
-        date__gte=start_date,
-        date__lte=end_date
-    ).values('category__name').annotate(
-        total_expense=Sum('amount')  # Суммируем расходы по категориям
-    ).order_by('-total_expense')  # Сортируем по убыванию
-
-    # Подготавливаем данные для графика
-    labels_category = [entry['category__name'] for entry in category_expenses]  # Названия категорий
-    data = [float(entry['total_expense'] or 0) for entry in category_expenses]  # Суммы расходов
-    # Данные для баланса (доходы - расходы)
-    monthly_balance = Transaction.get_monthly_balance(request.user, months=6)
-
-    # Подготавливаем данные для графиков
-    context = {
-        'main_chart': {
-            'labels': monthly_balance['labels'],
-            'datasets': [{
-                'label': 'Баланс (доходы - расходы)',
-                'data': monthly_balance['data'],
-                'borderColor': '#d346b1',
-                'pointBackgroundColor': '#d346b1',
-                'borderWidth': 2,
-                'fill': True
-            }]
-        },
-        'income_chart': {
-            'labels': labels,
-            'datasets': [{
-                'label': 'Доходы',
-                'data': income_data,
-                'borderColor': '#00d6b4',  # Зеленый для доходов
-                'pointBackgroundColor': '#00d6b4',
-                'borderWidth': 2,
-                'fill': True
-            }]
-        },
-        'expense_chart': {
-            'labels': labels,
-            'datasets': [{
-                'label': 'Расходы',
-                'data': expense_data,
-                'borderColor': '#f44336',  # Красный для расходов
-                'pointBackgroundColor': '#f44336',
-                'borderWidth': 2,
-                'fill': True
-            }]
-        },
-        'category_chart': {
-            'labels': labels_category,
-            'datasets': [{
-                'label': 'Расходы по категориям',
-                'data': data,
-                'backgroundColor': '#1f8ef1',  # Синий цвет
-                'borderColor': '#1f8ef1',
-                'borderWidth': 2,
-            }]
-        },
-    }
-
+    # Данные графиков страница запрашивает у chart_data
     html_template = loader.get_template('home/index.html')
+    return HttpResponse(html_template.render({}, request))
+
+
+def _chart_months(request):
+    # ?months=1..24, по умолчанию 6; None — некорректное значение
+    try:
+        months = int(request.GET.get('months', 6))
+    except ValueError:
+        return None
+    return months if 1 <= months <= 24 else None
+
+
+def _chart_etag(request, chart):
+    # Версия журнала читается из кэша: для ответа 304 агрегаты не нужны.
+    # Месяц входит в ETag, потому что окно графиков сдвигается вместе с ним
+    months = _chart_months(request)
+    if chart not in CHARTS or months is None:
+        return None
+    today = timezone.now().date()
+    return f'{chart}-{months}-{today:%Y%m}-{ledger_version(request.user.pk)}'
+
+
+def _ledger_last_modified(request, since):
+    # Версия журнала — время последнего изменения в наносекундах. Ответ
+    # меняется и со сдвигом окна (месяц графиков, день бюджетов и целей),
+    # поэтому Last-Modified не раньше его начала: иначе клиент с одним
+    # If-Modified-Since получит 304 со вчерашними данными
+    changed = datetime.fromtimestamp(ledger_version(request.user.pk) / 1e9, tz=dt_timezone.utc)
+    return max(changed, datetime(since.year, since.month, since.day, tzinfo=dt_timezone.utc))
+
+
+def _chart_last_modified(request, chart):
+    return _ledger_last_modified(request, timezone.now().date().replace(day=1))
+
+
+@query_budget(3)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_data(request, chart):
+    # /api/charts/balance/, income/, expense/, category/ с ?months=N
+    if chart not in CHARTS:
+        raise Http404
+    months = _chart_months(request)
+    if months is None:
+        return HttpResponseBadRequest('months: от 1 до 24')
+    dashboard = get_dashboard(request.user, months=months)
+    return JsonResponse(dashboard.as_charts()[CHARTS[chart]])
+
+
+def _daily_etag(request):
+    # Бюджеты и цели считаются на сегодня: ETag меняется с датой и версией журнала
+    name = request.resolver_match.url_name
+    return f'{name}-{timezone.now().date():%Y%m%d}-{ledger_version(request.user.pk)}'
+
+
+def _daily_last_modified(request):
+    return _ledger_last_modified(request, timezone.now().date())
+
+
+@query_budget(3)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_daily_etag, last_modified_func=_daily_last_modified)
+@use_replica
+def budgets(request):
+    # /api/budgets/ — активные бюджеты: потрачено, остаток, темп и прогноз
+    today = timezone.now().date()
+    return JsonResponse({
+        'date': today.isoformat(),
+        'budgets': [status.as_json() for status in budget_statuses(request.user, today)],
+    })
+
+
+@query_budget(3)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_daily_etag, last_modified_func=_daily_last_modified)
+def goals(request):
+    # /api/goals/ — цели накопления: прогресс, скорость и прогноз даты достижения
+    return JsonResponse({'date': timezone.now().date().isoformat(), 'goals': get_goals(request.user)})
+
+
+@query_budget(4)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_daily_etag, last_modified_func=_daily_last_modified)
+def trends_data(request):
+    # /api/trends/ — скользящие средние, изменения по месяцам, прогноз и аномалии
+    if not trends.available():
+        return JsonResponse({'errors': {'__all__': ['Для трендов нужен пакет numpy']}}, status=501)
+    return JsonResponse(get_trends(request.user))
+
+
+def _authenticated_user(request):
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def dashboard(request):
+    # Все панели дашборда (JSON) с параллельными запросами к БД, см. apps.home.summary.
+    # login_required в Django 4.2 не поддерживает async view — проверяем вход сами
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path(), '/login/')
+    months = _chart_months(request)
+    if months is None:
+        return HttpResponseBadRequest('months: от 1 до 24')
+    # Контекст чтения переходит в потоки пула вместе с contextvars
+    with reads_from(await sync_to_async(read_alias)(user.pk)):
+        return JsonResponse(await dashboard_summary(user, months=months))
+
+
+def _analytics_etag(request):
+    # Параметры запроса, день (период по умолчанию заканчивается сегодня) и версия журнала
+    digest = hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest()
+    return f'analytics-{digest}-{timezone.now().date():%Y%m%d}-{ledger_version(request.user.pk)}'
+
+
+@query_budget(3)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_analytics_etag, last_modified_func=_daily_last_modified)
+@use_replica
+def analytics(request):
+    # /api/analytics/?granularity=week&date_from=2026-01-01&date_to=2026-06-30
+    form = AnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    granularity = form.cleaned_data['granularity'] or 'month'
+    date_to = form.cleaned_data['date_to'] or timezone.now().date()
+    date_from = form.cleaned_data['date_from'] or default_start(date_to, granularity)
+    try:
+        series = ledger_series(request.user, date_from, date_to, granularity)
+    except AnalyticsError as error:
+        return JsonResponse({'errors': {'__all__': [str(error)]}}, status=400)
+    return JsonResponse(series.as_json())
+
+
+@login_required(login_url="/login/")
+def import_transactions(request):
+    form = StatementImportForm(request.POST or None, request.FILES or None)
+
+    if request.method == "POST" and form.is_valid():
+        # Выписка импортируется фоновой задачей: файл сохраняется для воркера,
+        # страница сразу показывает ход импорта (/api/jobs/<id>/)
+        statement_format = form.cleaned_data['statement_format']
+        path = jobs.job_path('uploads', f'{uuid.uuid4().hex}.{statement_format}')
+        with open(path, 'wb') as destination:
+            for chunk in form.cleaned_data['file'].chunks():
+                destination.write(chunk)
+        job = jobs.enqueue(
+            'import_statement',
+            user=request.user,
+            path=path,
+            format=statement_format,
+            default_category=form.cleaned_data['default_category'],
+        )
+        return HttpResponseRedirect(f"{reverse('import_transactions')}?job={job.pk}")
+
+    job = None
+    if request.GET.get('job', '').isdigit():
+        job = Job.objects.filter(pk=request.GET['job'], user=request.user).first()
+    context = {'form': form, 'job': job, 'segment': 'import'}
+    html_template = loader.get_template('home/import.html')
     return HttpResponse(html_template.render(context, request))
 
 
+@login_required(login_url="/login/")
+def export_transactions(request, export_format):
+    # Параметры: ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&category=<id>&category=<id>
+    # GET отдаёт файл потоком, POST ставит выгрузку в фоновую задачу (202 и адрес статуса)
+    data = request.POST if request.method == 'POST' else request.GET
+    form = TransactionExportForm(data, user=request.user)
+    if export_format not in EXPORT_FORMATS or not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    if request.method == 'POST':
+        job = jobs.enqueue(
+            'export',
+            user=request.user,
+            format=export_format,
+            date_from=form.cleaned_data['date_from'] and form.cleaned_data['date_from'].isoformat(),
+            date_to=form.cleaned_data['date_to'] and form.cleaned_data['date_to'].isoformat(),
+            category_ids=form.cleaned_data['category'],
+        )
+        response = JsonResponse(jobs.as_json(job), status=202)
+        response['Location'] = reverse('job_status', args=[job.pk])
+        return response
+
+    serializer, content_type = EXPORT_FORMATS[export_format]
+    rows = export_rows(
+        request.user,
+        date_from=form.cleaned_data['date_from'],
+        date_to=form.cleaned_data['date_to'],
+        category_ids=form.cleaned_data['category'],
+    )
+    response = StreamingHttpResponse(serializer(rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+@query_budget(3)
+@login_required(login_url="/login/")
+@cache_control(private=True, no_cache=True)
+def job_status(request, pk):
+    # /api/jobs/<id>/ — статус, прогресс и результат фоновой задачи пользователя
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return JsonResponse(jobs.as_json(job))
+
+
+@login_required(login_url="/login/")
+def job_file(request, pk):
+    # Файл, который подготовила завершённая задача (например, выгрузка)
+    job = get_object_or_404(Job, pk=pk, user=request.user, status=Job.DONE)
+    if not job.result or 'file' not in job.result:
+        raise Http404
+    path = os.path.join(settings.JOB_FILES_DIR, job.result['file'])
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=job.result['filename'],
+        content_type=job.result['content_type']
+    )
+
+
+@query_budget(2)  # сессия и пользователь: список выписок читается из каталога
+@login_required(login_url="/login/")
+def statement_list(request):
+    context = {'statements': statements.available(request.user.pk), 'segment': 'statements'}
+    html_template = loader.get_template('home/statements.html')
+    return HttpResponse(html_template.render(context, request))
+
+
+@query_budget(2)
+@login_required(login_url="/login/")
+def statement_file(request, month, statement_format):
+    # Выписка за месяц — готовый файл (manage.py generate_statements), без агрегации в запросе
+    try:
+        month = date.fromisoformat(f'{month}-01')
+    except ValueError:
+        raise Http404
+    if statement_format not in statements.FORMATS:
+        raise Http404
+    path = statements.statement_path(request.user.pk, month, statement_format)
+    try:
+        statement = open(path, 'rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(
+        statement,
+        as_attachment=statement_format != 'html',
+        filename=f'statement-{month:%Y-%m}.{statement_format}',
+        content_type=statements.FORMATS[statement_format]
+    )
+
+
+@login_required(login_url="/login/")
+@use_replica
+def search_transactions(request):
+    # Параметры: ?q=<слова>&page=<номер>&per_page=<до 100>
+    form = TransactionSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    page = form.cleaned_data['page'] or 1
+    per_page = form.cleaned_data['per_page'] or 20
+    total, rows = TransactionSearch(request.user, form.cleaned_data['q']).ranked(
+        offset=(page - 1) * per_page, limit=per_page
+    )
+    return JsonResponse({
+        'query': form.cleaned_data['q'],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'results': [
+            {
+                'id': row.pk,
+                'date': row.date.isoformat(),
+                'amount': str(row.amount),
+                'type': row.transaction_type,
+                'category': row.category.name,
+                'description': row.description or '',
+                'rank': round(row.search_rank, 4),
+            }
+            for row in rows
+        ],
+    })
+
+
 @login_required(login_url="/login/")
 def pages(request):
     context = {}
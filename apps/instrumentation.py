@@ -0,0 +1,188 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import base as template_base
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('instrumentation_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """
+    Объявляет максимальное число SQL-запросов на один запрос к view.
+    Значение из settings.QUERY_BUDGETS (по имени URL) имеет приоритет.
+    """
+    def decorator(view):
+        # Без обёртки: асинхронный view должен остаться корутиной
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsRegistry:
+    """Накопленные метрики процесса в разрезе view (для Prometheus)."""
+    COUNTERS = (
+        ('requests_total', 'Количество запросов'),
+        ('db_queries_total', 'Количество SQL-запросов'),
+        ('db_seconds_total', 'Время в БД, секунды'),
+        ('template_seconds_total', 'Время рендеринга шаблонов, секунды'),
+        ('request_seconds_total', 'Полное время обработки, секунды'),
+        ('response_bytes_total', 'Размер ответов, байты'),
+        ('query_budget_exceeded_total', 'Превышения бюджета SQL-запросов'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, values):
+        with self._lock:
+            counters = self._views.setdefault(view_name, dict.fromkeys((name for name, _ in self.COUNTERS), 0))
+            for name, value in values.items():
+                counters[name] += value
+
+    def render(self):
+        from apps.home.cache import dashboard_stats
+
+        lines = []
+        with self._lock:
+            views = {view: dict(counters) for view, counters in self._views.items()}
+        for name, description in self.COUNTERS:
+            lines.append(f'# HELP fintracker_{name} {description}')
+            lines.append(f'# TYPE fintracker_{name} counter')
+            for view, counters in sorted(views.items()):
+                lines.append(f'fintracker_{name}{{view="{view}"}} {counters[name]}')
+        for name, value in dashboard_stats().items():
+            lines.append(f'# TYPE fintracker_dashboard_cache_{name}_total counter')
+            lines.append(f'fintracker_dashboard_cache_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _instrument_templates():
+    """Оборачивает Template.render один раз: считается только внешний рендеринг."""
+    if getattr(template_base.Template.render, 'instrumented', False):
+        return
+    original = template_base.Template.render
+
+    @wraps(original)
+    def render(self, context):
+        stats = _current.get()
+        if stats is None:
+            return original(self, context)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+    render.instrumented = True
+    template_base.Template.render = render
+
+
+class InstrumentationMiddleware:
+    """
+    Считает SQL-запросы, время БД, рендеринга шаблонов и размер ответа.
+    Отдаёт их в заголовке Server-Timing и копит для /metrics.
+    Превышение бюджета запросов пишется в лог, а при
+    QUERY_BUDGETS_STRICT — приводит к QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        size = 0 if response.streaming else len(response.content)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        budget = self._budget(match)
+        exceeded = budget is not None and stats.queries > budget
+
+        registry.record(view_name, {
+            'requests_total': 1,
+            'db_queries_total': stats.queries,
+            'db_seconds_total': stats.db_time,
+            'template_seconds_total': stats.template_time,
+            'request_seconds_total': duration,
+            'response_bytes_total': size,
+            'query_budget_exceeded_total': int(exceeded),
+        })
+
+        if exceeded:
+            message = f'{view_name}: {stats.queries} SQL-запросов при бюджете {budget}'
+            if settings.QUERY_BUDGETS_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    @staticmethod
+    def _budget(match):
+        if match is None:
+            return None
+        budgets = settings.QUERY_BUDGETS
+        if match.view_name in budgets:
+            return budgets[match.view_name]
+        return getattr(match.func, 'query_budget', None)
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus (для INTERNAL_IPS и персонала)."""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,101 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2019 - present AppSeed.us
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Алиас, из которого читает текущий контекст; None — основная БД
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _sticky_key(user_id):
+    return f'db:sticky:{user_id}'
+
+
+def mark_written(user_ids):
+    """
+    Read-your-writes: DB_REPLICA_STICKY секунд после записи пользователь
+    читает из основной БД, пока реплика догоняет.
+    """
+    if settings.DB_REPLICA_NAME:
+        cache.set_many({_sticky_key(user_id): True for user_id in user_ids}, settings.DB_REPLICA_STICKY)
+
+
+def _replica_available(alias):
+    if cache.get('db:replica:down'):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        # Реплика недоступна: не пробуем её снова DB_REPLICA_RETRY секунд
+        logger.warning('Реплика %s недоступна, чтение идёт из основной БД', alias, exc_info=True)
+        cache.set('db:replica:down', True, settings.DB_REPLICA_RETRY)
+        return False
+    return True
+
+
+def read_alias(user_id=None):
+    """
+    Откуда читать аналитику пользователя: реплика, если она настроена,
+    доступна и пользователь ничего не записывал в последние DB_REPLICA_STICKY
+    секунд, иначе — основная БД.
+    """
+    alias = settings.DB_REPLICA_NAME
+    if not alias:
+        return DEFAULT_DB_ALIAS
+    if user_id is not None and cache.get(_sticky_key(user_id)):
+        return DEFAULT_DB_ALIAS
+    return alias if _replica_available(alias) else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reads_from(alias):
+    """Все чтения ORM внутри блока идут в alias (в том числе в потоках sync_to_async)."""
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """Чтения внутри блока идут в реплику, см. read_alias()."""
+    with reads_from(read_alias(user_id)) as alias:
+        yield alias
+
+
+def use_replica(view):
+    """Декоратор синхронного view: чтения для request.user идут в реплику."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request.user.pk):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Чтения внутри replica_reads() / reads_from() — в выбранный алиас,
+    все остальные чтения и любые записи — в основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Не None: иначе Django читал бы связанные объекты из БД, откуда загружен экземпляр
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же строки, что и основная БД
+        return True
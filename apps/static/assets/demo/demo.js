@@ -349,174 +349,480 @@ demo = {
       }
     };
 
-    var ctx = document.getElementById("chartLinePurple").getContext("2d");
-    var incomeChartData = JSON.parse(document.getElementById('income-chart-data').textContent);
+    // Данные графиков приходят из /api/charts/<имя>/ (адрес в data-url у canvas).
+    // Ответы с ETag: при повторной загрузке браузер получает 304 без пересчёта на сервере
+    var dashboardCharts = {};
 
-    var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+    function loadChartData(canvasId, render) {
+      var canvas = document.getElementById(canvasId);
+      return fetch(canvas.dataset.url, {
+          credentials: 'same-origin',
+          headers: {'Accept': 'application/json'}
+        })
+        .then(function(response) {
+          if (!response.ok) {
+            throw new Error(canvasId + ': ' + response.status);
+          }
+          return response.json();
+        })
+        .then(function(chartData) {
+          var chart = dashboardCharts[canvasId];
+          if (chart) {
+            chart.data.labels = chartData.labels;
+            chart.data.datasets[0].data = chartData.datasets[0].data;
+            chart.update();
+          } else {
+            dashboardCharts[canvasId] = render(canvas.getContext('2d'), chartData);
+          }
+        });
+    }
 
-    gradientStroke.addColorStop(1, 'rgba(72,72,176,0.2)');
-    gradientStroke.addColorStop(0.2, 'rgba(72,72,176,0.0)');
-    gradientStroke.addColorStop(0, 'rgba(119,52,169,0)'); //purple colors
+    function renderIncomeChart(ctx, incomeChartData) {
+      var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
 
-    var data = {
-        labels: incomeChartData.labels, // Месяцы из Django
-        datasets: [{
-            label: incomeChartData.datasets[0].label, // Название графика из Django
+      gradientStroke.addColorStop(1, 'rgba(72,72,176,0.2)');
+      gradientStroke.addColorStop(0.2, 'rgba(72,72,176,0.0)');
+      gradientStroke.addColorStop(0, 'rgba(119,52,169,0)'); //purple colors
+
+      var data = {
+          labels: incomeChartData.labels, // Месяцы из Django
+          datasets: [{
+              label: incomeChartData.datasets[0].label, // Название графика из Django
+              fill: true,
+              backgroundColor: gradientStroke,
+              borderColor: '#d048b6', // Цвет линии
+              borderWidth: 2,
+              borderDash: [],
+              borderDashOffset: 0.0,
+              pointBackgroundColor: '#d048b6', // Цвет точек
+              pointBorderColor: 'rgba(255,255,255,0)',
+              pointHoverBackgroundColor: '#d048b6',
+              pointBorderWidth: 20,
+              pointHoverRadius: 4,
+              pointHoverBorderWidth: 15,
+              pointRadius: 4,
+              data: incomeChartData.datasets[0].data, // Данные по доходам из Django
+          }]
+      };
+
+      return new Chart(ctx, {
+        type: 'line',
+        data: data,
+        options: gradientChartOptionsConfigurationWithTooltipPurple
+      });
+    }
+
+    function renderExpenseChart(ctx, expenseChartData) {
+      var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+
+      gradientStroke.addColorStop(1, 'rgba(66,134,121,0.15)');
+      gradientStroke.addColorStop(0.4, 'rgba(66,134,121,0.0)'); //green colors
+      gradientStroke.addColorStop(0, 'rgba(66,134,121,0)'); //green colors
+
+      var data = {
+          labels: expenseChartData.labels, // Месяцы из Django
+          datasets: [{
+              label: expenseChartData.datasets[0].label, // Название графика из Django
+              fill: true,
+              backgroundColor: gradientStroke,
+              borderColor: '#00d6b4', // Цвет линии
+              borderWidth: 2,
+              borderDash: [],
+              borderDashOffset: 0.0,
+              pointBackgroundColor: '#00d6b4', // Цвет точек
+              pointBorderColor: 'rgba(255,255,255,0)',
+              pointHoverBackgroundColor: '#00d6b4',
+              pointBorderWidth: 20,
+              pointHoverRadius: 4,
+              pointHoverBorderWidth: 15,
+              pointRadius: 4,
+              data: expenseChartData.datasets[0].data, // Данные по расходам из Django
+          }]
+      };
+
+      return new Chart(ctx, {
+        type: 'line',
+        data: data,
+        options: gradientChartOptionsConfigurationWithTooltipGreen
+      });
+    }
+
+    function renderBalanceChart(ctx, mainChartData) {
+      var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+
+      gradientStroke.addColorStop(1, 'rgba(72,72,176,0.1)');
+      gradientStroke.addColorStop(0.4, 'rgba(72,72,176,0.0)');
+      gradientStroke.addColorStop(0, 'rgba(119,52,169,0)'); //purple colors
+
+      return new Chart(ctx, {
+        type: 'line',
+        data: {
+          labels: mainChartData.labels,
+          datasets: [{
+            label: "Доходы - расходы",
             fill: true,
             backgroundColor: gradientStroke,
-            borderColor: '#d048b6', // Цвет линии
+            borderColor: '#d346b1',
             borderWidth: 2,
             borderDash: [],
             borderDashOffset: 0.0,
-            pointBackgroundColor: '#d048b6', // Цвет точек
+            pointBackgroundColor: '#d346b1',
             pointBorderColor: 'rgba(255,255,255,0)',
-            pointHoverBackgroundColor: '#d048b6',
+            pointHoverBackgroundColor: '#d346b1',
             pointBorderWidth: 20,
             pointHoverRadius: 4,
             pointHoverBorderWidth: 15,
             pointRadius: 4,
-            data: incomeChartData.datasets[0].data, // Данные по доходам из Django
-        }]
+            data: mainChartData.datasets[0].data,
+          }]
+        },
+        options: gradientChartOptionsConfigurationWithTooltipPurple
+      });
+    }
+
+    function renderCategoryChart(ctx, categoryChartData) {
+      var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+
+      gradientStroke.addColorStop(1, 'rgba(29,140,248,0.2)');
+      gradientStroke.addColorStop(0.4, 'rgba(29,140,248,0.0)');
+      gradientStroke.addColorStop(0, 'rgba(29,140,248,0)'); //blue colors
+
+      var data = {
+          labels: categoryChartData.labels, // Названия категорий
+          datasets: [{
+              label: categoryChartData.datasets[0].label, // Название графика
+              fill: true,
+              backgroundColor: gradientStroke,
+              hoverBackgroundColor: gradientStroke,
+              borderColor: '#1f8ef1', // Цвет линии
+              borderWidth: 2,
+              borderDash: [],
+              borderDashOffset: 0.0,
+              data: categoryChartData.datasets[0].data, // Данные по расходам
+          }]
+      };
+
+      return new Chart(ctx, {
+        type: 'bar',
+        responsive: true,
+        legend: {
+          display: false
+        },
+        data: data,
+        options: gradientBarChartConfiguration
+      });
+    }
+
+    var renderers = {
+      chartBig1: renderBalanceChart,
+      chartLinePurple: renderIncomeChart,
+      chartLineGreen: renderExpenseChart,
+      CountryChart: renderCategoryChart
     };
 
-    var myChart = new Chart(ctx, {
-      type: 'line',
-      data: data,
-      options: gradientChartOptionsConfigurationWithTooltipPurple
-    });
-    var expenseChartData = JSON.parse(document.getElementById('expense-chart-data').textContent);
-    var ctxGreen = document.getElementById("chartLineGreen").getContext("2d");
+    demo.refreshDashboardCharts = function() {
+      return Promise.all(Object.keys(renderers).map(function(canvasId) {
+        return loadChartData(canvasId, renderers[canvasId]).catch(function(error) {
+          console.error(error);
+        });
+      }));
+    };
 
-    var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+    demo.refreshDashboardCharts();
 
-    gradientStroke.addColorStop(1, 'rgba(66,134,121,0.15)');
-    gradientStroke.addColorStop(0.4, 'rgba(66,134,121,0.0)'); //green colors
-    gradientStroke.addColorStop(0, 'rgba(66,134,121,0)'); //green colors
+  },
 
-    var data = {
-        labels: expenseChartData.labels, // Месяцы из Django
-        datasets: [{
-            label: expenseChartData.datasets[0].label, // Название графика из Django
-            fill: true,
-            backgroundColor: gradientStroke,
-            borderColor: '#00d6b4', // Цвет линии
-            borderWidth: 2,
-            borderDash: [],
-            borderDashOffset: 0.0,
-            pointBackgroundColor: '#00d6b4', // Цвет точек
-            pointBorderColor: 'rgba(255,255,255,0)',
-            pointHoverBackgroundColor: '#00d6b4',
-            pointBorderWidth: 20,
-            pointHoverRadius: 4,
-            pointHoverBorderWidth: 15,
-            pointRadius: 4,
-            data: expenseChartData.datasets[0].data, // Данные по расходам из Django
-        }]
+  initBudgetWidget: function() {
+    // Активные бюджеты из /api/budgets/ (адрес в data-url у таблицы), ответ с ETag
+    var table = document.getElementById('budgetTable');
+    if (!table) {
+      return;
+    }
+    var states = {
+      ok: 'bg-success',
+      at_risk: 'bg-warning',
+      over: 'bg-danger'
     };
 
-    var myChart = new Chart(ctxGreen, {
-      type: 'line',
-      data: data,
-      options: gradientChartOptionsConfigurationWithTooltipGreen
+    function money(value) {
+      return value.toLocaleString('ru-RU', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
 
-    });
+    function cell(text, className) {
+      var td = document.createElement('td');
+      td.textContent = text;
+      if (className) {
+        td.className = className;
+      }
+      return td;
+    }
 
-    const mainChartData = JSON.parse(document.getElementById('main-chart-data').textContent);
-    // const countryChartData = JSON.parse(document.getElementById('country-chart-data').textContent);
+    function render(data) {
+      var body = table.tBodies[0];
+      body.innerHTML = '';
+      if (!data.budgets.length) {
+        var empty = document.createElement('tr');
+        empty.appendChild(cell('Нет активных бюджетов'));
+        empty.cells[0].colSpan = 5;
+        body.appendChild(empty);
+        return;
+      }
+      data.budgets.forEach(function(budget) {
+        var row = document.createElement('tr');
+        row.appendChild(cell(budget.category));
+        row.appendChild(cell(budget.start + ' — ' + budget.end));
 
-    // Обновляем данные для главного графика
-    var chart_labels = mainChartData.labels;
-    var chart_data = mainChartData.datasets[0].data;
+        var progress = cell('');
+        progress.innerHTML = '<div class="progress"><div class="progress-bar" role="progressbar"></div></div>';
+        var bar = progress.querySelector('.progress-bar');
+        bar.classList.add(states[budget.state]);
+        bar.style.width = Math.min(budget.percent, 100) + '%';
+        bar.title = money(budget.spent) + ' из ' + money(budget.amount) + ' (' + budget.percent + '%)';
+        row.appendChild(progress);
 
-    var ctx = document.getElementById("chartBig1").getContext('2d');
+        row.appendChild(cell(money(budget.remaining), 'text-right'));
+        row.appendChild(cell(money(budget.daily_allowance) + ' / день, прогноз ' + money(budget.projected), 'text-right'));
+        body.appendChild(row);
+      });
+    }
 
-    var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+    demo.refreshBudgets = function() {
+      return fetch(table.dataset.url, {
+          credentials: 'same-origin',
+          headers: {'Accept': 'application/json'}
+        })
+        .then(function(response) {
+          if (!response.ok) {
+            throw new Error('budgets: ' + response.status);
+          }
+          return response.json();
+        })
+        .then(render)
+        .catch(function(error) {
+          console.error(error);
+        });
+    };
 
-    gradientStroke.addColorStop(1, 'rgba(72,72,176,0.1)');
-    gradientStroke.addColorStop(0.4, 'rgba(72,72,176,0.0)');
-    gradientStroke.addColorStop(0, 'rgba(119,52,169,0)'); //purple colors
-    var config = {
-      type: 'line',
-      data: {
-        labels: chart_labels,
-        datasets: [{
-          label: "Доходы - расходы",
-          fill: true,
-          backgroundColor: gradientStroke,
-          borderColor: '#d346b1',
-          borderWidth: 2,
-          borderDash: [],
-          borderDashOffset: 0.0,
-          pointBackgroundColor: '#d346b1',
-          pointBorderColor: 'rgba(255,255,255,0)',
-          pointHoverBackgroundColor: '#d346b1',
-          pointBorderWidth: 20,
-          pointHoverRadius: 4,
-          pointHoverBorderWidth: 15,
-          pointRadius: 4,
-          data: chart_data,
-        }]
-      },
-      options: gradientChartOptionsConfigurationWithTooltipPurple
+    demo.refreshBudgets();
+  },
+
+  initGoalsWidget: function() {
+    // Цели накопления из /api/goals/ (адрес в data-url у таблицы), ответ с ETag
+    var table = document.getElementById('goalsTable');
+    if (!table) {
+      return;
+    }
+
+    function money(value) {
+      return value.toLocaleString('ru-RU', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
+
+    function cell(text, className) {
+      var td = document.createElement('td');
+      td.textContent = text;
+      if (className) {
+        td.className = className;
+      }
+      return td;
+    }
+
+    function render(data) {
+      var body = table.tBodies[0];
+      body.innerHTML = '';
+      if (!data.goals.length) {
+        var empty = document.createElement('tr');
+        empty.appendChild(cell('Нет целей накопления'));
+        empty.cells[0].colSpan = 4;
+        body.appendChild(empty);
+        return;
+      }
+      data.goals.forEach(function(goal) {
+        var row = document.createElement('tr');
+        row.appendChild(cell(goal.name));
+
+        var progress = cell('');
+        progress.innerHTML = '<div class="progress"><div class="progress-bar" role="progressbar"></div></div>';
+        var bar = progress.querySelector('.progress-bar');
+        bar.classList.add(goal.on_track ? 'bg-success' : 'bg-warning');
+        bar.style.width = Math.min(goal.percent, 100) + '%';
+        bar.title = money(goal.saved) + ' из ' + money(goal.target) + ' (' + goal.percent + '%)';
+        row.appendChild(progress);
+
+        row.appendChild(cell(goal.target_date, 'text-right'));
+        row.appendChild(cell(
+          goal.projected_date ? goal.projected_date : 'нет накоплений за 90 дней',
+          'text-right' + (goal.on_track ? '' : ' text-warning')
+        ));
+        body.appendChild(row);
+      });
+    }
+
+    demo.refreshGoals = function() {
+      return fetch(table.dataset.url, {
+          credentials: 'same-origin',
+          headers: {'Accept': 'application/json'}
+        })
+        .then(function(response) {
+          if (!response.ok) {
+            throw new Error('goals: ' + response.status);
+          }
+          return response.json();
+        })
+        .then(render)
+        .catch(function(error) {
+          console.error(error);
+        });
     };
-    var myChartData = new Chart(ctx, config);
-    $("#0").click(function() {
-      var data = myChartData.config.data;
-      data.datasets[0].data = chart_data;
-      data.labels = chart_labels;
-      myChartData.update();
-    });
-    $("#1").click(function() {
-      var chart_data = [];
-      var data = myChartData.config.data;
-      data.datasets[0].data = chart_data;
-      data.labels = chart_labels;
-      myChartData.update();
-    });
 
-    $("#2").click(function() {
-      var chart_data = [];
-      var data = myChartData.config.data;
-      data.datasets[0].data = chart_data;
-      data.labels = chart_labels;
-      myChartData.update();
-    });
+    demo.refreshGoals();
+  },
 
+  initTrendsWidget: function() {
+    // Прогноз и аномалии трат из /api/trends/ (адрес в data-url у панели), ответ с ETag
+    var panel = document.getElementById('trendsPanel');
+    if (!panel) {
+      return;
+    }
 
-    var ctx = document.getElementById("CountryChart").getContext("2d");
-    var categoryChartData = JSON.parse(document.getElementById('category-chart-data').textContent);
-    var gradientStroke = ctx.createLinearGradient(0, 230, 0, 50);
+    function money(value) {
+      return value.toLocaleString('ru-RU', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
 
-    gradientStroke.addColorStop(1, 'rgba(29,140,248,0.2)');
-    gradientStroke.addColorStop(0.4, 'rgba(29,140,248,0.0)');
-    gradientStroke.addColorStop(0, 'rgba(29,140,248,0)'); //blue colors
+    function item(text, className) {
+      var li = document.createElement('li');
+      li.textContent = text;
+      if (className) {
+        li.className = className;
+      }
+      return li;
+    }
 
-    var data = {
-        labels: categoryChartData.labels, // Названия категорий
-        datasets: [{
-            label: categoryChartData.datasets[0].label, // Название графика
-            fill: true,
-            backgroundColor: gradientStroke,
-            hoverBackgroundColor: gradientStroke,
-            borderColor: '#1f8ef1', // Цвет линии
-            borderWidth: 2,
-            borderDash: [],
-            borderDashOffset: 0.0,
-            data: categoryChartData.datasets[0].data, // Данные по расходам
-        }]
+    function render(data) {
+      var forecast = panel.querySelector('.trends-forecast');
+      forecast.innerHTML = '';
+      forecast.appendChild(item(
+        data.forecast.current_month.label + ': расходы к концу месяца ≈ ' + money(data.forecast.current_month.expense)
+      ));
+      data.forecast.labels.forEach(function(label, index) {
+        var net = data.forecast.net[index];
+        forecast.appendChild(item(
+          label + ': доходы ' + money(data.forecast.income[index]) + ', расходы ' +
+          money(data.forecast.expense[index]) + ', итог ' + money(net),
+          net < 0 ? 'text-warning' : ''
+        ));
+      });
+
+      var anomalies = panel.querySelector('.trends-anomalies');
+      anomalies.innerHTML = '';
+      if (!data.anomalies.length) {
+        anomalies.appendChild(item('Необычных трат не найдено'));
+      }
+      data.anomalies.forEach(function(anomaly) {
+        anomalies.appendChild(item(
+          anomaly.month + ', ' + anomaly.category + ': ' + money(anomaly.amount) +
+          ' при среднем ' + money(anomaly.mean),
+          anomaly.z > 0 ? 'text-danger' : 'text-info'
+        ));
+      });
+    }
+
+    demo.refreshTrends = function() {
+      return fetch(panel.dataset.url, {
+          credentials: 'same-origin',
+          headers: {'Accept': 'application/json'}
+        })
+        .then(function(response) {
+          if (response.status === 501) {
+            // На сервере нет numpy — панель скрывается
+            panel.hidden = true;
+            return null;
+          }
+          if (!response.ok) {
+            throw new Error('trends: ' + response.status);
+          }
+          return response.json();
+        })
+        .then(function(data) {
+          if (data) {
+            render(data);
+          }
+        })
+        .catch(function(error) {
+          console.error(error);
+        });
     };
 
+    demo.refreshTrends();
+  },
 
-    var myChart = new Chart(ctx, {
-      type: 'bar',
-      responsive: true,
-      legend: {
-        display: false
-      },
-      data: data,
-      options: gradientBarChartConfiguration
-    });
+  initJobStatus: function() {
+    // Статус фоновой задачи из /api/jobs/<id>/ (адрес в data-url), опрос раз в секунду
+    var panel = document.getElementById('jobStatus');
+    if (!panel) {
+      return;
+    }
+    var bar = panel.querySelector('.progress-bar');
+    var message = panel.querySelector('.job-message');
+    var result = panel.querySelector('.job-result');
+    var labels = {queued: 'В очереди', running: 'Выполняется', done: 'Готово', failed: 'Ошибка'};
+
+    function line(text, className) {
+      var p = document.createElement('p');
+      p.textContent = text;
+      if (className) {
+        p.className = className;
+      }
+      result.appendChild(p);
+    }
+
+    function render(job) {
+      bar.style.width = job.progress + '%';
+      message.textContent = labels[job.status] + (job.message ? ': ' + job.message : '');
+      if (job.status === 'failed') {
+        message.className = 'job-message text-danger';
+        line(job.error || '');
+      }
+      if (job.status === 'done' && job.result) {
+        message.className = 'job-message text-success';
+        if (job.kind === 'import_statement') {
+          line('Добавлено: ' + job.result.created + ', дубликатов: ' + job.result.duplicates +
+            ', пропущено: ' + job.result.skipped);
+          job.result.errors.forEach(function(error) {
+            line(error, 'text-warning');
+          });
+        }
+        if (job.file_url) {
+          var link = document.createElement('a');
+          link.href = job.file_url;
+          link.textContent = 'Скачать';
+          result.appendChild(link);
+        }
+      }
+    }
+
+    function poll() {
+      fetch(panel.dataset.url, {
+          credentials: 'same-origin',
+          headers: {'Accept': 'application/json'}
+        })
+        .then(function(response) {
+          if (!response.ok) {
+            throw new Error('job: ' + response.status);
+          }
+          return response.json();
+        })
+        .then(function(job) {
+          render(job);
+          if (job.status === 'queued' || job.status === 'running') {
+            setTimeout(poll, 1000);
+          }
+        })
+        .catch(function(error) {
+          console.error(error);
+        });
+    }
 
+    poll();
   },
 
   initGoogleMaps: function() {
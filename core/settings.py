@@ -40,10 +40,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'apps.home'  # Enable the inner home (home)
+    'apps.home.config.MyConfig'  # Enable the inner home (home)
 ]
 
 MIDDLEWARE = [
+    'apps.instrumentation.InstrumentationMiddleware',  # первым: учитывает запросы всех остальных
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,6 +82,11 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Постоянные соединения: соединение живёт DB_CONN_MAX_AGE секунд и переиспользуется
+# следующими запросами потока; перед повторным использованием оно проверяется
+DB_CONN_MAX_AGE       = env.int('DB_CONN_MAX_AGE', default=60)
+DB_CONN_HEALTH_CHECKS = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+
 if os.environ.get('DB_ENGINE') and os.environ.get('DB_ENGINE') == "mysql":
     DATABASES = { 
       'default': {
@@ -90,16 +96,110 @@ if os.environ.get('DB_ENGINE') and os.environ.get('DB_ENGINE') == "mysql":
         'PASSWORD': os.getenv('DB_PASS'     , 'pass'),
         'HOST'    : os.getenv('DB_HOST'     , 'localhost'),
         'PORT'    : os.getenv('DB_PORT'     , 3306),
+        'CONN_MAX_AGE'      : DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }, 
     }
+    # Необязательный пул соединений (pip install django-db-connection-pool[mysql]):
+    # соединения делят все потоки процесса, а не каждый держит своё
+    if env.bool('DB_POOL', default=False):
+        DATABASES['default'].update({
+            'ENGINE'      : 'dj_db_conn_pool.backends.mysql',
+            'CONN_MAX_AGE': 0,  # временем жизни соединений управляет пул
+            'POOL_OPTIONS': {
+                'POOL_SIZE'   : env.int('DB_POOL_SIZE', default=10),
+                'MAX_OVERFLOW': env.int('DB_POOL_MAX_OVERFLOW', default=10),
+                'RECYCLE'     : env.int('DB_POOL_RECYCLE', default=3600),
+            },
+        })
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 
+# Реплика для чтения аналитики (apps.routers). Локально — второй файл SQLite,
+# например копия: sqlite3 db.sqlite3 ".backup replica.sqlite3";
+# для MySQL — хост реплики с теми же учётными данными.
+# В тестах реплика зеркалирует основную БД (TEST MIRROR)
+if env('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = dict(DATABASES['default'], HOST=env('DB_REPLICA_HOST'), TEST={'MIRROR': 'default'})
+elif env('DB_REPLICA_SQLITE', default='') and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=env('DB_REPLICA_SQLITE'), TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['apps.routers.ReplicaRouter']
+DB_REPLICA_NAME   = 'replica' if 'replica' in DATABASES else None
+# Сколько секунд после записи пользователь читает из основной БД (задержка репликации)
+DB_REPLICA_STICKY = env.int('DB_REPLICA_STICKY', default=10)
+# Через сколько секунд снова пробовать недоступную реплику
+DB_REPLICA_RETRY  = env.int('DB_REPLICA_RETRY', default=30)
+
+# PRAGMA для каждого нового соединения с SQLite (apps.home.handlers.tune_sqlite):
+# WAL — читатели не блокируют писателя, busy_timeout — ожидание блокировки
+# вместо ошибки "database is locked" при нескольких воркерах
+SQLITE_PRAGMAS = {
+    'journal_mode': env('SQLITE_JOURNAL_MODE', default='wal'),
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', default=5000),
+    'synchronous' : env('SQLITE_SYNCHRONOUS', default='normal'),
+    'mmap_size'   : env.int('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024),
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# locmem живёт внутри процесса: при нескольких воркерах gunicorn
+# используйте общий бэкенд (FileBasedCache, RedisCache, Memcached).
+# gunicorn-cfg.py с locmem по умолчанию запускает один воркер
+
+CACHES = {
+    'default': {
+        'BACKEND' : env('CACHE_BACKEND' , default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('CACHE_LOCATION', default='fintracker'),
+    }
+}
+
+# Кэш дашборда: алиас из CACHES и время жизни записи (секунды)
+DASHBOARD_CACHE_ALIAS   = env('DASHBOARD_CACHE_ALIAS', default='default')
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=60 * 60)
+
+# Потоки для параллельных запросов сводки дашборда (/api/dashboard/).
+# Каждый поток держит своё соединение с БД
+DASHBOARD_QUERY_THREADS = env.int('DASHBOARD_QUERY_THREADS', default=4)
+
+# Снимки журнала для аналитики (apps.home.snapshots): столбцовые файлы
+# пользователей в этом каталоге, общие для воркеров через mmap. Пусто — снимки
+# выключены и аналитика читает дневные агрегаты. Каталог локален для хоста:
+# при нескольких серверах приложения снимки не включайте
+LEDGER_SNAPSHOT_DIR = env('LEDGER_SNAPSHOT_DIR', default='')
+
+# Фоновые задачи (apps.home.jobs): воркеры запускает manage.py run_jobs.
+# Файлы задач (загруженные выписки, выгрузки) — в JOB_FILES_DIR; аренда
+# выполняющейся задачи и задержка первого повтора — в секундах.
+# JOBS_EAGER выполняет задачи сразу в процессе веб-сервера (без воркеров)
+JOB_FILES_DIR   = env('JOB_FILES_DIR', default=os.path.join(CORE_DIR, 'jobs'))
+JOB_LEASE       = env.int('JOB_LEASE', default=300)
+JOB_RETRY_DELAY = env.int('JOB_RETRY_DELAY', default=30)
+JOBS_EAGER      = env.bool('JOBS_EAGER', default=False)
+
+# Выписки за месяц (apps.home.statements) собирает manage.py generate_statements
+# после закрытия месяца; view отдаёт готовые файлы из STATEMENTS_DIR.
+# PDF собирается при установленном reportlab шрифтом с кириллицей STATEMENT_PDF_FONT
+STATEMENTS_DIR     = env('STATEMENTS_DIR', default=os.path.join(CORE_DIR, 'statements'))
+STATEMENT_PDF_FONT = env('STATEMENT_PDF_FONT', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Бюджеты SQL-запросов по имени URL (дополняют декоратор query_budget).
+# В строгом режиме превышение — ошибка, иначе — предупреждение в логе
+QUERY_BUDGETS = {
+    'admin:home_transaction_changelist': 8,
+}
+QUERY_BUDGETS_STRICT = env.bool('QUERY_BUDGETS_STRICT', default=False)
+
+# Адреса, с которых доступен /metrics без входа в систему
+INTERNAL_IPS = env.list('INTERNAL_IPS', default=['127.0.0.1'])
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -6,11 +6,14 @@ Copyright (c) 2019 - present AppSeed.us
 from django.contrib import admin
 from django.urls import path, include  # add this
 
+from apps.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),          # Django admin route
     path("", include("apps.authentication.urls")), # Auth routes - login / register
 
     # ADD NEW Routes HERE
+    path('metrics', metrics, name='metrics'),  # Prometheus
 
     # Leave `Home.Urls` as last the last line
     path("", include("apps.home.urls"))
@@ -2,10 +2,75 @@
 """
 Copyright (c) 2019 - present AppSeed.us
 """
+import multiprocessing
+import os
 
-bind = '0.0.0.0:5005'
-workers = 1
-accesslog = '-'
-loglevel = 'debug'
+import environ
+
+env = environ.Env()
+environ.Env.read_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+CPUS = multiprocessing.cpu_count()
+
+bind = env('GUNICORN_BIND', default='0.0.0.0:5005')
+
+# GUNICORN_ASGI=True — ASGI-приложение под воркерами uvicorn: async view
+# (например, /api/dashboard/) выполняются в цикле событий без перехода в поток.
+# Иначе — WSGI с потоками (gthread): медленная агрегация занимает один поток,
+# а не весь воркер
+if env.bool('GUNICORN_ASGI', default=False):
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'core.wsgi:application'
+    worker_class = env('GUNICORN_WORKER_CLASS', default='gthread')
+
+# Кэш locmem (по умолчанию) у каждого процесса свой: версия журнала, кэш
+# дашборда, ETag/304 и привязка к основной БД после записи (apps.routers)
+# расходятся между воркерами, и ответы устаревают. Поэтому с ним по умолчанию
+# один процесс, а параллельность дают потоки; с общим бэкендом (CACHE_BACKEND:
+# FileBasedCache, Redis, Memcached) — 2 × CPU + 1
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+CACHE_IS_LOCAL = env('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache') in PROCESS_LOCAL_CACHES
+
+# Потоки на процесс — только для gthread
+workers = env.int('GUNICORN_WORKERS', default=1 if CACHE_IS_LOCAL else CPUS * 2 + 1)
+threads = env.int('GUNICORN_THREADS', default=4)
+
+# Приложение импортируется один раз в мастере, воркеры получают его через fork
+# и делят страницы памяти с импортированным кодом
+preload_app = env.bool('GUNICORN_PRELOAD', default=True)
+
+# Воркер перезапускается после max_requests (+ случайные 0..jitter) запросов:
+# рост памяти ограничен, а воркеры не перезапускаются одновременно
+max_requests = env.int('GUNICORN_MAX_REQUESTS', default=1000)
+max_requests_jitter = env.int('GUNICORN_MAX_REQUESTS_JITTER', default=max_requests // 10)
+
+timeout = env.int('GUNICORN_TIMEOUT', default=30)
+graceful_timeout = env.int('GUNICORN_GRACEFUL_TIMEOUT', default=30)
+keepalive = env.int('GUNICORN_KEEPALIVE', default=5)
+
+# Пустое значение отключает журнал запросов (например, под нагрузочным тестом)
+accesslog = env('GUNICORN_ACCESSLOG', default='-') or None
+loglevel = env('GUNICORN_LOGLEVEL', default='info')
 capture_output = True
 enable_stdio_inheritance = True
+
+
+def on_starting(server):
+    if CACHE_IS_LOCAL and server.cfg.workers > 1:
+        server.log.warning(
+            'GUNICORN_WORKERS=%s с кэшем внутри процесса (%s): воркеры не видят '
+            'инвалидацию друг друга и отдают устаревшие данные. Задайте общий '
+            'CACHE_BACKEND или оставьте один воркер',
+            server.cfg.workers, ', '.join(sorted(PROCESS_LOCAL_CACHES))
+        )
+
+
+def post_fork(server, worker):
+    # С preload_app соединения с БД, открытые в мастере, достались бы всем
+    # воркерам сразу — каждый воркер открывает свои
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    connections.close_all()